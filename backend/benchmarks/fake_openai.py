@@ -0,0 +1,218 @@
+# benchmarks/fake_openai.py
+#
+# Local stand-in for the OpenAI chat-completions and embeddings endpoints,
+# so the chat path can be load-tested offline and without spending tokens.
+#
+# Answers are shaped by what each agent expects:
+#   - JSON-mode calls get a plausible guardrail / intent / field-extraction object
+#   - calls offering `functions` (caregiver) get a plain-text reply
+#   - streamed calls get `--chunks` content deltas spaced `--chunk-ms` apart,
+#     followed by a usage chunk when stream_options.include_usage is set
+#   - embeddings are deterministic 1536-d unit vectors derived from the input
+#
+# Every request first waits `--latency-ms` (± `--jitter-ms`); a `--error-rate`
+# share of requests is answered with a 429 or 500 instead.
+#
+# Usage:
+#   cd backend/
+#   python -m benchmarks.fake_openai --port 8900 --latency-ms 300 --chunk-ms 25
+#   OPENAI_BASE_URL=http://127.0.0.1:8900/v1 uvicorn main:app
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+
+import numpy as np
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+EMBED_DIM = 1536
+
+_INTENT_KEYWORDS = [
+    ("accommodation_request", ("accommodation", "letter", "extended time", "extra time")),
+    ("medication_query",      ("medication", "dose", "ibuprofen", "prescription", "pill")),
+    ("reminder_request",      ("remind", "reminder", "calendar")),
+    ("caregiver_query",       ("my patient", "patient", "caregiver", "diary")),
+    ("appointment_scheduling", ("appointment", "book", "schedule")),
+    ("das_faq",               ("das", "register", "documentation", "deadline", "office")),
+]
+_FIELD_VALUES = {
+    "student_name":             "Alex Student",
+    "disability_type":          "ADHD",
+    "accommodations_requested": "extended test time",
+    "course_or_context":        "CHEM 150",
+}
+_WORDS = ("Sure", "here", "is", "what", "the", "Emory", "DAS", "office", "recommends", "for", "your",
+          "situation", "based", "on", "the", "registration", "page", "and", "current", "policy")
+
+
+class Settings:
+    latency_ms: float = 300.0
+    jitter_ms:  float = 50.0
+    chunk_ms:   float = 25.0
+    chunks:     int   = 60
+    error_rate: float = 0.0
+
+
+settings = Settings()
+
+
+def _last_user(messages: list[dict]) -> str:
+    for m in reversed(messages):
+        if m.get("role") == "user" and isinstance(m.get("content"), str):
+            return m["content"]
+    return ""
+
+
+def _system(messages: list[dict]) -> str:
+    return next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+
+
+def _json_reply(messages: list[dict]) -> dict:
+    system, user = _system(messages), _last_user(messages)
+    if '"allowed"' in system:
+        return {"allowed": True, "sanitized": user, "reason": None}
+    if "intent classifier" in system:
+        lowered = user.lower()
+        intent  = next((label for label, words in _INTENT_KEYWORDS if any(w in lowered for w in words)), "general_chat")
+        return {"intent": intent, "confidence": 0.92, "entities": {}}
+    if "Extract any of the following fields" in user:
+        known   = re.search(r"Already known: (\{.*\})", user)
+        fields  = json.loads(known.group(1)) if known else {}
+        missing = [k for k in _FIELD_VALUES if not fields.get(k)]
+        return {missing[0]: _FIELD_VALUES[missing[0]]} if missing else {}
+    return {}
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _prompt_tokens(body: dict) -> int:
+    return sum(_tokens(str(m.get("content") or "")) for m in body.get("messages", []))
+
+
+def _completion(body: dict, content: str) -> dict:
+    prompt, completion = _prompt_tokens(body), _tokens(content)
+    return {
+        "id":      f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object":  "chat.completion",
+        "created": int(time.time()),
+        "model":   body.get("model", "gpt-4o-mini"),
+        "choices": [{
+            "index":         0,
+            "message":       {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion},
+    }
+
+
+async def _stream(body: dict):
+    cid     = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    model   = body.get("model", "gpt-4o-mini")
+
+    def frame(choices: list, usage: dict | None = None) -> bytes:
+        chunk = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model, "choices": choices}
+        if usage is not None:
+            chunk["usage"] = usage
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    yield frame([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+    for i in range(settings.chunks):
+        await asyncio.sleep(settings.chunk_ms / 1000)
+        yield frame([{"index": 0, "delta": {"content": _WORDS[i % len(_WORDS)] + " "}, "finish_reason": None}])
+    yield frame([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+    if (body.get("stream_options") or {}).get("include_usage"):
+        prompt = _prompt_tokens(body)
+        yield frame([], {"prompt_tokens": prompt, "completion_tokens": settings.chunks, "total_tokens": prompt + settings.chunks})
+    yield b"data: [DONE]\n\n"
+
+
+async def _simulate_latency() -> JSONResponse | None:
+    await asyncio.sleep(max(0.0, random.gauss(settings.latency_ms, settings.jitter_ms)) / 1000)
+    if random.random() < settings.error_rate:
+        status = random.choice((429, 500))
+        return JSONResponse(
+            {"error": {"message": "injected failure", "type": "fake_error", "code": status}},
+            status_code=status,
+            headers={"retry-after": "0.2"} if status == 429 else None,
+        )
+    return None
+
+
+async def chat_completions(request: Request):
+    body = await request.json()
+    if (error := await _simulate_latency()) is not None:
+        return error
+
+    if body.get("stream"):
+        return StreamingResponse(_stream(body), media_type="text/event-stream")
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        return JSONResponse(_completion(body, json.dumps(_json_reply(body["messages"]))))
+    return JSONResponse(_completion(body, "Happy to help with that. " * 8))
+
+
+def _embedding(text: str) -> list[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    vec  = np.random.default_rng(seed).standard_normal(EMBED_DIM).astype(np.float32)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+async def embeddings(request: Request):
+    body = await request.json()
+    if (error := await _simulate_latency()) is not None:
+        return error
+
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    tokens = sum(_tokens(str(t)) for t in inputs)
+    return JSONResponse({
+        "object": "list",
+        "model":  body.get("model", "text-embedding-3-small"),
+        "data":   [{"object": "embedding", "index": i, "embedding": _embedding(str(t))} for i, t in enumerate(inputs)],
+        "usage":  {"prompt_tokens": tokens, "total_tokens": tokens},
+    })
+
+
+app = Starlette(routes=[
+    Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+    Route("/v1/embeddings",       embeddings,       methods=["POST"]),
+])
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=settings.latency_ms, help="mean delay before each response")
+    parser.add_argument("--jitter-ms",  type=float, default=settings.jitter_ms,  help="std-dev of that delay")
+    parser.add_argument("--chunk-ms",   type=float, default=settings.chunk_ms,   help="gap between streamed deltas")
+    parser.add_argument("--chunks",     type=int,   default=settings.chunks,     help="deltas per streamed reply")
+    parser.add_argument("--error-rate", type=float, default=settings.error_rate, help="share of requests answered 429/500")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI API for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    settings.latency_ms = args.latency_ms
+    settings.jitter_ms  = args.jitter_ms
+    settings.chunk_ms   = args.chunk_ms
+    settings.chunks     = args.chunks
+    settings.error_rate = args.error_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
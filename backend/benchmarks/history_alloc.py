@@ -0,0 +1,121 @@
+# benchmarks/history_alloc.py
+#
+# Per-turn allocation of the conversation-state bookkeeping for a long
+# session: the old list-of-dicts history that every agent copied
+# (`history=context.history + [...]`, `metadata={**context.metadata, ...}`)
+# versus the append-only History views and in-place metadata now used.
+#
+# Only the bookkeeping is measured — no LLM calls. Each simulated turn does
+# what the pipeline does: read a recent-history slice for the prompt, record
+# the routed intent in metadata, then append the user/assistant pair.
+#
+# Usage:
+#   cd backend/
+#   python -m benchmarks.history_alloc            # 200-turn sessions
+#   python -m benchmarks.history_alloc --turns 500
+
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+from src.agents.conversation import History
+
+_SYSTEM = {"role": "system", "content": "You are a helpful assistant for MedEase, a healthcare and Emory DAS app."}
+_USER   = "Can you remind me how many hours of extended test time my accommodation letter covers? " * 2
+_REPLY  = "According to the Registration page, approved students receive 1.5x time on exams. " * 4
+
+
+@dataclass
+class _ListContext:
+    """AgentContext as it was: history is a plain list, replaced on every turn."""
+    session_id: str
+    history: list[dict]
+    metadata: dict = field(default_factory=dict)
+
+
+@dataclass
+class _ViewContext:
+    session_id: str
+    history: History
+    metadata: dict = field(default_factory=dict)
+
+
+def _turn_before(context: _ListContext, i: int) -> _ListContext:
+    recent   = context.history[-6:]                                   # prompt window
+    metadata = {**context.metadata, "intent": "das_faq", "confidence": 0.9, "entities": {}}  # orchestrator
+    enriched = _ListContext(context.session_id, context.history, metadata)
+    _ = [_SYSTEM, *recent, {"role": "user", "content": _USER}]
+    return _ListContext(                                              # agent finalize
+        enriched.session_id,
+        enriched.history + [{"role": "user", "content": _USER}, {"role": "assistant", "content": _REPLY}],
+        {**enriched.metadata, "awaiting_triage_clarification": False},
+    )
+
+
+def _turn_after(context: _ViewContext, i: int) -> _ViewContext:
+    recent = context.history[-6:]
+    metadata = context.metadata
+    metadata["intent"], metadata["confidence"], metadata["entities"] = "das_faq", 0.9, {}
+    _ = [_SYSTEM, *recent, {"role": "user", "content": _USER}]
+    metadata["awaiting_triage_clarification"] = False
+    return _ViewContext(
+        context.session_id,
+        context.history.extended([{"role": "user", "content": _USER}, {"role": "assistant", "content": _REPLY}]),
+        metadata,
+    )
+
+
+def _measure(step, context, turns: int) -> tuple[list[int], list[float], int]:
+    """(peak bytes allocated per turn, seconds per turn, bytes retained at the end)."""
+    peaks, times = [], []
+    tracemalloc.start()
+    start_retained, _ = tracemalloc.get_traced_memory()
+    for i in range(turns):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        context = step(context, i)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    retained = tracemalloc.get_traced_memory()[0] - start_retained
+    tracemalloc.stop()
+
+    # Timing without tracemalloc overhead
+    context = _fresh(type(context))
+    for i in range(turns):
+        t0 = time.perf_counter()
+        context = step(context, i)
+        times.append(time.perf_counter() - t0)
+    return peaks, times, retained
+
+
+def _fresh(kind):
+    if kind is _ListContext:
+        return _ListContext("bench", [dict(_SYSTEM)])
+    return _ViewContext("bench", History.of([_SYSTEM]))
+
+
+def _report(name: str, peaks: list[int], times: list[float], retained: int) -> None:
+    last = slice(-10, None)
+    print(f"{name}")
+    print(f"  allocated per turn: mean {sum(peaks) / len(peaks) / 1024:7.1f} KiB   "
+          f"last 10 turns {sum(peaks[last]) / 10 / 1024:7.1f} KiB")
+    print(f"  time per turn:      mean {sum(times) / len(times) * 1e6:7.1f} µs    "
+          f"last 10 turns {sum(times[last]) / 10 * 1e6:7.1f} µs")
+    print(f"  retained after session: {retained / 1024:.0f} KiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-turn history/metadata allocation")
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{args.turns}-turn session\n")
+    _report("before: list history + copied metadata", *_measure(_turn_before, _fresh(_ListContext), args.turns))
+    _report("after:  History views + in-place metadata", *_measure(_turn_after, _fresh(_ViewContext), args.turns))
+
+
+if __name__ == "__main__":
+    main()
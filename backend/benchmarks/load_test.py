@@ -0,0 +1,276 @@
+# benchmarks/load_test.py
+#
+# End-to-end load test of the chat path: starts benchmarks/fake_openai.py and
+# `uvicorn main:app` pointed at it, then drives N concurrent Socket.IO clients
+# through multi-turn conversations (DAS FAQ, accommodation letter, caregiver
+# reminders) and reports:
+#   - time-to-first-token and total latency per message (p50 / p95 / p99)
+#   - messages per second
+#   - server event-loop lag, from the /metrics histogram
+#   - server RSS (current and peak), read from /proc
+#
+# Nothing leaves the machine; MongoDB is not touched unless SESSION_STORE=mongo. RAG runs
+# without retrieval unless the vector store has been built (against the fake:
+# `OPENAI_BASE_URL=http://127.0.0.1:8900/v1 python -m src.rag.indexer`).
+#
+# Usage:
+#   pip install -r benchmarks/requirements.txt
+#   cd backend/
+#   python -m benchmarks.load_test --clients 50 --rounds 2
+#   python -m benchmarks.load_test --clients 50 --latency-ms 800 --error-rate 0.05
+#   python -m benchmarks.load_test --url http://127.0.0.1:8000   # already-running server
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+import socketio
+
+from benchmarks import fake_openai
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TURN_TIMEOUT = 60.0
+
+SCRIPTS = {
+    "das_faq": [
+        "How do I register with DAS?",
+        "What documentation do I need to submit?",
+        "Is there a deadline for requesting exam accommodations this semester?",
+    ],
+    "accommodation": [
+        "I need an accommodation letter for my professor",
+        "My name is Alex Student and I have ADHD",
+        "I'd like extended test time",
+        "It's for CHEM 150",
+    ],
+    "caregiver": [
+        "Can you remind me to give my patient their medication at 8pm?",
+        "Also add a reminder for the physiotherapy appointment on Friday",
+        "Thanks, what's on the patient diary for today?",
+    ],
+}
+
+# Placeholders so main.py imports cleanly; none of the load-test flows use them.
+_SERVER_ENV_DEFAULTS = {
+    "CHAT_GPT_API_KEY": "fake-key",
+    "MONGO_URI": "mongodb://127.0.0.1:27017",
+    "DB_NAME": "medease_loadtest",
+    "USERINFO_COLLECTION": "userinfo",
+    "MEDICATION_COLLECTION": "medication",
+    "GOOGLE_CALENDAR_COLLECTION": "google_calendar",
+    "GMAIL_COLLECTION": "gmail",
+    "PATIENT_KEY_COLLECTION": "patient_key",
+    "PATIENT_DATA_COLLECTION": "patient_data",
+    "PATIENT_DIARY_COLLECTION": "patient_diary",
+    "MEDICAL_REPORT_COLLECTION": "medical_report",
+    "SECRET_KEY": "loadtest-secret",
+}
+
+
+@dataclass
+class Results:
+    ttft:   list[float] = field(default_factory=list)
+    total:  list[float] = field(default_factory=list)
+    errors: int = 0
+
+
+# ── Clients ───────────────────────────────────────────────────────────────────
+
+async def _run_client(url: str, script: list[str], rounds: int, think: float, results: Results) -> None:
+    sio    = socketio.AsyncClient(reconnection=False)
+    events: asyncio.Queue[str] = asyncio.Queue()
+
+    sio.on("bot-token",   lambda _data: events.put_nowait("token"))
+    sio.on("bot-done",    lambda _data: events.put_nowait("done"))
+    sio.on("bot-message", lambda _data: events.put_nowait("message"))
+
+    await sio.connect(url, socketio_path="/ws/socket.io", transports=["websocket"], auth={"session_id": uuid.uuid4().hex})
+    try:
+        for _ in range(rounds):
+            for text in script:
+                started = time.perf_counter()
+                await sio.emit("user_message", {"content": text, "locale": "en"})
+                try:
+                    first = await asyncio.wait_for(events.get(), TURN_TIMEOUT)
+                    results.ttft.append(time.perf_counter() - started)
+                    kind = first
+                    while kind == "token":
+                        kind = await asyncio.wait_for(events.get(), TURN_TIMEOUT)
+                    results.total.append(time.perf_counter() - started)
+                except asyncio.TimeoutError:
+                    results.errors += 1
+                if think:
+                    await asyncio.sleep(think)
+    finally:
+        await sio.disconnect()
+
+
+# ── Server processes ──────────────────────────────────────────────────────────
+
+def _spawn(args: list[str], env: dict, log) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _wait_until_up(url: str, proc: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {proc.returncode} during start-up")
+            try:
+                await http.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def _rss_mb(pid: int) -> tuple[float, float]:
+    """(current, peak) resident set size in MB, from /proc/<pid>/status."""
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(rest.split()[0]) / 1024
+    return values.get("VmRSS", 0.0), values.get("VmHWM", 0.0)
+
+
+# ── Event-loop lag (from /metrics) ────────────────────────────────────────────
+
+async def _lag_buckets(url: str) -> dict[str, float]:
+    async with httpx.AsyncClient() as http:
+        text = (await http.get(f"{url}/metrics")).text
+    buckets = {}
+    for line in text.splitlines():
+        if line.startswith("medease_event_loop_lag_seconds_bucket"):
+            le = line.split('le="', 1)[1].split('"', 1)[0]
+            buckets[le] = float(line.rsplit(" ", 1)[1])
+    return buckets
+
+
+def _lag_quantile(before: dict[str, float], after: dict[str, float], q: float) -> str:
+    """Upper bucket bound holding the q-quantile of lag samples taken during the run."""
+    deltas = [(le, after[le] - before.get(le, 0.0)) for le in after]
+    count  = deltas[-1][1] if deltas else 0
+    if not count:
+        return "n/a"
+    for le, cumulative in deltas:
+        if cumulative >= q * count:
+            return "> 1000 ms" if le == "+Inf" else f"<= {float(le) * 1000:g} ms"
+    return "n/a"
+
+
+# ── Report ────────────────────────────────────────────────────────────────────
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _print_latency(name: str, values: list[float]) -> None:
+    if not values:
+        print(f"  {name:<6} no samples")
+        return
+    p50, p95, p99 = (_percentile(values, q) * 1000 for q in (0.50, 0.95, 0.99))
+    print(f"  {name:<6} p50 {p50:7.0f} ms   p95 {p95:7.0f} ms   p99 {p99:7.0f} ms")
+
+
+async def _run(args: argparse.Namespace) -> None:
+    procs: list[subprocess.Popen] = []
+    log = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    url = args.url
+    try:
+        if url is None:
+            fake_args = [
+                "--port",       str(args.fake_port),
+                "--latency-ms", str(args.latency_ms),
+                "--jitter-ms",  str(args.jitter_ms),
+                "--chunk-ms",   str(args.chunk_ms),
+                "--chunks",     str(args.chunks),
+                "--error-rate", str(args.error_rate),
+            ]
+            procs.append(_spawn(["-m", "benchmarks.fake_openai", *fake_args], dict(os.environ), log))
+
+            env = {**_SERVER_ENV_DEFAULTS, **os.environ, "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1"}
+            procs.append(_spawn(["-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"], env, log))
+            url = f"http://127.0.0.1:{args.port}"
+            await _wait_until_up(f"http://127.0.0.1:{args.fake_port}/v1/embeddings", procs[0])
+            await _wait_until_up(url, procs[1])
+
+        server_pid = procs[-1].pid if procs else None
+        if not (BACKEND_DIR / "src" / "rag" / "corpus_version").exists():
+            print("note: vector store not built — DAS FAQ answers run without retrieval")
+
+        names   = list(SCRIPTS)
+        results = {name: Results() for name in names}
+        lag_before = await _lag_buckets(url)
+        peak_rss   = 0.0
+
+        started = time.perf_counter()
+        clients = asyncio.gather(*(
+            _run_client(url, SCRIPTS[names[i % len(names)]], args.rounds, args.think_ms / 1000, results[names[i % len(names)]])
+            for i in range(args.clients)
+        ))
+        while server_pid is not None and not clients.done():
+            peak_rss = max(peak_rss, _rss_mb(server_pid)[0])
+            await asyncio.wait([clients], timeout=0.5)
+        await clients
+        elapsed = time.perf_counter() - started
+        lag_after = await _lag_buckets(url)
+
+        messages = sum(len(r.total) for r in results.values())
+        errors   = sum(r.errors for r in results.values())
+        print(f"\n{args.clients} clients × {args.rounds} rounds — {messages} messages in {elapsed:.1f}s "
+              f"({messages / elapsed:.1f} msg/s), {errors} timed out")
+        print(f"fake OpenAI: latency {args.latency_ms:g}±{args.jitter_ms:g} ms, {args.chunks} chunks every "
+              f"{args.chunk_ms:g} ms, error rate {args.error_rate:g}")
+
+        for name in names:
+            print(f"\n{name}")
+            _print_latency("ttft", results[name].ttft)
+            _print_latency("total", results[name].total)
+        print("\nall")
+        _print_latency("ttft",  [v for r in results.values() for v in r.ttft])
+        _print_latency("total", [v for r in results.values() for v in r.total])
+
+        print(f"\nevent-loop lag: p50 {_lag_quantile(lag_before, lag_after, 0.5)}, "
+              f"p99 {_lag_quantile(lag_before, lag_after, 0.99)}")
+        if server_pid is not None:
+            rss, hwm = _rss_mb(server_pid)
+            print(f"server RSS: {rss:.0f} MB at end, {max(peak_rss, rss):.0f} MB peak sampled, {hwm:.0f} MB high-water mark")
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if log is not subprocess.DEVNULL:
+            log.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Socket.IO load test for the chat path")
+    parser.add_argument("--clients",    type=int,   default=20, help="concurrent Socket.IO clients")
+    parser.add_argument("--rounds",     type=int,   default=1,  help="times each client repeats its script")
+    parser.add_argument("--think-ms",   type=float, default=0,  help="pause between a reply and the next message")
+    parser.add_argument("--url",        default=None, help="target an already-running server instead of starting one")
+    parser.add_argument("--port",       type=int,   default=8765, help="port for the spawned app server")
+    parser.add_argument("--fake-port",  type=int,   default=8900, help="port for the spawned fake OpenAI server")
+    parser.add_argument("--server-log", default=None, help="write server output here instead of discarding it")
+    fake_openai.add_arguments(parser)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
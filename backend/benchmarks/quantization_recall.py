@@ -0,0 +1,133 @@
+# benchmarks/quantization_recall.py
+#
+# Recall regression check for the quantized numpy vector store
+# (VECTOR_QUANTIZATION in src/rag/vector_store.py). For each mode it builds a
+# store from the same vectors and reports, against exact float32 search:
+#
+#   recall@k      share of the exact top-k found, with the re-score
+#                 (VECTOR_RERANK candidates per result) and without it (×1)
+#   index bytes   what has to stay resident for the first pass — codes
+#                 for int8 / pq, the whole float matrix for none
+#   query p50     per search
+#
+# Vectors come from --store (an index built by src/rag/indexer.py with the
+# numpy backend) or, by default, a synthetic clustered corpus shaped like
+# chunk embeddings: pages of overlapping chunks around a handful of topics.
+# Queries are corpus vectors with noise added — questions near real chunks.
+#
+# Exits with status 1 if a mode's re-scored recall@k is below --min-recall.
+#
+# Usage:
+#   cd backend/
+#   python -m benchmarks.quantization_recall
+#   python -m benchmarks.quantization_recall --store src/rag/numpy_store --top-k 8
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fake_openai import EMBED_DIM
+from benchmarks.load_test import _SERVER_ENV_DEFAULTS
+
+MODES = ("int8", "pq")
+
+
+def _synthetic(docs: int, rng: np.random.Generator) -> np.ndarray:
+    topics  = rng.standard_normal((max(1, docs // 400), EMBED_DIM), dtype=np.float32)
+    pages   = topics[rng.integers(len(topics), size=max(1, docs // 8))] + 0.6 * rng.standard_normal((max(1, docs // 8), EMBED_DIM), dtype=np.float32)
+    vectors = pages[np.arange(docs) // 8 % len(pages)] + 0.5 * rng.standard_normal((docs, EMBED_DIM), dtype=np.float32)
+    return vectors
+
+
+def _queries(vectors: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    unit    = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    picked  = unit[rng.integers(len(unit), size=count)]
+    queries = picked + 0.03 * rng.standard_normal(picked.shape, dtype=np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def _build(path: str, vectors: np.ndarray, quantization: str, dtype: str):
+    from src.rag.vector_store import NumpyVectorStore
+
+    store = NumpyVectorStore(path=path, dtype=dtype, create=True, quantization=quantization)
+    store.upsert(
+        [str(i) for i in range(len(vectors))], vectors,
+        [""] * len(vectors), [{"chunk": 0}] * len(vectors),
+    )
+    started = time.perf_counter()
+    store.save()
+    return NumpyVectorStore(path=path, dtype=dtype, quantization=quantization), time.perf_counter() - started
+
+
+def _index_bytes(path: str, quantization: str) -> int:
+    from src.rag.vector_store import _QUANTIZERS
+
+    files = _QUANTIZERS[quantization].FILES if quantization != "none" else ("vectors.npy",)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in files)
+
+
+def _recall(store, queries: np.ndarray, exact: list[set[str]], top_k: int) -> tuple[float, float]:
+    found, timings = 0, []
+    for query, truth in zip(queries, exact):
+        started = time.perf_counter()
+        hits    = store.query(query, top_k)
+        timings.append(time.perf_counter() - started)
+        found  += len(truth & {h["id"] for h in hits})
+    timings.sort()
+    return found / (len(queries) * top_k), timings[len(timings) // 2] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall of quantized vector search vs exact")
+    parser.add_argument("--store",      help="numpy store to take vectors from (default: synthetic)")
+    parser.add_argument("--docs",       type=int,   default=20000, help="synthetic vectors")
+    parser.add_argument("--queries",    type=int,   default=300)
+    parser.add_argument("--top-k",      type=int,   default=4)
+    parser.add_argument("--dtype",      default="float32", choices=("float32", "float16"), help="float rows used for the re-score")
+    parser.add_argument("--min-recall", type=float, default=0.98, help="re-scored recall@k limit")
+    args = parser.parse_args()
+
+    for key, value in _SERVER_ENV_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+    from src.rag.vector_store import NumpyVectorStore
+
+    rng = np.random.default_rng(0)
+    if args.store:
+        vectors = np.asarray(NumpyVectorStore(path=args.store, quantization="none")._vectors, dtype=np.float32)
+        print(f"{len(vectors)} vectors from {args.store}")
+    else:
+        vectors = _synthetic(args.docs, rng)
+        print(f"{len(vectors)} synthetic clustered vectors × {EMBED_DIM} dims")
+    queries = _queries(vectors, args.queries, rng)
+
+    failed = False
+    with tempfile.TemporaryDirectory() as root:
+        exact_store, _ = _build(os.path.join(root, "none"), vectors, "none", "float32")
+        exact = [{h["id"] for h in exact_store.query(q, args.top_k)} for q in queries]
+        base_bytes = _index_bytes(os.path.join(root, "none"), "none")
+        _, base_p50 = _recall(exact_store, queries, exact, args.top_k)
+
+        print(f"\n{'mode':<6} {'recall@' + str(args.top_k):>10} {'no re-score':>12} {'index':>10} {'smaller':>8} {'p50':>9} {'encode':>8}")
+        print(f"{'none':<6} {1.0:>10.4f} {1.0:>12.4f} {base_bytes / 2**20:>8.1f}MB {'1.0×':>8} {base_p50:>7.2f}ms {'-':>8}")
+        for mode in MODES:
+            path = os.path.join(root, mode)
+            store, encode = _build(path, vectors, mode, args.dtype)
+            recall, p50 = _recall(store, queries, exact, args.top_k)
+            store.rerank = 1
+            raw, _ = _recall(store, queries, exact, args.top_k)
+            size = _index_bytes(path, mode)
+            print(f"{mode:<6} {recall:>10.4f} {raw:>12.4f} {size / 2**20:>8.1f}MB {base_bytes / size:>7.1f}× {p50:>7.2f}ms {encode:>7.1f}s")
+            failed |= recall < args.min_recall
+
+    print(f"\n{'FAIL' if failed else 'PASS'}: re-scored recall@{args.top_k} limit {args.min_recall}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# benchmarks/retrieval_lag.py
+#
+# Does RAG retrieval stall other sessions? Runs --sessions simulated streaming
+# sessions (one frame every --frame-ms, like socket_server emitting
+# "bot-token") while --retrievers concurrent loops keep retrieving, first
+# through the blocking Retriever.query() called on the event loop, then
+# through Retriever.aquery(). Reports how late the streaming frames were —
+# i.e. event-loop lag as a client sees it (p50 / p99 / max) — and retrievals
+# per second.
+#
+# Embeddings come from benchmarks/fake_openai.py (started here) with
+# --latency-ms of simulated network time; the embedding cache is disabled so
+# every retrieval pays it. The index is --docs random vectors in a temporary
+# --backend store (src/rag/vector_store.py).
+#
+# Exits with status 1 if, on the async path, any frame was more than
+# --max-lag-ms late — usable as a regression check.
+#
+# Usage:
+#   cd backend/
+#   python -m benchmarks.retrieval_lag
+#   python -m benchmarks.retrieval_lag --sessions 50 --retrievers 8 --docs 50000 --latency-ms 200
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+import numpy as np
+
+from benchmarks.fake_openai import EMBED_DIM
+from benchmarks.load_test import _SERVER_ENV_DEFAULTS, _spawn, _wait_until_up
+
+
+def _store(docs: int, backend: str, path: str):
+    from src.rag.vector_store import ChromaVectorStore, NumpyVectorStore
+
+    rng       = np.random.default_rng(0)
+    vectors   = rng.standard_normal((docs, EMBED_DIM), dtype=np.float32)
+    documents = [f"synthetic chunk {i}" for i in range(docs)]
+    if backend == "chroma":
+        store = ChromaVectorStore(path=path, name=f"lag_{uuid.uuid4().hex[:8]}", create=True)
+    else:
+        store = NumpyVectorStore(path=path, create=True)
+    for i in range(0, docs, 5000):
+        store.upsert(
+            [str(j) for j in range(i, min(i + 5000, docs))],
+            vectors[i:i + 5000],
+            documents[i:i + 5000],
+            [{"url": "", "title": f"doc {j}", "chunk": 0} for j in range(i, min(i + 5000, docs))],
+        )
+    store.save()
+    print(f"index: {docs} random vectors, {backend} store")
+    return store
+
+
+# ── Load ──────────────────────────────────────────────────────────────────────
+
+async def _stream(frame: float, until: float, late: list[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while loop.time() < until:
+        due = loop.time() + frame
+        await asyncio.sleep(frame)
+        late.append(max(0.0, loop.time() - due))
+
+
+async def _retrieve(retriever, blocking: bool, until: float, done: list[int]) -> None:
+    loop = asyncio.get_running_loop()
+    while loop.time() < until:
+        text = f"How do I register with DAS? {uuid.uuid4().hex}"    # never an embedding-cache hit
+        if blocking:
+            retriever.query(text, top_k=4)
+            await asyncio.sleep(0)
+        else:
+            await retriever.aquery(text, top_k=4)
+        done[0] += 1
+
+
+async def _phase(name: str, retriever, blocking: bool, args: argparse.Namespace) -> float:
+    loop  = asyncio.get_running_loop()
+    until = loop.time() + args.seconds
+    late: list[float] = []
+    done  = [0]
+    await asyncio.gather(
+        *(_stream(args.frame_ms / 1000, until, late) for _ in range(args.sessions)),
+        *(_retrieve(retriever, blocking, until, done) for _ in range(args.retrievers)),
+    )
+
+    late.sort()
+    p50, p99, worst = (late[min(len(late) - 1, int(len(late) * q))] * 1000 for q in (0.5, 0.99, 1.0))
+    print(f"\n{name}")
+    print(f"  retrievals: {done[0] / args.seconds:.1f}/s")
+    print(f"  frame delay: p50 {p50:6.1f} ms   p99 {p99:6.1f} ms   max {worst:6.1f} ms   ({len(late)} frames)")
+    return worst
+
+
+async def _run(args: argparse.Namespace, path: str) -> int:
+    from src.rag.retriever import Retriever
+
+    retriever = Retriever(_store(args.docs, args.backend, path))
+    print(f"{args.sessions} streaming sessions (frame every {args.frame_ms:g} ms), "
+          f"{args.retrievers} concurrent retrievers, embeddings {args.latency_ms:g} ms, {args.seconds:g} s per phase")
+
+    await _phase("before: blocking Retriever.query() on the event loop", retriever, True, args)
+    worst = await _phase("after:  Retriever.aquery()", retriever, False, args)
+
+    ok = worst <= args.max_lag_ms
+    print(f"\n{'PASS' if ok else 'FAIL'}: worst frame delay with aquery() {worst:.1f} ms (limit {args.max_lag_ms:g} ms)")
+    return 0 if ok else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Event-loop lag during RAG retrieval")
+    parser.add_argument("--sessions",   type=int,   default=20,    help="simulated streaming sessions")
+    parser.add_argument("--frame-ms",   type=float, default=30,    help="interval between a session's frames")
+    parser.add_argument("--retrievers", type=int,   default=4,     help="concurrent retrieval loops")
+    parser.add_argument("--docs",       type=int,   default=20000, help="vectors in the synthetic index")
+    parser.add_argument("--seconds",    type=float, default=5,     help="duration of each phase")
+    parser.add_argument("--latency-ms", type=float, default=150,   help="fake embeddings latency")
+    parser.add_argument("--max-lag-ms", type=float, default=50,    help="async-phase frame delay limit")
+    parser.add_argument("--backend",    choices=("numpy", "chroma"), default="numpy", help="vector store backend")
+    parser.add_argument("--fake-port",  type=int,   default=8901)
+    args = parser.parse_args()
+
+    for key, value in _SERVER_ENV_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+    os.environ["OPENAI_BASE_URL"]      = f"http://127.0.0.1:{args.fake_port}/v1"
+    os.environ["EMBEDDING_CACHE_PATH"] = ""
+
+    fake = _spawn(
+        ["-m", "benchmarks.fake_openai", "--port", str(args.fake_port), "--latency-ms", str(args.latency_ms), "--jitter-ms", "0"],
+        dict(os.environ), subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(_wait_until_up(f"http://127.0.0.1:{args.fake_port}/v1/embeddings", fake))
+        with tempfile.TemporaryDirectory() as path:
+            status = asyncio.run(_run(args, path))
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
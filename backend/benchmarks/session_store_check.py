@@ -0,0 +1,138 @@
+# benchmarks/session_store_check.py
+#
+# Behaviour check for the session stores of src/session_store.py, run
+# against mongomock-motor by default so the Mongo store can be exercised
+# without a server:
+#
+#   round trip     save → load gives back the history, locale and metadata
+#   append only    a second save pushes only the new messages
+#   CAS            saving on a stale base raises VersionConflict
+#   rebase         commit() on a stale base keeps both workers' turns
+#   isolation      changing a loaded context (token, metadata) does not reach
+#                  the stored snapshot, and two loads share no metadata
+#   spill          InMemorySessionStore evicts to Mongo and loads back
+#
+# Exits with status 1 if any check fails.
+#
+# Usage:
+#   cd backend/
+#   pip install -r benchmarks/requirements.txt
+#   python -m benchmarks.session_store_check
+#   python -m benchmarks.session_store_check --mongo-uri mongodb://localhost:27017
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+
+from benchmarks.load_test import _SERVER_ENV_DEFAULTS
+
+_failed: list[str] = []
+
+
+def _check(name: str, ok: bool) -> None:
+    print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+    if not ok:
+        _failed.append(name)
+
+
+def _collection(mongo_uri: str | None):
+    name = f"session_store_check_{uuid.uuid4().hex[:8]}"
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        return AsyncIOMotorClient(mongo_uri)["medease_check"][name]
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()["medease_check"][name]
+
+
+def _context(key: str, *turns: str):
+    from src.agents.base_agent import AgentContext
+
+    history = [{"role": "system", "content": "system prompt"}]
+    for turn in turns:
+        history += [{"role": "user", "content": turn}, {"role": "assistant", "content": f"re: {turn}"}]
+    return AgentContext(session_id=key, user_id="u1", token="jwt", history=history, locale="es")
+
+
+def _turn(context, text: str):
+    return context.extended([{"role": "user", "content": text}, {"role": "assistant", "content": f"re: {text}"}])
+
+
+async def _check_store(label: str, store) -> None:
+    from src.session_store import VersionConflict
+
+    print(label)
+    key = f"u1:{uuid.uuid4().hex[:8]}"
+    context = _context(key, "first")
+    context.metadata["intent"] = "das_faq"
+    v1 = await store.commit(key, context, None)
+    loaded = await store.load(key)
+    _check("round trip", loaded is not None
+           and list(loaded.context.history) == list(context.history)
+           and loaded.context.locale == "es"
+           and loaded.context.metadata == {"intent": "das_faq"}
+           and loaded.version == 1)
+
+    await store.commit(key, _turn(loaded.context, "second"), loaded)
+    again = await store.load(key)
+    _check("append only", again.version == 2 and len(again.context.history) == 5 and again.length == 5)
+
+    try:
+        await store.save(key, _turn(loaded.context, "stale"), v1)
+        _check("CAS", False)
+    except VersionConflict:
+        _check("CAS", True)
+
+    rebased = await store.commit(key, _turn(loaded.context, "other worker"), loaded)
+    contents = [m["content"] for m in rebased.context.history]
+    _check("rebase", rebased.version == 3 and "second" in contents and "other worker" in contents)
+
+    a, b = await store.load(key), await store.load(key)
+    a.context.token = "changed"
+    a.context.metadata["intent"] = "medication_query"
+    c = await store.load(key)
+    _check("isolation", b.context.metadata.get("intent") == "das_faq"
+           and c.context.metadata.get("intent") == "das_faq"
+           and c.context.token != "changed"
+           and a.context.metadata is not b.context.metadata)
+
+
+async def _check_spill(collection) -> None:
+    from src.session_store import InMemorySessionStore, MongoSessionStore
+
+    print("in-memory, spilling to mongo")
+    store = InMemorySessionStore(spill=MongoSessionStore(collection))
+    key = f"u1:{uuid.uuid4().hex[:8]}"
+    await store.commit(key, _context(key, "first", "second"), None)
+    await store.evict(key)
+    loaded = await store.load(key)
+    _check("spill", loaded is not None and loaded.version == 1 and len(loaded.context.history) == 5)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from src.session_store import CachedSessionStore, InMemorySessionStore, MongoSessionStore
+
+    await _check_store("in-memory", InMemorySessionStore())
+    await _check_store("mongo", MongoSessionStore(_collection(args.mongo_uri)))
+    await _check_store("cached mongo", CachedSessionStore(MongoSessionStore(_collection(args.mongo_uri))))
+    await _check_spill(_collection(args.mongo_uri))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Session store behaviour check")
+    parser.add_argument("--mongo-uri", help="real MongoDB to use instead of mongomock-motor")
+    args = parser.parse_args()
+
+    for key, value in _SERVER_ENV_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+    asyncio.run(_main(args))
+
+    print(f"\n{'FAIL' if _failed else 'PASS'}: {len(_failed)} failed" + (f" ({', '.join(_failed)})" if _failed else ""))
+    sys.exit(1 if _failed else 0)
+
+
+if __name__ == "__main__":
+    main()
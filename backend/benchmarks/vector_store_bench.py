@@ -0,0 +1,169 @@
+# benchmarks/vector_store_bench.py
+#
+# Compares the vector-store backends of src/rag/vector_store.py on a synthetic
+# index of --docs random EMBED_DIM vectors (the DAS corpus is a few thousand
+# chunks):
+#
+#   build        upsert + save into an empty store
+#   cold start   in a fresh process: import the backend, open the store and
+#                answer the first query
+#   query        p50 / p99 over --queries searches for top-k, store warm
+#   RSS          of that process after the queries, and above a bare
+#                interpreter with NumPy loaded; split into anonymous memory
+#                and file-backed pages (the numpy store's memory-mapped files,
+#                which the kernel can drop again under memory pressure)
+#
+# Each backend is measured in its own subprocess so imports and caches don't
+# leak between them. Backends that are not installed (chromadb) are skipped.
+#
+# Usage:
+#   cd backend/
+#   python -m benchmarks.vector_store_bench
+#   python -m benchmarks.vector_store_bench --docs 20000 --backends numpy --dtype float16
+#   python -m benchmarks.vector_store_bench --docs 20000 --backends numpy --quantization int8
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fake_openai import EMBED_DIM
+from benchmarks.load_test import BACKEND_DIR, _SERVER_ENV_DEFAULTS, _rss_mb
+
+
+def _corpus(docs: int, seed: int = 0) -> tuple[np.ndarray, list[str], list[dict]]:
+    rng       = np.random.default_rng(seed)
+    vectors   = rng.standard_normal((docs, EMBED_DIM), dtype=np.float32)
+    documents = [f"synthetic chunk {i} " + "lorem ipsum " * 60 for i in range(docs)]
+    metadatas = [
+        {"url": f"https://accessibility.emory.edu/page-{i // 8}", "title": f"Page {i // 8}",
+         "description": "", "content_type": "html", "chunk": i % 8}
+        for i in range(docs)
+    ]
+    return vectors, documents, metadatas
+
+
+def _open(backend: str, path: str, create: bool = False):
+    from src.rag.vector_store import ChromaVectorStore, NumpyVectorStore
+
+    if backend == "chroma":
+        return ChromaVectorStore(path=path, create=create)
+    return NumpyVectorStore(path=path, create=create)
+
+
+# ── Child process ─────────────────────────────────────────────────────────────
+
+def _measure(args: argparse.Namespace) -> None:
+    """Runs in the subprocess: build or query one backend, print JSON."""
+    baseline = _rss_split_mb()[0]
+    if args.build:
+        vectors, documents, metadatas = _corpus(args.docs)
+        started = time.perf_counter()
+        store   = _open(args.measure, args.path, create=True)
+        for i in range(0, args.docs, 5000):
+            store.upsert([str(j) for j in range(i, min(i + 5000, args.docs))],
+                         vectors[i:i + 5000], documents[i:i + 5000], metadatas[i:i + 5000])
+        store.save()
+        print(json.dumps({"build_s": time.perf_counter() - started}))
+        return
+
+    queries = np.random.default_rng(1).standard_normal((args.queries, EMBED_DIM), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    started = time.perf_counter()
+    store   = _open(args.measure, args.path)
+    store.query(queries[0], args.top_k)
+    cold = time.perf_counter() - started
+
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        store.query(query, args.top_k)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    rss, hwm = _rss_mb(os.getpid())
+    anon, file = _rss_split_mb()
+    print(json.dumps({
+        "cold_s": cold,
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p99_ms": timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000,
+        "rss_mb": rss,
+        "hwm_mb": hwm,
+        "anon_mb": anon,
+        "file_mb": file,
+        "baseline_mb": baseline,
+    }))
+
+
+def _rss_split_mb() -> tuple[float, float]:
+    """(anonymous, file-backed) resident MB of this process."""
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("RssAnon", "RssFile"):
+                values[key] = int(rest.split()[0]) / 1024
+    return values.get("RssAnon", 0.0), values.get("RssFile", 0.0)
+
+
+# ── Parent ────────────────────────────────────────────────────────────────────
+
+def _child(args: argparse.Namespace, backend: str, path: str, build: bool) -> dict:
+    cmd = [
+        sys.executable, "-m", "benchmarks.vector_store_bench", "--measure", backend, "--path", path,
+        "--docs", str(args.docs), "--queries", str(args.queries), "--top-k", str(args.top_k),
+    ]
+    if build:
+        cmd.append("--build")
+    env = {**_SERVER_ENV_DEFAULTS, **os.environ, "VECTOR_DTYPE": args.dtype, "VECTOR_QUANTIZATION": args.quantization}
+    out = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _installed(backend: str) -> bool:
+    return backend == "numpy" or importlib.util.find_spec("chromadb") is not None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vector-store backend comparison")
+    parser.add_argument("--docs",     type=int, default=5000, help="vectors in the synthetic index")
+    parser.add_argument("--queries",  type=int, default=500,  help="timed queries per backend")
+    parser.add_argument("--top-k",    type=int, default=4)
+    parser.add_argument("--backends", default="numpy,chroma", help="comma-separated")
+    parser.add_argument("--dtype",    default="float32", choices=("float32", "float16"), help="numpy backend matrix dtype")
+    parser.add_argument("--quantization", default="none", choices=("none", "int8", "pq"), help="numpy backend first-pass codes")
+    parser.add_argument("--measure",  help=argparse.SUPPRESS)
+    parser.add_argument("--path",     help=argparse.SUPPRESS)
+    parser.add_argument("--build",    action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        _measure(args)
+        return
+
+    print(f"{args.docs} vectors × {EMBED_DIM} dims, top-{args.top_k}, {args.queries} queries, numpy dtype {args.dtype}, quantization {args.quantization}\n")
+    print(f"{'backend':<8} {'build':>8} {'cold start':>11} {'p50':>9} {'p99':>9} {'RSS':>8} {'anon':>8} {'file':>8} {'anon over base':>15}")
+    for backend in args.backends.split(","):
+        if not _installed(backend):
+            print(f"{backend:<8} skipped (not installed)")
+            continue
+        with tempfile.TemporaryDirectory() as path:
+            built = _child(args, backend, path, build=True)
+            run   = _child(args, backend, path, build=False)
+        print(
+            f"{backend:<8} {built['build_s']:>7.2f}s {run['cold_s'] * 1000:>9.0f}ms "
+            f"{run['p50_ms']:>7.2f}ms {run['p99_ms']:>7.2f}ms {run['rss_mb']:>6.0f}MB "
+            f"{run['anon_mb']:>6.0f}MB {run['file_mb']:>6.0f}MB {run['anon_mb'] - run['baseline_mb']:>13.0f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
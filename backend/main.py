@@ -1,19 +1,39 @@
 # main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from src.database import database
 from src.routes.auth import auth_router
 from src.routes.general import general_router
 from src.routes.waitlist import waitlist_router
+from src.routes.metrics import metrics_router
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from src.limiter import limiter
+from src import metrics
+from src.rag.answer_cache import answer_cache
+from src.warmup import warmup
 import socketio
 
 import src.socket_server as socket_server
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep references so the tasks are not garbage-collected
+    app.state.background = [
+        asyncio.create_task(metrics.monitor_event_loop_lag()),
+        asyncio.create_task(socket_server.sweep_sessions()),
+        asyncio.create_task(warmup.run(socket_server.orchestrator)),
+    ]
+    yield
+    for task in app.state.background:
+        task.cancel()
+    answer_cache.save()
+
 # Create FastAPI app
-api_app = FastAPI()
+api_app = FastAPI(lifespan=lifespan)
 api_app.state.limiter = limiter
 api_app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -33,11 +53,18 @@ api_app.add_middleware(
 api_app.include_router(auth_router,   prefix="/auth")
 api_app.include_router(general_router, prefix="/general")
 api_app.include_router(waitlist_router, prefix="/waitlist")
+api_app.include_router(metrics_router, prefix="/metrics")
 
 @api_app.get("/")
 def hello_world():
     return {"message":"Hello World"}
 
+@api_app.get("/ready")
+def ready():
+    # 503 until the startup warmup (src/warmup.py) has finished
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 # Now inject api_app into socket_server (also propagates to all agents)
 socket_server.set_api_app(api_app)
 
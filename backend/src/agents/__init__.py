@@ -1,4 +1,5 @@
-from src.agents.base_agent import AgentContext, AgentResponse, GuardrailResult, IntentResult, BaseAgent
+from src.agents.base_agent import AgentContext, AgentResponse, GuardrailResult, IntentResult, BaseAgent, WORKFLOW_LOCK_KEY
+from src.agents.conversation import History, Message
 from src.agents.orchestrator import Orchestrator
 
 __all__ = [
@@ -7,5 +8,8 @@ __all__ = [
     "GuardrailResult",
     "IntentResult",
     "BaseAgent",
+    "History",
+    "Message",
     "Orchestrator",
+    "WORKFLOW_LOCK_KEY",
 ]
@@ -4,11 +4,10 @@
 # Gathers required fields across turns, then generates a formatted letter.
 
 import json
-from openai import AsyncOpenAI
-from src.config import CHAT_GPT_API_KEY
-from src.agents.base_agent import AgentContext, AgentResponse, BaseAgent, language_directive
-
-_client = AsyncOpenAI(api_key=CHAT_GPT_API_KEY)
+from typing import AsyncGenerator
+from src import llm_gateway
+from src.agents.history import history_manager
+from src.agents.base_agent import AgentContext, AgentResponse, BaseAgent, WORKFLOW_LOCK_KEY, language_directive
 
 # Fields required before the letter can be generated
 REQUIRED_FIELDS = ["student_name", "disability_type", "accommodations_requested", "course_or_context"]
@@ -50,36 +49,35 @@ class AccommodationAgent(BaseAgent):
         missing = [f for f in REQUIRED_FIELDS if not fields.get(f)]
 
         if missing:
-            reply = await self._ask_for_fields(user_input, fields, context)
-            updated = AgentContext(
-                session_id=context.session_id,
-                user_id=context.user_id,
-                token=context.token,
-                history=context.history + [
-                    {"role": "user", "content": user_input},
-                    {"role": "assistant", "content": reply},
-                ],
-                locale=context.locale,
-                metadata={**context.metadata, "accommodation_fields": fields},
-            )
-            return AgentResponse(content=reply, updated_context=updated, done=True)
-
-        # All fields present — generate the letter
-        letter = await self._generate_letter(fields, locale=context.locale)
-        # Clear fields from metadata after generation
-        updated_metadata = {k: v for k, v in context.metadata.items() if k != "accommodation_fields"}
-        updated = AgentContext(
-            session_id=context.session_id,
-            user_id=context.user_id,
-            token=context.token,
-            history=context.history + [
+            stream = self._ask_for_fields(user_input, fields, context)
+        else:
+            # All fields present — generate the letter
+            stream = self._generate_letter(fields, locale=context.locale, deadline=context.deadline)
+
+        def finalize(reply: str, completed: bool = True) -> AgentContext:
+            metadata = context.metadata
+            if not missing and not completed:
+                # Letter stopped or timed out — keep the fields and the lock so
+                # the next turn can generate it again
+                metadata["accommodation_fields"] = fields
+                metadata[WORKFLOW_LOCK_KEY] = "accommodation_request"
+            elif missing:
+                metadata["accommodation_fields"] = fields
+                # Own the conversation while the form is partially filled
+                if any(fields.get(f) for f in REQUIRED_FIELDS):
+                    metadata[WORKFLOW_LOCK_KEY] = "accommodation_request"
+                else:
+                    metadata.pop(WORKFLOW_LOCK_KEY, None)
+            else:
+                # Letter generated — clear fields and release the workflow lock
+                metadata.pop("accommodation_fields", None)
+                metadata.pop(WORKFLOW_LOCK_KEY, None)
+            return context.extended([
                 {"role": "user", "content": user_input},
-                {"role": "assistant", "content": letter},
-            ],
-            locale=context.locale,
-            metadata=updated_metadata,
-        )
-        return AgentResponse(content=letter, updated_context=updated, done=True)
+                {"role": "assistant", "content": reply},
+            ])
+
+        return AgentResponse(content="", stream=True, stream_gen=stream, finalize=finalize, done=True)
 
     async def _extract_fields(self, user_input: str, existing_fields: dict, context: AgentContext) -> dict:
         """Ask GPT to pull any of the required fields out of the latest message."""
@@ -92,7 +90,10 @@ User message: "{user_input}"
 
 Return only the newly found fields as a JSON object. Return {{}} if nothing new was found."""
 
-        response = await _client.chat.completions.create(
+        response = await llm_gateway.chat(
+            "accommodation",
+            deadline=context.deadline,
+            hedge=True,
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": extract_prompt}],
             response_format={"type": "json_object"},
@@ -104,28 +105,32 @@ Return only the newly found fields as a JSON object. Return {{}} if nothing new
         except (json.JSONDecodeError, KeyError):
             return existing_fields
 
-    async def _ask_for_fields(self, user_input: str, fields: dict, context: AgentContext) -> str:
-        """Ask a follow-up question for the next missing field."""
+    def _ask_for_fields(self, user_input: str, fields: dict, context: AgentContext) -> AsyncGenerator[str, None]:
+        """Stream a follow-up question for the next missing field."""
         directive = language_directive(context.locale)
         gather_prompt = _GATHER_SYSTEM_PROMPT + (f"\n{directive}" if directive else "")
         messages = [
             {"role": "system", "content": gather_prompt},
-            *context.history[-4:],
+            *history_manager.window(context, "accommodation"),
             {"role": "user", "content": f"Fields collected so far: {json.dumps(fields)}"},
             {"role": "user", "content": user_input},
         ]
-        response = await _client.chat.completions.create(
+        return llm_gateway.stream_tokens(
+            "accommodation",
+            deadline=context.deadline,
             model="gpt-4o-mini",
             messages=messages,
             temperature=0.4,
         )
-        return response.choices[0].message.content
 
-    async def _generate_letter(self, fields: dict, locale: str = "en") -> str:
+    def _generate_letter(self, fields: dict, locale: str = "en", deadline: float | None = None) -> AsyncGenerator[str, None]:
+        """Stream the formatted accommodation letter."""
         user_prompt = _LETTER_USER_TEMPLATE.format(**fields)
         directive = language_directive(locale)
         letter_prompt = _LETTER_SYSTEM_PROMPT + (f"\n{directive}" if directive else "")
-        response = await _client.chat.completions.create(
+        return llm_gateway.stream_tokens(
+            "accommodation",
+            deadline=deadline,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": letter_prompt},
@@ -133,4 +138,3 @@ Return only the newly found fields as a JSON object. Return {{}} if nothing new
             ],
             temperature=0.3,
         )
-        return response.choices[0].message.content
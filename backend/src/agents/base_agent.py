@@ -1,9 +1,16 @@
 # src/agents/base_agent.py
 #
-# Shared data contracts and abstract base for all agents.
+# Shared data contracts and abstract base for all agents, and the per-stage
+# budget helpers (STAGE_BUDGETS) used by the Orchestrator and the agents.
 
+import asyncio
+import time
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
+from typing import Callable, Iterable
+
+from src.agents.conversation import History
+from src.config import STAGE_BUDGETS
 
 # Maps i18n locale codes (from react-i18next) to human-readable language names
 # used in the system-prompt language directive.
@@ -26,15 +33,34 @@ def language_directive(locale: str) -> str:
     return f"Respond in {name}."
 
 
+# metadata key holding the intent label of the agent that owns an in-progress
+# multi-turn workflow. While set, the Orchestrator skips intent classification
+# and routes follow-ups straight back to that agent.
+WORKFLOW_LOCK_KEY = "workflow_lock"
+
+
 @dataclass
 class AgentContext:
     """Carries all per-session state through the agent pipeline."""
     session_id: str
     user_id: str | None
     token: str | None                       # MedEase JWT
-    history: list[dict]                     # OpenAI message-format history
+    history: History                        # append-only view; reads as OpenAI message dicts
     locale: str = "en"                      # active UI locale from the frontend
-    metadata: dict = field(default_factory=dict)  # arbitrary agent-specific state
+    metadata: dict = field(default_factory=dict)  # per-session agent state, updated in place
+    deadline: float | None = None           # time.monotonic() by which this turn must finish
+
+    def __post_init__(self):
+        if not isinstance(self.history, History):
+            self.history = History.of(self.history)
+
+    def extended(self, messages: Iterable[dict]) -> "AgentContext":
+        """This context with `messages` appended to history. Earlier turns are not copied."""
+        return replace(self, history=self.history.extended(messages))
+
+    def time_left(self) -> float | None:
+        """Seconds until `deadline`, or None when the turn is unbounded."""
+        return None if self.deadline is None else self.deadline - time.monotonic()
 
 
 @dataclass
@@ -61,6 +87,13 @@ class AgentResponse:
     done: bool = True
     stream: bool = False                    # True → stream_gen carries the token stream
     stream_gen: object = None               # AsyncGenerator[str, None] when stream=True
+    # Streaming only: called with the full reply once the stream ends and
+    # returns the updated context. None → socket_server appends the turn itself.
+    # The second argument is `completed`: False when the stream was cut short.
+    finalize: Callable[[str, bool], AgentContext] | None = None
+    completed: bool = True                  # streaming only: False once stopped, cancelled or timed out
+    timings: dict = field(default_factory=dict)  # stage → wall time in ms, filled by the Orchestrator (and agents)
+    agent: str | None = None                # intent label (or "triage") that produced the reply
 
 
 class BaseAgent(ABC):
@@ -77,6 +110,45 @@ class BaseAgent(ABC):
 
         Returns:
             AgentResponse with the reply and optionally updated context.
-            Set stream=True and stream_gen=<AsyncGenerator> for streaming responses.
+            Set stream=True and stream_gen=<AsyncGenerator> for streaming responses,
+            plus finalize=<callable> if the context changes beyond the plain turn.
+            Build the updated context with context.extended([...]) and change
+            context.metadata in place rather than copying either.
         """
         ...
+
+
+# ── Stage budgets ─────────────────────────────────────────────────────────────
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+async def timed(coro, stage: str, timings: dict):
+    """
+    Await `coro`, recording its wall time under `stage`
+    (or `<stage>_cancelled` / `<stage>_timeout`).
+    """
+    start = time.perf_counter()
+    try:
+        result = await coro
+    except asyncio.CancelledError:
+        timings[f"{stage}_cancelled"] = _elapsed_ms(start)
+        raise
+    except asyncio.TimeoutError:
+        timings[f"{stage}_timeout"] = _elapsed_ms(start)
+        raise
+    timings[stage] = _elapsed_ms(start)
+    return result
+
+
+def stage_deadline(stage: str, context: AgentContext) -> float:
+    """The earlier of the stage budget and the request deadline."""
+    deadline = time.monotonic() + STAGE_BUDGETS[stage]
+    return deadline if context.deadline is None else min(deadline, context.deadline)
+
+
+async def budgeted(coro, stage: str, context: AgentContext, timings: dict):
+    """Await `coro` within its stage budget; raises asyncio.TimeoutError when exhausted."""
+    timeout = max(stage_deadline(stage, context) - time.monotonic(), 0)
+    return await timed(asyncio.wait_for(coro, timeout), stage, timings)
@@ -6,12 +6,10 @@
 
 import json
 import httpx
-from openai import AsyncOpenAI
-from src.config import CHAT_GPT_API_KEY
+from src import llm_gateway
+from src.agents.history import history_manager
 from src.agenticActions import tools
-from src.agents.base_agent import AgentContext, AgentResponse, BaseAgent, language_directive
-
-_client = AsyncOpenAI(api_key=CHAT_GPT_API_KEY)
+from src.agents.base_agent import AgentContext, AgentResponse, BaseAgent, WORKFLOW_LOCK_KEY, language_directive
 
 _SYSTEM_PROMPT = """\
 You are a friendly and knowledgeable caregiver assistant.
@@ -26,13 +24,18 @@ class CaregiverAgent(BaseAgent):
         self.api_app = api_app
 
     async def process(self, user_input: str, context: AgentContext) -> AgentResponse:
-        history = context.history + [{"role": "user", "content": user_input}]
+        # `turn` collects this turn's messages; the model sees them after the
+        # budgeted history window, and they are appended to history at the end.
+        window = history_manager.window(context, "caregiver")
+        turn   = [{"role": "user", "content": user_input}]
 
         directive = language_directive(context.locale)
         system = _SYSTEM_PROMPT + (f"\n{directive}" if directive else "")
-        gpt_resp = await _client.chat.completions.create(
+        gpt_resp = await llm_gateway.chat(
+            "caregiver",
+            deadline=context.deadline,
             model="gpt-4o-mini",
-            messages=[{"role": "system", "content": system}, *history],
+            messages=[{"role": "system", "content": system}, *window, *turn],
             functions=tools,
             function_call="auto",
         )
@@ -40,20 +43,20 @@ class CaregiverAgent(BaseAgent):
 
         # Plain-text reply
         if msg.content:
-            history.append({"role": "assistant", "content": msg.content})
-            updated = self._updated_context(context, history)
+            turn.append({"role": "assistant", "content": msg.content})
+            updated = self._updated_context(context, turn)
             return AgentResponse(content=msg.content, updated_context=updated, done=True)
 
         # Function call
         if msg.function_call:
-            return await self._handle_function_call(msg, history, context)
+            return await self._handle_function_call(msg, window, turn, context)
 
         # Fallback
         fallback = "I'm not sure how to help with that. Could you clarify what you need?"
-        history.append({"role": "assistant", "content": fallback})
-        return AgentResponse(content=fallback, updated_context=self._updated_context(context, history), done=True)
+        turn.append({"role": "assistant", "content": fallback})
+        return AgentResponse(content=fallback, updated_context=self._updated_context(context, turn), done=True)
 
-    async def _handle_function_call(self, msg, history: list, context: AgentContext) -> AgentResponse:
+    async def _handle_function_call(self, msg, window: list, turn: list, context: AgentContext) -> AgentResponse:
         fn_name = msg.function_call.name
         args = json.loads(msg.function_call.arguments)
 
@@ -61,7 +64,7 @@ class CaregiverAgent(BaseAgent):
             required = ["summary", "start_time", "end_time"]
             missing = [f for f in required if not args.get(f)]
             if missing:
-                return await self._ask_followup(msg, history, context)
+                return await self._ask_followup(msg, window, turn, context)
 
             payload = {
                 "summary": args.get("summary"),
@@ -77,7 +80,7 @@ class CaregiverAgent(BaseAgent):
             required = ["patient_email", "generated_key"]
             missing = [f for f in required if not args.get(f)]
             if missing:
-                return await self._ask_followup(msg, history, context)
+                return await self._ask_followup(msg, window, turn, context)
 
             payload = {
                 "patient_email": args.get("patient_email"),
@@ -88,28 +91,36 @@ class CaregiverAgent(BaseAgent):
         else:
             func_resp = {"error": f"Unknown function: {fn_name}"}
 
-        history.extend([
+        turn.extend([
             {"role": "assistant", "function_call": msg.function_call},
             {"role": "function", "name": fn_name, "content": json.dumps(func_resp)},
         ])
 
-        final = await _client.chat.completions.create(model="gpt-4o-mini", messages=history)
-        reply = final.choices[0].message.content
-        history.append({"role": "assistant", "content": reply})
+        # Stream the final summary of the function result
+        stream = llm_gateway.stream_tokens("caregiver", deadline=context.deadline, model="gpt-4o-mini", messages=[*window, *turn])
+
+        def finalize(reply: str, completed: bool = True) -> AgentContext:
+            turn.append({"role": "assistant", "content": reply})
+            return self._updated_context(context, turn)
 
-        return AgentResponse(content=reply, updated_context=self._updated_context(context, history), done=True)
+        return AgentResponse(content="", stream=True, stream_gen=stream, finalize=finalize, done=True)
 
-    async def _ask_followup(self, msg, history: list, context: AgentContext) -> AgentResponse:
-        history.append({"role": "assistant", "function_call": msg.function_call})
-        followup = await _client.chat.completions.create(
+    async def _ask_followup(self, msg, window: list, turn: list, context: AgentContext) -> AgentResponse:
+        turn.append({"role": "assistant", "function_call": msg.function_call})
+        followup = await llm_gateway.chat(
+            "caregiver",
+            deadline=context.deadline,
             model="gpt-4o-mini",
-            messages=history,
+            messages=[*window, *turn],
             functions=tools,
             function_call="auto",
         )
         question = followup.choices[0].message.content
-        history.append({"role": "assistant", "content": question})
-        return AgentResponse(content=question, updated_context=self._updated_context(context, history), done=True)
+        turn.append({"role": "assistant", "content": question})
+        # Still waiting on function arguments — keep follow-ups routed here
+        owner = context.metadata.get("intent", "caregiver_query")
+        updated = self._updated_context(context, turn, workflow_lock=owner)
+        return AgentResponse(content=question, updated_context=updated, done=True)
 
     async def _post(self, token: str | None, path: str, payload: dict) -> dict:
         headers = {"Authorization": f"Bearer {token}"} if token else {}
@@ -125,12 +136,9 @@ class CaregiverAgent(BaseAgent):
             return {"error": str(e)}
 
     @staticmethod
-    def _updated_context(context: AgentContext, history: list) -> AgentContext:
-        return AgentContext(
-            session_id=context.session_id,
-            user_id=context.user_id,
-            token=context.token,
-            history=history,
-            locale=context.locale,
-            metadata=context.metadata,
-        )
+    def _updated_context(context: AgentContext, turn: list, workflow_lock: str | None = None) -> AgentContext:
+        if workflow_lock is not None:
+            context.metadata[WORKFLOW_LOCK_KEY] = workflow_lock
+        else:
+            context.metadata.pop(WORKFLOW_LOCK_KEY, None)
+        return context.extended(turn)
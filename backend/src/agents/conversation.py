@@ -0,0 +1,133 @@
+# src/agents/conversation.py
+#
+# Compact, append-only conversation history.
+#
+# A session's messages live once, as __slots__ Message records, in a shared
+# ConversationLog. AgentContext.history is a History: an immutable view of the
+# first n records of that log. Extending a view appends to the log and returns
+# a new view — O(1) per message, no copy of earlier turns. Only if a stale view
+# is extended (the log has already grown past it) is its prefix copied into a
+# fresh log, so no view ever sees messages it did not add.
+#
+# History reads like the list of OpenAI message dicts it replaces: len(),
+# indexing, slicing and iteration all yield plain dicts, built on access.
+#
+# Usage:
+#   history = History.of([{"role": "system", "content": "..."}])
+#   history = history.extended([{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}])
+#   messages = [{"role": "system", "content": prompt}, *history[-6:]]
+
+from __future__ import annotations
+
+import sys
+from typing import Iterable, Iterator
+
+
+class Message:
+    """One chat message. `function_call` is always a plain {"name", "arguments"} dict."""
+
+    __slots__ = ("role", "content", "name", "function_call")
+
+    def __init__(self, role: str, content: str | None = None, name: str | None = None, function_call: dict | None = None):
+        self.role          = role
+        self.content       = content
+        self.name          = name
+        self.function_call = function_call
+
+    @classmethod
+    def from_dict(cls, message: dict) -> Message:
+        call = message.get("function_call")
+        if call is not None and not isinstance(call, dict):
+            # SDK FunctionCall object from a completion
+            call = {"name": call.name, "arguments": call.arguments}
+        return cls(message["role"], message.get("content"), message.get("name"), call)
+
+    def to_dict(self) -> dict:
+        """OpenAI message format. Keys that are None are left out."""
+        message = {"role": self.role}
+        if self.content is not None or self.function_call is None:
+            message["content"] = self.content
+        if self.name is not None:
+            message["name"] = self.name
+        if self.function_call is not None:
+            message["function_call"] = self.function_call
+        return message
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this record and its strings."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.role)
+        if self.content is not None:
+            size += sys.getsizeof(self.content)
+        if self.name is not None:
+            size += sys.getsizeof(self.name)
+        if self.function_call is not None:
+            size += sys.getsizeof(self.function_call) + sum(sys.getsizeof(v) for v in self.function_call.values())
+        return size
+
+
+class ConversationLog:
+    """Append-only message storage shared by every History view of a session."""
+
+    __slots__ = ("messages",)
+
+    def __init__(self, messages: list[Message] | None = None):
+        self.messages = messages if messages is not None else []
+
+
+class History:
+    """Immutable view of the first `length` messages of a ConversationLog."""
+
+    __slots__ = ("_log", "_length")
+
+    def __init__(self, log: ConversationLog, length: int):
+        self._log    = log
+        self._length = length
+
+    @classmethod
+    def of(cls, messages: Iterable[dict] = ()) -> History:
+        records = [Message.from_dict(m) for m in messages]
+        return cls(ConversationLog(records), len(records))
+
+    def extended(self, messages: Iterable[dict]) -> History:
+        """A new view with `messages` appended. This view is left unchanged."""
+        log = self._log
+        if len(log.messages) != self._length:
+            # Someone already extended this snapshot — branch off a private copy
+            log = ConversationLog(log.messages[:self._length])
+        log.messages.extend(Message.from_dict(m) for m in messages)
+        return History(log, len(log.messages))
+
+    @property
+    def log(self) -> ConversationLog:
+        return self._log
+
+    def nbytes(self, start: int = 0) -> int:
+        """Approximate memory held by messages [start:] of this view."""
+        messages = self._log.messages
+        return sum(messages[i].nbytes() for i in range(start, self._length))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            messages = self._log.messages
+            return [messages[i].to_dict() for i in range(self._length)[index]]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("history index out of range")
+        return self._log.messages[index].to_dict()
+
+    def __iter__(self) -> Iterator[dict]:
+        messages = self._log.messages
+        for i in range(self._length):
+            yield messages[i].to_dict()
+
+    def __reversed__(self) -> Iterator[dict]:
+        messages = self._log.messages
+        for i in range(self._length - 1, -1, -1):
+            yield messages[i].to_dict()
+
+    def __repr__(self) -> str:
+        return f"History({self._length} messages)"
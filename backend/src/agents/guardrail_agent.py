@@ -2,14 +2,17 @@
 #
 # First line of defense. Runs on every message before any other agent.
 # Blocks harmful/off-domain input; strips PII; returns sanitized text.
+#
+# Two tiers:
+#   1. Local rules — compiled regexes strip emails/phone numbers, block known
+#      prompt-injection phrasing, and allow clearly in-domain questions.
+#   2. GPT-4o-mini — only for messages the local tier cannot decide.
 
 import json
-from openai import AsyncOpenAI
-from src.config import CHAT_GPT_API_KEY
+import re
+from src import llm_gateway, metrics
 from src.agents.base_agent import AgentContext, GuardrailResult, language_directive
 
-_client = AsyncOpenAI(api_key=CHAT_GPT_API_KEY)
-
 _SYSTEM_PROMPT = """\
 You are a content safety filter for a healthcare + university accessibility app.
 
@@ -30,12 +33,98 @@ even if it is phrased awkwardly or contains sensitive medical topics.
 Return ONLY valid JSON — no markdown, no extra text."""
 
 
+# ── Local rules tier ──────────────────────────────────────────────────────────
+
+_EMAIL_RE = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+_PHONE_RE = re.compile(r"(?<![\w+])(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?!\w)")
+
+_INJECTION_RE = re.compile(
+    "|".join([
+        r"\b(?:ignore|disregard|forget|override)\b.{0,30}\b(?:previous|prior|above|earlier|system|all)\b.{0,20}\b(?:instructions?|prompts?|rules|messages?)",
+        r"\b(?:reveal|print|show|repeat|leak|output)\b.{0,20}\b(?:system prompt|your (?:instructions|prompt|rules))",
+        r"\byou are now\b.{0,30}\b(?:dan|unrestricted|unfiltered|jailbroken|developer mode)",
+        r"\b(?:jailbreak|do anything now|developer mode enabled)\b",
+        r"\bpretend\b.{0,30}\b(?:no (?:rules|restrictions|guidelines)|not bound)",
+        r"\bact as\b.{0,20}\b(?:unfiltered|uncensored|unrestricted)\b",
+        r"</?(?:system|assistant)>|\[/?INST\]",
+    ]),
+    re.IGNORECASE,
+)
+
+# Clearly in-domain phrasing: a question or request about the app's own topics.
+_IN_DOMAIN_RE = re.compile(
+    r"\b(?:das|disabilit(?:y|ies)|accessib\w*|accommodations?|accommodation letter|"
+    r"extended time|note[- ]?tak\w*|testing cent(?:er|re)|office hours|registration|register with|"
+    r"medications?|prescriptions?|dosage|dose|refill|pharmacy|side effects?|"
+    r"caregiver|patient data|reminders?|remind me|appointments?|advisor)\b",
+    re.IGNORECASE,
+)
+
+# Anything that needs the model's judgement even when in-domain: self-harm,
+# violence or misuse. Self-introductions go to the model too, since only it
+# can strip the name.
+_ESCALATE_RE = re.compile(
+    r"\b(?:kill|suicid\w*|self[- ]harm|overdos\w*|weapons?|bombs?|hack\w*|steal|illegal|"
+    r"get high|recreational|fake|forge\w*)\b",
+    re.IGNORECASE,
+)
+_NAME_HINT_RE = re.compile(r"\b(?i:my name is|call me)\b|\b(?:I am|I'm) [A-Z][a-z]+")
+
+_LOCAL_MAX_CHARS = 300
+
+
+def strip_pii(text: str) -> str:
+    text = _EMAIL_RE.sub("[EMAIL]", text)
+    return _PHONE_RE.sub("[PHONE]", text)
+
+
+def local_check(user_input: str) -> GuardrailResult | None:
+    """
+    Decide the message locally if possible. Returns None when the message is
+    uncertain and should go to the LLM tier.
+    """
+    if _INJECTION_RE.search(user_input):
+        return GuardrailResult(allowed=False, sanitized_input=user_input)
+
+    sanitized = strip_pii(user_input)
+    if (
+        len(sanitized) <= _LOCAL_MAX_CHARS
+        and _IN_DOMAIN_RE.search(sanitized)
+        and not _ESCALATE_RE.search(sanitized)
+        and not _NAME_HINT_RE.search(sanitized)
+    ):
+        return GuardrailResult(allowed=True, sanitized_input=sanitized)
+    return None
+
+
 class GuardrailAgent:
+    def __init__(self):
+        # Hit-rate counters — what share of traffic skips the network call
+        self.stats = {"local_allowed": 0, "local_blocked": 0, "llm": 0}
+
+    @property
+    def local_hit_rate(self) -> float:
+        total = sum(self.stats.values())
+        return (total - self.stats["llm"]) / total if total else 0.0
+
     async def check(self, user_input: str, context: AgentContext) -> GuardrailResult:
+        local = local_check(user_input)
+        if local is not None:
+            self.stats["local_allowed" if local.allowed else "local_blocked"] += 1
+            metrics.LOCAL_DECISIONS.inc(component="guardrail", tier="local")
+            return local
+
+        self.stats["llm"] += 1
+        metrics.LOCAL_DECISIONS.inc(component="guardrail", tier="llm")
+        # The model only ever sees the locally PII-stripped text
+        user_input = strip_pii(user_input)
         directive = language_directive(context.locale)
         system = _SYSTEM_PROMPT + (f"\n{directive} Apply this to the 'reason' field only." if directive else "")
 
-        response = await _client.chat.completions.create(
+        response = await llm_gateway.chat(
+            "guardrail",
+            deadline=context.deadline,
+            hedge=True,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system},
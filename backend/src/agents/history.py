@@ -0,0 +1,225 @@
+# src/agents/history.py
+#
+# Token-budgeted view of AgentContext.history for building prompts.
+#
+# The session history itself stays complete and append-only; agents ask the
+# HistoryManager for a window that fits their budget (HISTORY_BUDGETS):
+#
+#   [pinned system prompt] [summary of older turns] [older turns…] [recent turns]
+#
+#   - the session's leading system message(s) are always kept
+#   - the last HISTORY_KEEP_RECENT messages are always kept verbatim
+#   - older turns are added newest-first while they fit; bulky function-result
+#     payloads among them are replaced by a short stub before anything is dropped
+#   - turns older than the recent window are folded into a rolling summary,
+#     regenerated in the background (gateway stage "summary") once
+#     HISTORY_SUMMARY_BATCH new messages have aged out; until it lands the
+#     window simply holds fewer older turns
+#
+# Tokens are counted with tiktoken when it (and its encoding file) is
+# available, otherwise estimated as len(text) / 4. Loading the encoding may
+# download it, so it never happens on the event loop: src/warmup.py loads it
+# in a thread at startup (the Docker image bakes the file in), and a count on
+# the loop before that starts the load in the background and estimates.
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from dataclasses import dataclass
+
+from src import llm_gateway
+from src.config import HISTORY_BUDGETS, HISTORY_KEEP_RECENT, HISTORY_SUMMARY_BATCH
+
+_MESSAGE_OVERHEAD  = 4     # role + separators, per the OpenAI chat format
+_FUNCTION_STUB_MIN = 120   # function results above this many tokens are stubbed first
+_SUMMARY_MAX_TOKENS = 300
+
+_SUMMARY_PROMPT = """\
+You maintain a running summary of a conversation between a user and the MedEase assistant
+(healthcare, medications, caregiving, Emory DAS accommodations).
+Update the existing summary with the new messages. Keep names, dates, medications, requested
+accommodations, pending tasks and any decisions made. Drop greetings and small talk.
+Reply with the updated summary only, in at most 150 words."""
+
+_encoding = None
+_encoding_loaded  = False
+_encoding_loading = False
+_encoding_lock    = threading.Lock()
+
+
+def load_encoding():
+    """Load the tiktoken encoding (blocking — may download it). None if unavailable."""
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("o200k_base")   # gpt-4o family
+            except Exception as exc:
+                print(f"[history] tiktoken unavailable, estimating tokens from length: {exc!r}")
+            _encoding_loaded = True
+    return _encoding
+
+
+def _get_encoding():
+    """The encoding, or None while it is not loaded yet on the event loop (or unavailable)."""
+    global _encoding_loading
+    if _encoding_loaded:
+        return _encoding
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return load_encoding()              # scripts and worker threads may block
+    if not _encoding_loading:
+        _encoding_loading = True
+        loop.run_in_executor(None, load_encoding)
+    return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message: dict) -> int:
+    text = message.get("content") or ""
+    if message.get("function_call") is not None:
+        text += str(message["function_call"])   # name + JSON arguments, SDK object or dict
+    return count_tokens(text) + _MESSAGE_OVERHEAD
+
+
+@dataclass
+class _Summary:
+    text: str
+    upto: int                      # history[pinned:upto] is covered by `text`
+
+
+class HistoryManager:
+    """
+    Builds per-agent history windows and keeps one rolling summary per session.
+
+    Args:
+        budgets:       agent name → history token budget.
+        keep_recent:   trailing messages always sent verbatim.
+        summary_batch: aged-out messages that trigger a summary refresh.
+    """
+
+    def __init__(
+        self,
+        budgets: dict[str, int] = HISTORY_BUDGETS,
+        keep_recent: int = HISTORY_KEEP_RECENT,
+        summary_batch: int = HISTORY_SUMMARY_BATCH,
+    ):
+        self.budgets       = budgets
+        self.keep_recent   = keep_recent
+        self.summary_batch = summary_batch
+        self._summaries: dict[str, _Summary] = {}
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    def window(self, context, agent: str) -> list[dict]:
+        """History messages to send for `agent`, within its token budget."""
+        history = context.history
+        pinned  = _pinned_count(history)
+        summary = self._summaries.get(context.session_id)
+        start   = max(pinned, summary.upto if summary else pinned)
+        recent  = max(start, len(history) - self.keep_recent)
+
+        head = list(history[:pinned])
+        if summary is not None:
+            head.append({"role": "system", "content": f"Summary of the earlier conversation: {summary.text}"})
+        tail = list(history[recent:])
+
+        budget = self.budgets.get(agent, self.budgets["default"])
+        used   = sum(message_tokens(m) for m in head) + sum(message_tokens(m) for m in tail)
+        older: list[dict] = []
+        for i in range(recent - 1, start - 1, -1):
+            message = _stub_function_result(history[i])
+            cost    = message_tokens(message)
+            if used + cost > budget:
+                break
+            older.append(message)
+            used += cost
+        older.reverse()
+
+        self._maybe_refresh(context, pinned, recent)
+        return head + _trim_orphans(older + tail)
+
+    def forget(self, session_id: str) -> None:
+        """Drop a session's summary (call on disconnect)."""
+        self._summaries.pop(session_id, None)
+        task = self._refreshing.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+
+    # ── Rolling summary ───────────────────────────────────────────────────────
+
+    def _maybe_refresh(self, context, pinned: int, recent: int) -> None:
+        sid     = context.session_id
+        summary = self._summaries.get(sid)
+        covered = summary.upto if summary else pinned
+        if recent - covered < self.summary_batch or sid in self._refreshing:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(
+                self._refresh(sid, summary, list(context.history[covered:recent]), recent)
+            )
+        except RuntimeError:
+            return   # no running loop (offline scripts) — windows just stay summary-less
+        self._refreshing[sid] = task
+        task.add_done_callback(lambda _t: self._refreshing.pop(sid, None))
+
+    async def _refresh(self, sid: str, previous: _Summary | None, messages: list[dict], upto: int) -> None:
+        transcript = "\n".join(_transcript_line(m) for m in messages)
+        try:
+            response = await llm_gateway.chat(
+                "summary",
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": _SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Existing summary:\n{previous.text if previous else '(none)'}\n\nNew messages:\n{transcript}"},
+                ],
+                max_tokens=_SUMMARY_MAX_TOKENS,
+                temperature=0,
+            )
+        except Exception as exc:
+            print(f"[history] summary refresh failed for {sid}: {exc!r}")
+            return
+        text = (response.choices[0].message.content or "").strip()
+        if text and self._summaries.get(sid) is previous:
+            self._summaries[sid] = _Summary(text=text, upto=upto)
+
+
+def _pinned_count(history: list[dict]) -> int:
+    n = 0
+    while n < len(history) and history[n].get("role") == "system":
+        n += 1
+    return n
+
+
+def _stub_function_result(message: dict) -> dict:
+    if message.get("role") != "function" or message_tokens(message) < _FUNCTION_STUB_MIN:
+        return message
+    return {**message, "content": '{"note": "result omitted to save space"}'}
+
+
+def _trim_orphans(messages: list[dict]) -> list[dict]:
+    """A window must not open on a function result whose call was cut off."""
+    n = 0
+    while n < len(messages) and messages[n].get("role") == "function":
+        n += 1
+    return messages[n:]
+
+
+def _transcript_line(message: dict) -> str:
+    role = message.get("role", "")
+    if role == "function":
+        return f"function {message.get('name', '')}: {(message.get('content') or '')[:300]}"
+    if message.get("function_call") is not None:
+        return f"{role}: (calls a function)"
+    return f"{role}: {message.get('content') or ''}"
+
+
+history_manager = HistoryManager()
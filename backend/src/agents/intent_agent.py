@@ -2,13 +2,16 @@
 #
 # Classifies the user's intent and extracts relevant entities.
 # Routes decisions are made by the Orchestrator based on this output.
+#
+# A local nearest-centroid classifier (local_intent.py) answers first; the
+# LLM classifier only runs when the local confidence is below
+# CONFIDENCE_THRESHOLD.
 
 import json
-from openai import AsyncOpenAI
-from src.config import CHAT_GPT_API_KEY
+from src import llm_gateway, metrics
+from src.agents.history import history_manager
 from src.agents.base_agent import AgentContext, IntentResult
-
-_client = AsyncOpenAI(api_key=CHAT_GPT_API_KEY)
+from src.agents.local_intent import LocalIntentClassifier
 
 # Confidence threshold below which the Orchestrator will invoke TriageAgent.
 CONFIDENCE_THRESHOLD = 0.65
@@ -42,16 +45,38 @@ Return ONLY valid JSON — no markdown, no extra text."""
 
 
 class IntentAgent:
+    def __init__(self):
+        self.local = LocalIntentClassifier()
+        # Hit-rate counters — what share of traffic skips the network call
+        self.stats = {"local": 0, "llm": 0}
+
     async def classify(self, user_input: str, context: AgentContext) -> IntentResult:
+        # Triage follow-ups ("the second one") only make sense with history,
+        # which the local classifier does not see.
+        if not context.metadata.get("awaiting_triage_clarification"):
+            local = self.local.classify(user_input)
+            if local.confidence >= CONFIDENCE_THRESHOLD:
+                self.stats["local"] += 1
+                metrics.LOCAL_DECISIONS.inc(component="intent", tier="local")
+                return local
+
+        self.stats["llm"] += 1
+        metrics.LOCAL_DECISIONS.inc(component="intent", tier="llm")
+        return await self.classify_llm(user_input, context)
+
+    async def classify_llm(self, user_input: str, context: AgentContext) -> IntentResult:
         # Include last few turns for context without blowing the prompt
-        recent_history = context.history[-6:] if len(context.history) > 6 else context.history
+        recent_history = history_manager.window(context, "intent")
         messages = [
             {"role": "system", "content": _SYSTEM_PROMPT},
             *recent_history,
             {"role": "user", "content": user_input},
         ]
 
-        response = await _client.chat.completions.create(
+        response = await llm_gateway.chat(
+            "intent",
+            deadline=context.deadline,
+            hedge=True,
             model="gpt-4o-mini",
             messages=messages,
             response_format={"type": "json_object"},
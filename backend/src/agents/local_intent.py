@@ -0,0 +1,188 @@
+# src/agents/local_intent.py
+#
+# Local nearest-centroid intent classifier. Runs in front of the LLM
+# classifier in IntentAgent so that clear-cut messages never leave the process.
+#
+# Each utterance is embedded as an L2-normalised hashed bag of word n-grams and
+# character n-grams. One centroid per intent is precomputed from the labelled
+# examples in data/intent_examples.json; classification is a single
+# matrix-vector product against that centroid matrix.
+#
+# Confidence is a temperature-scaled softmax over the centroid similarities.
+# The temperature is fitted at build time by leave-one-out over the examples,
+# so a reported 0.8 means "right about 80% of the time" on in-domain data.
+#
+# Offline report (accuracy + latency of local vs LLM path):
+#   cd backend/
+#   python -m src.agents.local_intent            # local path only
+#   python -m src.agents.local_intent --llm      # also time the LLM classifier
+
+from __future__ import annotations
+
+import json
+import re
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from src.agents.base_agent import IntentResult
+
+EXAMPLES_PATH = Path(__file__).parent / "data" / "intent_examples.json"
+N_FEATURES    = 4096
+# Messages whose best centroid similarity is below this are treated as unseen
+# territory — the local answer is discarded regardless of the softmax margin.
+MIN_SIMILARITY = 0.15
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_TEMPERATURES = np.linspace(0.01, 0.5, 50)
+
+
+def _features(text: str) -> list[str]:
+    words = _TOKEN_RE.findall(text.lower())
+    feats = [f"w:{w}" for w in words]
+    feats += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        feats += [f"c:{padded[i:i + 4]}" for i in range(max(1, len(padded) - 3))]
+    return feats
+
+
+def embed(text: str) -> np.ndarray:
+    """Hashed n-gram embedding, L2-normalised. Stable across processes."""
+    vec = np.zeros(N_FEATURES, dtype=np.float32)
+    for feat in _features(text):
+        vec[zlib.crc32(feat.encode()) % N_FEATURES] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def _softmax(scores: np.ndarray, temperature: float) -> np.ndarray:
+    z = scores / temperature
+    z = z - z.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def _centroids(vectors: np.ndarray, label_ids: np.ndarray, n_labels: int) -> np.ndarray:
+    cents = np.zeros((n_labels, vectors.shape[1]), dtype=np.float32)
+    np.add.at(cents, label_ids, vectors)
+    norms = np.linalg.norm(cents, axis=1, keepdims=True)
+    return cents / np.where(norms == 0, 1, norms)
+
+
+def load_examples(path: Path = EXAMPLES_PATH) -> list[tuple[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [(text, label) for label, texts in data.items() for text in texts]
+
+
+def leave_one_out_scores(examples: list[tuple[str, str]], labels: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Similarity of every example to centroids built without it. Returns (scores, true label ids)."""
+    vectors   = np.stack([embed(t) for t, _ in examples])
+    label_ids = np.array([labels.index(l) for _, l in examples])
+    sums      = np.zeros((len(labels), N_FEATURES), dtype=np.float32)
+    np.add.at(sums, label_ids, vectors)
+
+    scores = np.empty((len(examples), len(labels)), dtype=np.float32)
+    for i, (vec, lid) in enumerate(zip(vectors, label_ids)):
+        held_out = sums.copy()
+        held_out[lid] -= vec
+        norms = np.linalg.norm(held_out, axis=1)
+        scores[i] = (held_out @ vec) / np.where(norms == 0, 1, norms)
+    return scores, label_ids
+
+
+def fit_temperature(scores: np.ndarray, label_ids: np.ndarray) -> float:
+    """Temperature minimising negative log-likelihood of the true labels."""
+    best_t, best_nll = 1.0, float("inf")
+    for t in _TEMPERATURES:
+        probs = _softmax(scores, t)
+        nll   = -np.log(probs[np.arange(len(label_ids)), label_ids] + 1e-9).mean()
+        if nll < best_nll:
+            best_t, best_nll = float(t), nll
+    return best_t
+
+
+class LocalIntentClassifier:
+    """
+    Nearest-centroid classifier over hashed n-gram embeddings.
+
+    Args:
+        examples: (utterance, label) pairs. Defaults to data/intent_examples.json.
+    """
+
+    def __init__(self, examples: list[tuple[str, str]] | None = None):
+        examples = examples if examples is not None else load_examples()
+        self.labels = sorted({label for _, label in examples})
+
+        vectors   = np.stack([embed(t) for t, _ in examples])
+        label_ids = np.array([self.labels.index(l) for _, l in examples])
+        self._centroids = _centroids(vectors, label_ids, len(self.labels))
+
+        scores, true_ids = leave_one_out_scores(examples, self.labels)
+        self.temperature = fit_temperature(scores, true_ids)
+
+    def classify(self, text: str) -> IntentResult:
+        scores = self._centroids @ embed(text)
+        best   = int(scores.argmax())
+        if scores[best] < MIN_SIMILARITY:
+            return IntentResult(intent=self.labels[best], confidence=0.0)
+        probs = _softmax(scores, self.temperature)
+        return IntentResult(intent=self.labels[best], confidence=float(probs[best]))
+
+
+# ── Offline report ────────────────────────────────────────────────────────────
+
+def _report(with_llm: bool) -> None:
+    import asyncio
+    from src.agents.base_agent import AgentContext
+    from src.agents.intent_agent import CONFIDENCE_THRESHOLD
+
+    examples = load_examples()
+    clf      = LocalIntentClassifier(examples)
+    scores, true_ids = leave_one_out_scores(examples, clf.labels)
+    probs    = _softmax(scores, clf.temperature)
+    preds    = probs.argmax(axis=1)
+    conf     = probs.max(axis=1)
+    confident = conf >= CONFIDENCE_THRESHOLD
+
+    print(f"Examples: {len(examples)}  labels: {len(clf.labels)}  temperature: {clf.temperature:.3f}")
+    print(f"Local (leave-one-out) accuracy:           {(preds == true_ids).mean():.1%}")
+    print(f"Share answered locally (conf >= {CONFIDENCE_THRESHOLD}):    {confident.mean():.1%}")
+    if confident.any():
+        print(f"Accuracy on locally answered messages:    {(preds[confident] == true_ids[confident]).mean():.1%}")
+
+    start = time.perf_counter()
+    for text, _ in examples:
+        clf.classify(text)
+    per_call = (time.perf_counter() - start) / len(examples)
+    print(f"Local latency: {per_call * 1e6:.0f} µs/message")
+
+    if not with_llm:
+        return
+
+    from src.agents.intent_agent import IntentAgent
+    agent   = IntentAgent()
+    context = AgentContext(session_id="report", user_id=None, token=None, history=[])
+
+    async def run() -> tuple[int, list[float]]:
+        correct, latencies = 0, []
+        for text, label in examples:
+            t0 = time.perf_counter()
+            result = await agent.classify_llm(text, context)
+            latencies.append(time.perf_counter() - t0)
+            correct += result.intent == label
+        return correct, latencies
+
+    correct, latencies = asyncio.run(run())
+    latencies.sort()
+    print(f"LLM accuracy:  {correct / len(examples):.1%}")
+    print(f"LLM latency:   p50 {latencies[len(latencies) // 2] * 1000:.0f} ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    import sys
+    _report(with_llm="--llm" in sys.argv)
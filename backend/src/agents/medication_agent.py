@@ -3,12 +3,10 @@
 # Thin wrapper around existing medication functionality.
 # Delegates complex extraction to ChatGPT.extract_medication_info().
 
-from openai import AsyncOpenAI
-from src.config import CHAT_GPT_API_KEY
+from src import llm_gateway
+from src.agents.history import history_manager
 from src.agents.base_agent import AgentContext, AgentResponse, BaseAgent, language_directive
 
-_client = AsyncOpenAI(api_key=CHAT_GPT_API_KEY)
-
 _SYSTEM_PROMPT = """\
 You are a helpful medication assistant within the MedEase app.
 Help the user understand their medications, schedules, side effects, and prescription details.
@@ -23,28 +21,22 @@ class MedicationAgent(BaseAgent):
         system = _SYSTEM_PROMPT + (f"\n{directive}" if directive else "")
         messages = [
             {"role": "system", "content": system},
-            *context.history[-6:],
+            *history_manager.window(context, "medication"),
             {"role": "user", "content": user_input},
         ]
 
-        response = await _client.chat.completions.create(
+        stream = llm_gateway.stream_tokens(
+            "medication",
+            deadline=context.deadline,
             model="gpt-4o-mini",
             messages=messages,
             temperature=0.3,
         )
 
-        reply = response.choices[0].message.content
-
-        updated = AgentContext(
-            session_id=context.session_id,
-            user_id=context.user_id,
-            token=context.token,
-            history=context.history + [
+        def finalize(reply: str, completed: bool = True) -> AgentContext:
+            return context.extended([
                 {"role": "user", "content": user_input},
                 {"role": "assistant", "content": reply},
-            ],
-            locale=context.locale,
-            metadata=context.metadata,
-        )
+            ])
 
-        return AgentResponse(content=reply, updated_context=updated, done=True)
+        return AgentResponse(content="", stream=True, stream_gen=stream, finalize=finalize, done=True)
@@ -3,14 +3,43 @@
 # Central router. The socket server calls orchestrator.handle() for every
 # user message. Runs: guardrail → intent → specialist agent.
 #
+# SPECULATIVE MODE: with SPECULATIVE_ROUTING=true the guardrail check, intent
+# classification and (for likely DAS questions) retrieval start concurrently.
+# The guardrail still has the final say — if it blocks, the speculative tasks
+# are cancelled and their results discarded. Per-stage wall times are
+# attached to every AgentResponse as `timings`.
+#
+# WORKFLOW AFFINITY: while an agent is mid-way through a multi-turn form
+# (accommodation fields, caregiver function arguments) it sets
+# metadata[WORKFLOW_LOCK_KEY] to its intent label. Follow-ups then skip intent
+# classification and go straight back to that agent, unless a cheap local
+# check detects an explicit topic change.
+#
+# DEADLINES: every turn gets context.deadline = now + REQUEST_DEADLINE, and
+# each stage runs within its STAGE_BUDGETS entry. Running out degrades rather
+# than hangs: a slow guardrail fails open (local PII stripping still
+# applies), a slow intent classifier hands over to triage, and a slow
+# specialist answers with a short "please try again" message.
+#
 # DEV MODE: if context.metadata["dev_mode"] is True, all LLM calls are
 # bypassed and a stub response is returned immediately. Toggle via the
-# Settings pane in the frontend — never ships to main.
+# Settings pane in the frontend — never ships to main. When the server runs
+# with LLM_CASSETTE_MODE=replay, dev mode instead runs the full pipeline
+# against the recorded cassette (src/llm_cassette.py), which is what
+# profiling needs.
 
 import asyncio
 import itertools
+import re
+import time
+from dataclasses import replace
 from typing import AsyncGenerator
-from src.agents.base_agent import AgentContext, AgentResponse
+from src import llm_cassette, metrics
+from src.config import SPECULATIVE_ROUTING, REQUEST_DEADLINE
+from src.llm_gateway import DeadlineExceeded
+from src.agents.base_agent import (
+    AgentContext, AgentResponse, GuardrailResult, IntentResult, WORKFLOW_LOCK_KEY, budgeted, stage_deadline,
+)
 
 _BLOCKED_PREFIX: dict[str, str] = {
     "en":    "I'm not able to help with that.",
@@ -28,6 +57,14 @@ _OUT_OF_SCOPE: dict[str, str] = {
     "ja":    "それは私がお手伝いできる範囲外です。医療に関するご質問はアプリの該当セクションをご利用ください。DAS に関するご質問は、Emory DAS オフィスに直接お問い合わせください。",
 }
 
+_TIMED_OUT: dict[str, str] = {
+    "en":    "Sorry, that took longer than expected. Please try again in a moment.",
+    "zh-CN": "抱歉，处理时间超出预期。请稍后再试。",
+    "ko":    "죄송합니다. 처리 시간이 예상보다 오래 걸렸습니다. 잠시 후 다시 시도해 주세요.",
+    "es":    "Lo siento, esto tardó más de lo esperado. Inténtalo de nuevo en un momento.",
+    "ja":    "申し訳ありません。処理に時間がかかりすぎました。しばらくしてからもう一度お試しください。",
+}
+
 _DEV_STUBS: dict[str, itertools.cycle] = {
     "en": itertools.cycle([
         "**[DEV]** Stub reply — pipeline connected. No LLM was called.",
@@ -68,7 +105,44 @@ async def _dev_stream(text: str) -> AsyncGenerator[str, None]:
     for i, word in enumerate(words):
         yield word if i == 0 else " " + word
         await asyncio.sleep(0.045)
-from src.agents.guardrail_agent import GuardrailAgent
+
+
+# Cheap lexical hint that a message is probably a DAS FAQ. Only used to decide
+# whether retrieval is worth starting speculatively — never for routing.
+_DAS_HINT = re.compile(
+    r"\b(das|disabilit\w*|accessib\w*|accommodat\w*|regist\w*|office hours|"
+    r"documentation|testing cent\w*|exam\w*)\b",
+    re.IGNORECASE,
+)
+
+
+# Explicit requests to abandon the current form-filling workflow
+_ESCAPE_RE = re.compile(
+    r"\b(cancel|never ?mind|nvm|stop|quit|start over|forget (it|that|about it)|"
+    r"something else|different (question|topic)|change (the )?(subject|topic))\b",
+    re.IGNORECASE,
+)
+# Local intent confidence needed to treat a follow-up as a topic change
+_ESCAPE_CONFIDENCE = 0.9
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+async def _deadline_guarded(gen: AsyncGenerator[str, None], locale: str, response: AgentResponse) -> AsyncGenerator[str, None]:
+    """Ends a stream with the timed-out message instead of an exception, marking `response` incomplete."""
+    try:
+        async for token in gen:
+            yield token
+    except DeadlineExceeded:
+        response.completed = False
+        yield _TIMED_OUT.get(locale, _TIMED_OUT["en"])
+    finally:
+        await gen.aclose()
+
+
+from src.agents.guardrail_agent import GuardrailAgent, strip_pii
 from src.agents.intent_agent import IntentAgent, CONFIDENCE_THRESHOLD
 from src.agents.triage_agent import TriageAgent
 from src.agents.rag_agent import RAGAgent
@@ -84,22 +158,27 @@ class Orchestrator:
     Args:
         api_app: The FastAPI app instance, forwarded to agents that need
                  in-process HTTP calls (caregiver, accommodation).
+        speculative: Run guardrail / intent / retrieval concurrently.
+                     Defaults to the SPECULATIVE_ROUTING config switch.
     """
 
-    def __init__(self, api_app=None):
-        self.guardrail = GuardrailAgent()
-        self.intent    = IntentAgent()
-        self.triage    = TriageAgent()
+    def __init__(self, api_app=None, speculative: bool = SPECULATIVE_ROUTING):
+        self.guardrail   = GuardrailAgent()
+        self.intent      = IntentAgent()
+        self.triage      = TriageAgent()
+        self.rag         = RAGAgent()
+        self.speculative = speculative
+        caregiver        = CaregiverAgent(api_app)
 
         # Specialist agents keyed by intent label
         self._agents = {
-            "das_faq":                RAGAgent(),
+            "das_faq":                self.rag,
             "accommodation_request":  AccommodationAgent(),
             "medication_query":       MedicationAgent(),
-            "caregiver_query":        CaregiverAgent(api_app),
-            "reminder_request":       CaregiverAgent(api_app),
+            "caregiver_query":        caregiver,
+            "reminder_request":       caregiver,
             "appointment_scheduling": TriageAgent(),   # hand off until scheduling agent exists
-            "general_chat":           CaregiverAgent(api_app),  # existing fallback behaviour
+            "general_chat":           caregiver,       # existing fallback behaviour
             "out_of_scope":           None,            # handled inline below
         }
 
@@ -110,29 +189,184 @@ class Orchestrator:
                 agent.api_app = api_app
 
     async def handle(self, user_input: str, context: AgentContext) -> AgentResponse:
-        # ── 0. Dev mode — bypass all LLM calls ───────────────────────────────
-        if context.metadata.get("dev_mode"):
+        # ── 0. Dev mode — bypass all LLM calls (unless replaying a cassette) ──
+        if context.metadata.get("dev_mode") and not llm_cassette.replaying():
             stubs = _DEV_STUBS.get(context.locale, _DEV_STUBS["en"])
             text  = next(stubs)
             return AgentResponse(content="", stream=True, stream_gen=_dev_stream(text), done=True)
 
+        timings: dict[str, float] = {}
+        context.deadline = time.monotonic() + REQUEST_DEADLINE
+        if self.speculative:
+            return await self._handle_speculative(user_input, context, timings)
+
         # ── 1. Guardrail ──────────────────────────────────────────────────────
-        guard = await self.guardrail.check(user_input, context)
+        try:
+            guard = await budgeted(self.guardrail.check(user_input, context), "guardrail", context, timings)
+        except asyncio.TimeoutError:
+            guard = self._guardrail_fallback(user_input)
         if not guard.allowed:
-            prefix = _BLOCKED_PREFIX.get(context.locale, _BLOCKED_PREFIX["en"])
-            reason = f" {guard.block_reason}" if guard.block_reason else ""
-            return AgentResponse(content=f"{prefix}{reason}", done=True)
+            return self._blocked(guard, context, timings)
         sanitized = guard.sanitized_input
 
         # ── 2. Intent classification ──────────────────────────────────────────
         # If the previous turn was a triage clarification, still classify but
         # the triage context is already in history so confidence should be higher.
-        intent_result = await self.intent.classify(sanitized, context)
+        owner = self._workflow_owner(sanitized, context)
+        if owner is not None:
+            intent_result = IntentResult(intent=owner, confidence=1.0)
+        else:
+            intent_result = await self._classify(self.intent.classify(sanitized, context), context, timings)
 
         # ── 3. Route ──────────────────────────────────────────────────────────
+        return await self._route(sanitized, intent_result, context, timings)
+
+    async def _handle_speculative(self, user_input: str, context: AgentContext, timings: dict) -> AgentResponse:
+        """
+        Start guardrail, intent and (maybe) retrieval at once. Intent and
+        retrieval see the raw input rather than the guardrail's sanitized text;
+        that is the price of not waiting for the guardrail.
+        """
+        # Only released once the guardrail lets the message through, below
+        owner = self._workflow_owner(user_input, context, release=False)
+        guard_task  = asyncio.create_task(
+            budgeted(self.guardrail.check(user_input, context), "guardrail", context, timings)
+        )
+        intent_task = retrieval_task = None
+        if owner is None:
+            intent_task = asyncio.create_task(self._classify(self.intent.classify(user_input, context), context, timings))
+            if self._likely_das_faq(user_input, context):
+                retrieval_task = asyncio.create_task(
+                    budgeted(self.rag.retrieve(user_input), "retrieval", context, timings)
+                )
+        speculative = [t for t in (intent_task, retrieval_task) if t is not None]
+
+        try:
+            guard = await guard_task
+        except asyncio.TimeoutError:
+            guard = self._guardrail_fallback(user_input)
+        except BaseException:
+            _cancel(speculative)
+            raise
+        if not guard.allowed:
+            _cancel(speculative)
+            return self._blocked(guard, context, timings)
+        if owner is None:
+            context.metadata.pop(WORKFLOW_LOCK_KEY, None)   # the user changed topic (no-op without a lock)
+
+        if intent_task is None:
+            return await self._route(guard.sanitized_input, IntentResult(intent=owner, confidence=1.0), context, timings)
+
+        try:
+            intent_result = await intent_task
+        except BaseException:
+            _cancel(speculative)
+            raise
+
+        prefetched = None
+        if retrieval_task is not None:
+            if intent_result.intent == "das_faq" and intent_result.confidence >= CONFIDENCE_THRESHOLD:
+                try:
+                    prefetched = await retrieval_task
+                except Exception as exc:
+                    # Let RAGAgent retry the retrieval itself on the normal path
+                    print(f"[Orchestrator] Speculative retrieval failed: {exc!r}")
+            else:
+                retrieval_task.cancel()
+
+        return await self._route(guard.sanitized_input, intent_result, context, timings, prefetched)
+
+    @staticmethod
+    async def _classify(coro, context: AgentContext, timings: dict) -> IntentResult:
+        """Intent classification within its budget. A timeout routes to triage."""
+        try:
+            return await budgeted(coro, "intent", context, timings)
+        except asyncio.TimeoutError:
+            return IntentResult(intent="general_chat", confidence=0.0)
+
+    @staticmethod
+    def _guardrail_fallback(user_input: str) -> GuardrailResult:
+        # Same fail-open policy as a guardrail parse error, minus the PII
+        return GuardrailResult(allowed=True, sanitized_input=strip_pii(user_input))
+
+    def _workflow_owner(self, user_input: str, context: AgentContext, release: bool = True) -> str | None:
+        """
+        Intent label of the agent holding the workflow lock, or None if there
+        is no lock or the user is clearly changing topic (which releases it,
+        unless release=False — the caller then releases it itself).
+        """
+        owner = context.metadata.get(WORKFLOW_LOCK_KEY)
+        if owner is None:
+            return None
+
+        escaped = bool(_ESCAPE_RE.search(user_input))
+        if not escaped:
+            local = self.intent.local.classify(user_input)
+            escaped = (
+                local.confidence >= _ESCAPE_CONFIDENCE
+                and self._agents.get(local.intent) is not self._agents.get(owner)
+            )
+        if escaped:
+            # Released in place so the lock does not follow the session into
+            # whichever agent handles this turn.
+            if release:
+                context.metadata.pop(WORKFLOW_LOCK_KEY, None)
+            return None
+        return owner
+
+    def _likely_das_faq(self, user_input: str, context: AgentContext) -> bool:
+        return context.metadata.get("intent") == "das_faq" or bool(_DAS_HINT.search(user_input))
+
+    @staticmethod
+    def _blocked(guard: GuardrailResult, context: AgentContext, timings: dict) -> AgentResponse:
+        prefix = _BLOCKED_PREFIX.get(context.locale, _BLOCKED_PREFIX["en"])
+        reason = f" {guard.block_reason}" if guard.block_reason else ""
+        return AgentResponse(content=f"{prefix}{reason}", done=True, timings=timings)
+
+    async def _route(
+        self,
+        sanitized: str,
+        intent_result: IntentResult,
+        context: AgentContext,
+        timings: dict,
+        prefetched_chunks: list[dict] | None = None,
+    ) -> AgentResponse:
+        start = time.perf_counter()
+        label = intent_result.intent if intent_result.confidence >= CONFIDENCE_THRESHOLD else "triage"
+        metrics.current_intent.set(label)
+        deadline = stage_deadline("generation", context)
+        try:
+            response = await asyncio.wait_for(
+                self._dispatch(sanitized, intent_result, context, prefetched_chunks, deadline),
+                max(deadline - time.monotonic(), 0),
+            )
+        except asyncio.TimeoutError:
+            timings["agent_timeout"] = _elapsed_ms(start)
+            return AgentResponse(
+                content=_TIMED_OUT.get(context.locale, _TIMED_OUT["en"]),
+                done=True,
+                timings=timings,
+                agent=label,
+            )
+        timings["agent"] = _elapsed_ms(start)
+        if response.stream and response.stream_gen is not None:
+            response.stream_gen = _deadline_guarded(response.stream_gen, context.locale, response)
+        timings.update(response.timings)     # stages the agent timed itself (RAG retrieval)
+        response.timings = timings
+        response.agent   = label
+        return response
+
+    async def _dispatch(
+        self,
+        sanitized: str,
+        intent_result: IntentResult,
+        context: AgentContext,
+        prefetched_chunks: list[dict] | None,
+        deadline: float,
+    ) -> AgentResponse:
         if intent_result.confidence < CONFIDENCE_THRESHOLD:
             # Not confident enough — ask a clarifying question
-            return await self.triage.process(sanitized, context)
+            return await self.triage.process(sanitized, replace(context, deadline=deadline))
 
         if intent_result.intent == "out_of_scope":
             return AgentResponse(
@@ -143,19 +377,19 @@ class Orchestrator:
         agent = self._agents.get(intent_result.intent, self.triage)
 
         # Store detected intent/entities in metadata for the agent to use if needed
-        enriched_context = AgentContext(
-            session_id=context.session_id,
-            user_id=context.user_id,
-            token=context.token,
-            history=context.history,
-            locale=context.locale,
-            metadata={
-                **context.metadata,
-                "intent": intent_result.intent,
-                "confidence": intent_result.confidence,
-                "entities": intent_result.entities,
-                "awaiting_triage_clarification": False,
-            },
-        )
+        metadata = context.metadata
+        metadata["intent"]     = intent_result.intent
+        metadata["confidence"] = intent_result.confidence
+        metadata["entities"]   = intent_result.entities
+        metadata["awaiting_triage_clarification"] = False
+        if prefetched_chunks is not None:
+            metadata["prefetched_chunks"] = prefetched_chunks   # consumed by RAGAgent this turn
+        else:
+            metadata.pop("prefetched_chunks", None)
+
+        return await agent.process(sanitized, replace(context, deadline=deadline))
+
 
-        return await agent.process(sanitized, enriched_context)
+def _cancel(tasks: list[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
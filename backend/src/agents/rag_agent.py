@@ -1,17 +1,40 @@
 # src/agents/rag_agent.py
 #
 # Answers questions grounded in the Emory DAS corpus via RAG.
-# Responses stream token-by-token via AsyncOpenAI.
-# Retrieval is handled by src/rag/retriever.py (ChromaDB).
+# Responses stream token-by-token via the shared LLM gateway.
+# Retrieval is handled by src/rag/retriever.py (ChromaDB or the built-in NumPy
+# index, see src/rag/vector_store.py).
+#
+# Retrieval starts with BM25 (src/rag/bm25.py). A question it answers
+# confidently needs no embedding at all and skips the answer cache. Other
+# self-contained questions go through the semantic answer cache
+# (src/rag/answer_cache.py): the question is embedded once, a close enough
+# cached answer is replayed as a stream, and otherwise the same embedding is
+# used for retrieval and the completed answer is cached. Follow-ups that lean
+# on the conversation ("what about the deadline for that?") bypass the cache.
+# The cache is shared by every student, so answers meant for it are generated
+# without the conversation history — nothing personal ends up in them.
+#
+# Retrieval over-fetches RAG_FETCH_K chunks; src/rag/context_packer.py merges,
+# dedupes and fits them into the RAG_CONTEXT_TOKENS prompt budget. Retrieval
+# (with the answer-cache lookup) runs within the "retrieval" STAGE_BUDGETS
+# entry; when that runs out the question is answered without context.
 
 from __future__ import annotations
+import asyncio
+import re
 from typing import AsyncGenerator
 
-from openai import AsyncOpenAI
-from src.config import CHAT_GPT_API_KEY
-from src.agents.base_agent import AgentContext, AgentResponse, BaseAgent, language_directive
+import numpy as np
 
-_client = AsyncOpenAI(api_key=CHAT_GPT_API_KEY)
+from src import llm_gateway, metrics
+from src.config import ANSWER_CACHE_ENABLED, RAG_FETCH_K
+from src.rag.answer_cache import LOOKUPS, answer_cache
+from src.rag.context_packer import pack
+from src.agents.history import history_manager
+from src.agents.base_agent import AgentContext, AgentResponse, BaseAgent, budgeted, language_directive
+from src.rag.indexer import corpus_version
+from src.rag.retriever import EMBED_MODEL, lexical_only
 
 _SYSTEM_PROMPT = """\
 You are a knowledgeable Emory DAS (Disability & Accessibility Services) advisor.
@@ -30,6 +53,23 @@ If the answer is not covered, say you don't have that specific information and s
 
 Student question: {question}"""
 
+# Words that usually point back at earlier turns. Deliberately broad: a wrong
+# bypass costs one generation, a wrong hit gives the wrong answer.
+_FOLLOW_UP_RE = re.compile(
+    r"^\s*(and|but|so|also|then|what about|how about)\b"
+    r"|\b(it|its|that|this|these|those|they|them|their|he|she|him|her|same|above|"
+    r"previous|earlier|again|else|more|instead)\b",
+    re.IGNORECASE,
+)
+_MIN_CACHEABLE_WORDS = 3
+_REPLAY_FRAME_CHARS  = 48
+
+CONTEXT_TOKENS = metrics.counter(
+    "medease_rag_context_tokens_total",
+    "RAG prompt context tokens: packed into prompts, and saved by merging and dedupe.",
+    ("kind",),
+)
+
 _NO_RAG_PROMPT_TEMPLATE = """\
 Answer the following question about Emory DAS (Disability & Accessibility Services) as best you can.
 Recommend the student visit the DAS website or office for authoritative information.
@@ -39,8 +79,8 @@ Student question: {question}"""
 
 class RAGAgent(BaseAgent):
     def __init__(self):
-        # Retriever is imported lazily so the app starts even if ChromaDB
-        # is not yet installed or the corpus has not been indexed yet.
+        # Retriever is imported lazily so the app starts even if the vector
+        # store's backend is not installed or the corpus has not been indexed yet.
         self._retriever = None
 
     def _get_retriever(self):
@@ -53,6 +93,26 @@ class RAGAgent(BaseAgent):
                 self._retriever = None
         return self._retriever
 
+    def warm(self) -> bool:
+        """
+        Open the vector store and load its index (blocking — src/warmup.py runs
+        it off the event loop at startup). False if there is no vector store.
+        """
+        retriever = self._get_retriever()
+        if retriever is None:
+            return False
+        retriever.warm()
+        return True
+
+    def _pack(self, chunks: list[dict]) -> list[dict]:
+        if not chunks:
+            return chunks
+        passages, stats = pack(chunks)
+        CONTEXT_TOKENS.inc(stats.tokens, kind="packed")
+        CONTEXT_TOKENS.inc(stats.saved, kind="saved")
+        print(f"[RAGAgent] context: {stats}")
+        return passages
+
     def _build_context_str(self, chunks: list[dict]) -> str:
         """Format retrieved chunks into a context block with source labels."""
         parts = []
@@ -61,7 +121,7 @@ class RAGAgent(BaseAgent):
             parts.append(f"[{label}]\n{chunk['text']}")
         return "\n\n".join(parts)
 
-    def _build_messages(self, user_input: str, context: AgentContext, chunks: list[dict]) -> list[dict]:
+    def _build_messages(self, user_input: str, context: AgentContext, chunks: list[dict], with_history: bool = True) -> list[dict]:
         if chunks:
             user_prompt = _RAG_PROMPT_TEMPLATE.format(
                 context=self._build_context_str(chunks),
@@ -75,33 +135,129 @@ class RAGAgent(BaseAgent):
 
         return [
             {"role": "system", "content": system},
-            *context.history[-6:],
+            *(history_manager.window(context, "rag") if with_history else ()),
             {"role": "user", "content": user_prompt},
         ]
 
-    async def _stream(self, messages: list[dict]) -> AsyncGenerator[str, None]:
-        stream = await _client.chat.completions.create(
+    def _stream(self, messages: list[dict], deadline: float | None = None) -> AsyncGenerator[str, None]:
+        return llm_gateway.stream_tokens(
+            "rag",
+            deadline=deadline,
             model="gpt-4o-mini",
             messages=messages,
             temperature=0.3,
-            stream=True,
         )
-        async for chunk in stream:
-            token = chunk.choices[0].delta.content
-            if token:
-                yield token
 
-    async def process(self, user_input: str, context: AgentContext) -> AgentResponse:
+    async def _embed(self, user_input: str, context: AgentContext) -> np.ndarray | None:
+        """Query embedding for the cache lookup (reused for retrieval); None if it fails."""
+        try:
+            return await self._get_retriever().aembed(user_input, context.deadline)
+        except Exception as exc:
+            print(f"[RAGAgent] query embedding failed, skipping the answer cache: {exc!r}")
+            return None
+
+    async def retrieve(self, user_input: str, top_k: int = RAG_FETCH_K) -> list[dict]:
+        """
+        Fetch the top-k candidate chunks. Used by the Orchestrator to start
+        retrieval speculatively, before intent classification finishes.
+        """
+        retriever = self._get_retriever()
+        if retriever is None:
+            return []
+        return await retriever.aquery(user_input, top_k)
+
+    async def _lookup(
+        self, user_input: str, context: AgentContext, chunks: list[dict] | None,
+    ) -> tuple[list[dict], tuple | None, str | None]:
+        """
+        Everything before generation: (chunks, the answer-cache key or None if
+        the answer is not to be cached, a cached answer if one matched).
+        """
         retriever = self._get_retriever()
-        chunks = retriever.query(user_input, top_k=4) if retriever else []
-        messages = self._build_messages(user_input, context, chunks)
+        if retriever is None:
+            return chunks or [], None, None
+        lexical = None
+        if chunks is None:
+            # BM25 first: a confident lexical answer needs no embedding
+            lexical, chunks = await retriever.alexical(user_input, RAG_FETCH_K)
+        embedding = None
+        cache_key = None
+        if ANSWER_CACHE_ENABLED and not (chunks and lexical_only(chunks)):
+            if _depends_on_history(user_input, context):
+                LOOKUPS.inc(outcome="bypass")
+            else:
+                embedding = await self._embed(user_input, context)
+        if embedding is not None:
+            cache_key = (user_input, embedding, context.locale, corpus_version(), EMBED_MODEL)
+            answer    = answer_cache.lookup(embedding, *cache_key[2:])
+            if answer is not None:
+                return [], cache_key, answer
+
+        if chunks is None:
+            if embedding is None:
+                embedding = await retriever.aembed(user_input, context.deadline)
+            chunks = await retriever.asearch(embedding, top_k=RAG_FETCH_K, lexical=lexical)
+        return chunks, cache_key, None
+
+    async def process(self, user_input: str, context: AgentContext) -> AgentResponse:
+        # Chunks may already have been fetched speculatively by the Orchestrator
+        prefetched = context.metadata.pop("prefetched_chunks", None)
+        timings: dict[str, float] = {}       # merged into response.timings by the Orchestrator
+        try:
+            chunks, cache_key, answer = await budgeted(
+                self._lookup(user_input, context, prefetched), "retrieval", context,
+                timings if prefetched is None else {},   # a prefetch was timed by the Orchestrator
+            )
+        except asyncio.TimeoutError:
+            print("[RAGAgent] retrieval over its budget, answering without retrieved context")
+            chunks, cache_key, answer = [], None, None
+        if answer is not None:
+            return AgentResponse(content="", stream=True, stream_gen=_replay(answer), updated_context=None, done=True, timings=timings)
+
+        chunks    = self._pack(chunks)
+        cacheable = cache_key is not None and bool(chunks)
+        # A cached answer is replayed to other students: keep their history out of it
+        messages  = self._build_messages(user_input, context, chunks, with_history=not cacheable)
+        stream    = self._stream(messages, context.deadline)
+        if cacheable:
+            stream = _caching(stream, cache_key)
 
         return AgentResponse(
             content="",
             stream=True,
-            stream_gen=self._stream(messages),
+            stream_gen=stream,
             # updated_context is built by socket_server once the stream completes,
             # since the full reply text isn't known until then.
             updated_context=None,
             done=True,
+            timings=timings,
         )
+
+
+def _depends_on_history(user_input: str, context: AgentContext) -> bool:
+    """True for follow-ups whose answer depends on earlier turns."""
+    if not any(m.get("role") == "user" for m in reversed(context.history)):
+        return False                     # first question of the session
+    return len(user_input.split()) < _MIN_CACHEABLE_WORDS or bool(_FOLLOW_UP_RE.search(user_input))
+
+
+async def _replay(answer: str) -> AsyncGenerator[str, None]:
+    """A cached answer as a token stream, so the client path is unchanged."""
+    for i in range(0, len(answer), _REPLAY_FRAME_CHARS):
+        yield answer[i:i + _REPLAY_FRAME_CHARS]
+        await asyncio.sleep(0)
+
+
+async def _caching(stream: AsyncGenerator[str, None], cache_key: tuple) -> AsyncGenerator[str, None]:
+    """Pass `stream` through and cache the answer — only if it ran to completion."""
+    parts = []
+    try:
+        async for delta in stream:
+            parts.append(delta)
+            yield delta
+    finally:
+        await stream.aclose()          # stopped early: close the upstream response now
+    answer = "".join(parts).strip()
+    if answer:
+        question, embedding, locale, version, model = cache_key
+        answer_cache.store(question, embedding, answer, locale, version, model)
@@ -3,12 +3,10 @@
 # Invoked when intent confidence is below threshold or input is ambiguous.
 # Asks targeted clarifying questions and stores the pending intent in context.
 
-from openai import AsyncOpenAI
-from src.config import CHAT_GPT_API_KEY
+from src import llm_gateway
+from src.agents.history import history_manager
 from src.agents.base_agent import AgentContext, AgentResponse, BaseAgent, language_directive
 
-_client = AsyncOpenAI(api_key=CHAT_GPT_API_KEY)
-
 _SYSTEM_PROMPT = """\
 You are a friendly triage assistant for a healthcare and university disability services app (Emory DAS).
 
@@ -29,28 +27,23 @@ class TriageAgent(BaseAgent):
         system = _SYSTEM_PROMPT + (f"\n{directive}" if directive else "")
         messages = [
             {"role": "system", "content": system},
-            *context.history,
+            *history_manager.window(context, "triage"),
             {"role": "user", "content": user_input},
         ]
 
-        response = await _client.chat.completions.create(
+        stream = llm_gateway.stream_tokens(
+            "triage",
+            deadline=context.deadline,
             model="gpt-4o-mini",
             messages=messages,
             temperature=0.4,
         )
 
-        reply = response.choices[0].message.content
-
-        updated = AgentContext(
-            session_id=context.session_id,
-            user_id=context.user_id,
-            token=context.token,
-            history=context.history + [
+        def finalize(reply: str, completed: bool = True) -> AgentContext:
+            context.metadata["awaiting_triage_clarification"] = True
+            return context.extended([
                 {"role": "user", "content": user_input},
                 {"role": "assistant", "content": reply},
-            ],
-            locale=context.locale,
-            metadata={**context.metadata, "awaiting_triage_clarification": True},
-        )
+            ])
 
-        return AgentResponse(content=reply, updated_context=updated, done=True)
+        return AgentResponse(content="", stream=True, stream_gen=stream, finalize=finalize, done=True)
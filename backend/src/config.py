@@ -28,3 +28,148 @@ AWS_REGION=os.getenv("AWS_REGION")
 AWS_BUCKET_NAME=os.getenv("AWS_BUCKET_NAME")
 
 WAITLIST_COLLECTION = os.getenv("WAITLIST_COLLECTION", "waitlist")
+
+# ── Agent pipeline ────────────────────────────────────────────────────────────
+# Run guardrail, intent and (likely) DAS retrieval concurrently instead of
+# one after another. Off by default until TTFT numbers confirm the gain.
+SPECULATIVE_ROUTING = os.getenv("SPECULATIVE_ROUTING", "false").lower() in ("1", "true", "yes")
+
+# ── LLM gateway (src/llm_gateway.py) ──────────────────────────────────────────
+LLM_MAX_CONNECTIONS   = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))    # keep-alive pool size
+LLM_MAX_CONCURRENCY   = int(os.getenv("LLM_MAX_CONCURRENCY", "24"))    # in-flight requests, all stages
+LLM_STAGE_CONCURRENCY = int(os.getenv("LLM_STAGE_CONCURRENCY", "12"))  # in-flight requests per stage
+LLM_MAX_RETRIES       = int(os.getenv("LLM_MAX_RETRIES", "3"))         # retries on 429 / 5xx
+LLM_HEDGE             = os.getenv("LLM_HEDGE", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # latencies needed before hedging
+LLM_WARM_CONNECTIONS  = int(os.getenv("LLM_WARM_CONNECTIONS", "4"))    # opened at startup (src/warmup.py)
+# Point every OpenAI client at another server (e.g. benchmarks/fake_openai.py)
+OPENAI_BASE_URL       = os.getenv("OPENAI_BASE_URL") or None
+
+# ── LLM cassette (src/llm_cassette.py) ───────────────────────────────────────
+# "record" saves every OpenAI request/response to LLM_CASSETTE_PATH, "replay"
+# serves them back instead of calling the API. LLM_CASSETTE_LATENCY is
+# "original" (replay recorded timings) or "zero".
+LLM_CASSETTE_MODE    = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+LLM_CASSETTE_PATH    = os.getenv("LLM_CASSETTE_PATH", "llm_cassette.jsonl")
+LLM_CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "original").lower()
+
+# ── Deadlines ─────────────────────────────────────────────────────────────────
+# Seconds a single user message may take end-to-end, and the budget of each
+# stage within it. The Orchestrator degrades gracefully when one runs out.
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "45"))
+STAGE_BUDGETS = {
+    "guardrail":  float(os.getenv("BUDGET_GUARDRAIL", "4")),
+    "intent":     float(os.getenv("BUDGET_INTENT", "4")),
+    "retrieval":  float(os.getenv("BUDGET_RETRIEVAL", "5")),
+    "generation": float(os.getenv("BUDGET_GENERATION", "30")),
+}
+
+# ── Conversation history (src/agents/history.py) ─────────────────────────────
+# Token budget for the history part of each agent's prompt. The last
+# HISTORY_KEEP_RECENT messages are always sent; older ones are folded into a
+# rolling summary every HISTORY_SUMMARY_BATCH messages.
+HISTORY_BUDGETS = {
+    agent: int(os.getenv(f"HISTORY_BUDGET_{agent.upper()}", default))
+    for agent, default in {
+        "caregiver":     "2000",   # function-calling needs the gathered arguments
+        "triage":        "1200",
+        "medication":    "1200",
+        "rag":           "1000",
+        "accommodation": "600",
+        "intent":        "500",
+        "default":       "1000",
+    }.items()
+}
+HISTORY_KEEP_RECENT   = int(os.getenv("HISTORY_KEEP_RECENT", "6"))
+HISTORY_SUMMARY_BATCH = int(os.getenv("HISTORY_SUMMARY_BATCH", "8"))
+
+# ── Socket.IO streaming ───────────────────────────────────────────────────────
+# Model deltas are coalesced into larger "bot-token" frames, flushed once a
+# frame reaches STREAM_FLUSH_BYTES or has waited STREAM_FLUSH_MS.
+# Set both to 0 to emit one frame per delta.
+STREAM_FLUSH_BYTES = int(os.getenv("STREAM_FLUSH_BYTES", "256"))
+STREAM_FLUSH_MS    = float(os.getenv("STREAM_FLUSH_MS", "30"))
+
+# ── Session store (src/session_store.py) ──────────────────────────────────────
+# "memory" keeps sessions in this process; "mongo" stores them in
+# SESSIONS_COLLECTION (behind a write-through LRU of SESSION_CACHE_SIZE) so
+# several workers can share them. For more than one worker also set
+# SOCKETIO_MESSAGE_QUEUE (redis://… or amqp://…) for cross-process emits;
+# those go through the redis / aio-pika packages in requirements.txt.
+SESSION_STORE          = os.getenv("SESSION_STORE", "memory").lower()
+SESSIONS_COLLECTION    = os.getenv("SESSIONS_COLLECTION", "chat_sessions")
+SESSION_CACHE_SIZE     = int(os.getenv("SESSION_CACHE_SIZE", "1000"))
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE") or None
+
+# ── Session memory limits (src/session_limits.py) ─────────────────────────────
+# Every SESSION_SWEEP_INTERVAL seconds, sessions idle for SESSION_IDLE_TTL are
+# dropped from memory, then the least recently used ones while more than
+# SESSION_MAX_COUNT sessions or SESSION_MAX_BYTES of history are held. The
+# socket stays open; the next message reloads the session from the store.
+# With the memory store, SESSION_SPILL=1 writes evicted sessions to
+# SESSIONS_COLLECTION first so they can be resumed (otherwise they are gone).
+SESSION_IDLE_TTL       = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_MAX_COUNT      = int(os.getenv("SESSION_MAX_COUNT", "2000"))
+SESSION_MAX_BYTES      = int(os.getenv("SESSION_MAX_BYTES", str(128 * 1024 * 1024)))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "30"))
+SESSION_SPILL          = os.getenv("SESSION_SPILL", "false").lower() in ("1", "true", "yes")
+
+# ── Per-session message queue ─────────────────────────────────────────────────
+# Messages on one socket are handled strictly one at a time; at most this many
+# may wait behind the one in progress before new ones are rejected.
+SESSION_QUEUE_SIZE = int(os.getenv("SESSION_QUEUE_SIZE", "4"))
+
+# ── RAG answer cache (src/rag/answer_cache.py) ───────────────────────────────
+# DAS FAQ answers are reused for questions whose embedding has cosine
+# similarity >= ANSWER_CACHE_THRESHOLD with a cached one, in the same locale
+# and corpus version. Entries expire after ANSWER_CACHE_TTL seconds; the least
+# recently used go beyond ANSWER_CACHE_SIZE. Saved to ANSWER_CACHE_PATH.
+ANSWER_CACHE_ENABLED   = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_SIZE      = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL       = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))
+ANSWER_CACHE_PATH      = os.getenv("ANSWER_CACHE_PATH", "src/rag/answer_cache.npz")
+
+# ── Query-embedding cache (src/rag/embedding_cache.py) ────────────────────────
+# In-process LRU of EMBEDDING_CACHE_SIZE vectors in front of a SQLite file
+# shared by the workers on an instance, trimmed to EMBEDDING_CACHE_DISK_ROWS
+# (~6 KB per row for text-embedding-3-small). Empty path → memory only.
+EMBEDDING_CACHE_PATH      = os.getenv("EMBEDDING_CACHE_PATH", "src/rag/embedding_cache.sqlite3")
+EMBEDDING_CACHE_SIZE      = int(os.getenv("EMBEDDING_CACHE_SIZE", "5000"))
+EMBEDDING_CACHE_DISK_ROWS = int(os.getenv("EMBEDDING_CACHE_DISK_ROWS", "20000"))
+
+# ── Retriever (src/rag/retriever.py) ──────────────────────────────────────────
+# Threads for vector searches; more only queue up behind the GIL on 1 vCPU.
+RETRIEVER_THREADS = int(os.getenv("RETRIEVER_THREADS", "2"))
+
+# ── Vector store (src/rag/vector_store.py) ────────────────────────────────────
+# "chroma" (ChromaDB) or "numpy" (built-in memory-mapped matrix). The indexer
+# builds whichever is selected. VECTOR_DTYPE (float32 / float16) applies to
+# the numpy backend: float16 halves the matrix but each query pays for
+# upcasting it (no half-precision BLAS) — roughly 10× slower searches.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+VECTOR_DTYPE   = os.getenv("VECTOR_DTYPE", "float32")
+# Quantized search for the numpy backend: "none", "int8" (1 byte per
+# dimension, 4× smaller than float32) or "pq" (product quantization,
+# VECTOR_PQ_SUBVECTORS bytes per chunk). Candidates — VECTOR_RERANK × top_k of
+# them — are re-scored exactly against the memory-mapped float vectors, so
+# only the codes need to stay resident. The indexer writes the codes.
+VECTOR_QUANTIZATION  = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+VECTOR_PQ_SUBVECTORS = int(os.getenv("VECTOR_PQ_SUBVECTORS", "96"))
+VECTOR_RERANK        = int(os.getenv("VECTOR_RERANK", "10"))
+
+# ── Hybrid retrieval (src/rag/bm25.py) ────────────────────────────────────────
+# Fuse BM25 (built by the indexer) with dense results by reciprocal rank. A
+# query whose terms all appear in the best BM25 chunk, scoring at least
+# LEXICAL_FAST_MARGIN × the best chunk of any other page, is answered
+# lexically with no embedding call; 0 turns the fast path off.
+HYBRID_RETRIEVAL    = os.getenv("HYBRID_RETRIEVAL", "true").lower() in ("1", "true", "yes")
+LEXICAL_FAST_MARGIN = float(os.getenv("LEXICAL_FAST_MARGIN", "1.5"))
+
+# ── RAG context packing (src/rag/context_packer.py) ───────────────────────────
+# RAGAgent retrieves RAG_FETCH_K candidate chunks, merges adjacent chunks of a
+# page, drops near-duplicates (shingle containment >= RAG_DUPLICATE_THRESHOLD)
+# and packs the rest in relevance order into RAG_CONTEXT_TOKENS.
+RAG_FETCH_K             = int(os.getenv("RAG_FETCH_K", "12"))
+RAG_CONTEXT_TOKENS      = int(os.getenv("RAG_CONTEXT_TOKENS", "1000"))
+RAG_DUPLICATE_THRESHOLD = float(os.getenv("RAG_DUPLICATE_THRESHOLD", "0.8"))
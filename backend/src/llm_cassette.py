@@ -0,0 +1,198 @@
+# src/llm_cassette.py
+#
+# Record / replay of OpenAI calls, for deterministic profiling of the real
+# guardrail → intent → agent pipeline with no network.
+#
+#   LLM_CASSETTE_MODE=record   every successful request/response pair is
+#                              appended to LLM_CASSETTE_PATH (JSON lines)
+#   LLM_CASSETTE_MODE=replay   responses are served from the cassette; a request
+#                              that was never recorded raises CassetteMiss
+#
+# Entries are keyed by a stable hash of the call kind, model and messages (or
+# embedding input), plus the parameters that change the answer: temperature,
+# response_format and functions / tools (with their *_choice), when given.
+# Cassettes recorded before these were part of the key no longer match. A
+# key recorded several times is replayed in recorded order, wrapping around.
+# Streams are stored as their chunks with arrival offsets.
+# LLM_CASSETTE_LATENCY=original replays the recorded timings (time to response,
+# then each chunk at its offset); =zero returns everything immediately.
+#
+# All chat/embedding calls reach this through llm_gateway._call(); the
+# retriever's synchronous embedding client uses create_sync().
+#
+# Usage:
+#   LLM_CASSETTE_MODE=record uvicorn main:app     # use the app (or a load test) once
+#   LLM_CASSETTE_MODE=replay uvicorn main:app     # then profile against the recording
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+from openai.types import CreateEmbeddingResponse
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from src.config import LLM_CASSETTE_MODE, LLM_CASSETTE_PATH, LLM_CASSETTE_LATENCY
+
+_MODELS = {"chat": ChatCompletion, "embed": CreateEmbeddingResponse}
+_KEYED_PARAMS = ("temperature", "response_format", "functions", "function_call", "tools", "tool_choice")
+
+_lock = threading.Lock()   # the retriever records from worker threads
+_tape: dict[str, list[dict]] | None = None
+_cursors: dict[str, int] = {}
+
+
+class CassetteMiss(LookupError):
+    """Replay mode got a request that is not on the cassette."""
+
+
+def recording() -> bool:
+    return LLM_CASSETTE_MODE == "record"
+
+
+def replaying() -> bool:
+    return LLM_CASSETTE_MODE == "replay"
+
+
+def request_key(kwargs: dict) -> tuple[str, str]:
+    """(kind, key) for a chat.completions / embeddings request."""
+    if "messages" in kwargs:
+        kind    = "stream" if kwargs.get("stream") else "chat"
+        payload = {"kind": kind, "model": kwargs.get("model"), "messages": kwargs["messages"]}
+        payload.update((name, kwargs[name]) for name in _KEYED_PARAMS if name in kwargs)
+    else:
+        kind    = "embed"
+        payload = {"kind": kind, "model": kwargs.get("model"), "input": kwargs.get("input")}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_jsonable)
+    return kind, hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _jsonable(obj):
+    # History can hold SDK objects, e.g. the caregiver's function_call
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    return str(obj)
+
+
+# ── Cassette file ─────────────────────────────────────────────────────────────
+
+def _load() -> dict[str, list[dict]]:
+    global _tape
+    if _tape is None:
+        tape: dict[str, list[dict]] = {}
+        path = Path(LLM_CASSETTE_PATH)
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        tape.setdefault(entry["key"], []).append(entry)
+        print(f"[llm_cassette] loaded {sum(len(v) for v in tape.values())} entries from {path}")
+        _tape = tape
+    return _tape
+
+
+def _append(entry: dict) -> None:
+    line = json.dumps(entry, ensure_ascii=False) + "\n"
+    with _lock:
+        with open(LLM_CASSETTE_PATH, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def _next_entry(kind: str, key: str) -> dict:
+    with _lock:
+        entries = _load().get(key)
+        if not entries:
+            raise CassetteMiss(f"no {kind} entry for key {key[:12]}… in {LLM_CASSETTE_PATH} — re-record the cassette")
+        index = _cursors.get(key, 0)
+        _cursors[key] = index + 1
+        return entries[index % len(entries)]
+
+
+def _delay(seconds: float) -> float:
+    return seconds if LLM_CASSETTE_LATENCY == "original" else 0.0
+
+
+# ── Streams ───────────────────────────────────────────────────────────────────
+
+class _RecordingStream:
+    """Passes chunks through and records them; written out only if consumed to the end."""
+
+    def __init__(self, stream, key: str, latency: float):
+        self._stream  = stream
+        self._key     = key
+        self._latency = latency
+        self._started = time.monotonic()
+        self._chunks: list[list] = []
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._chunks.append([round(time.monotonic() - self._started, 4), chunk.model_dump(mode="json")])
+            yield chunk
+        _append({"key": self._key, "kind": "stream", "latency": self._latency, "chunks": self._chunks})
+
+    async def close(self) -> None:
+        await self._stream.close()
+
+
+class _ReplayStream:
+    """Replays recorded chunks at their original offsets (or at once)."""
+
+    def __init__(self, chunks: list[list]):
+        self._chunks = chunks
+
+    async def __aiter__(self):
+        started = time.monotonic()
+        for offset, data in self._chunks:
+            wait = _delay(offset) - (time.monotonic() - started)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield ChatCompletionChunk.model_validate(data)
+
+    async def close(self) -> None:
+        pass
+
+
+# ── Entry points ──────────────────────────────────────────────────────────────
+
+async def create(create_fn, kwargs: dict):
+    """Async `create_fn(**kwargs)` through the cassette (pass-through when the mode is off)."""
+    if not (recording() or replaying()):
+        return await create_fn(**kwargs)
+
+    kind, key = request_key(kwargs)
+    if replaying():
+        entry = _next_entry(kind, key)
+        await asyncio.sleep(_delay(entry["latency"]))
+        if kind == "stream":
+            return _ReplayStream(entry["chunks"])
+        return _MODELS[kind].model_validate(entry["response"])
+
+    started = time.monotonic()
+    result  = await create_fn(**kwargs)
+    latency = round(time.monotonic() - started, 4)
+    if kind == "stream":
+        return _RecordingStream(result, key, latency)
+    _append({"key": key, "kind": kind, "latency": latency, "response": result.model_dump(mode="json")})
+    return result
+
+
+def create_sync(create_fn, kwargs: dict):
+    """Blocking counterpart of create() for synchronous clients. Non-streaming calls only."""
+    if not (recording() or replaying()):
+        return create_fn(**kwargs)
+
+    kind, key = request_key(kwargs)
+    if replaying():
+        entry = _next_entry(kind, key)
+        time.sleep(_delay(entry["latency"]))
+        return _MODELS[kind].model_validate(entry["response"])
+
+    started = time.monotonic()
+    result  = create_fn(**kwargs)
+    _append({"key": key, "kind": kind, "latency": round(time.monotonic() - started, 4), "response": result.model_dump(mode="json")})
+    return result
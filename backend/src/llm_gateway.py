@@ -0,0 +1,300 @@
+# src/llm_gateway.py
+#
+# Single entry point for every OpenAI call made by the agents.
+#
+#   - one AsyncOpenAI client over one tuned keep-alive connection pool
+#   - a global concurrency ceiling plus one semaphore per pipeline stage
+#   - jittered exponential retry on 429 / 5xx / connection errors
+#   - singleflight: identical in-flight (non-streaming) requests share one call
+#   - per-call deadlines (absolute time.monotonic() values, see AgentContext)
+#   - optional hedging for small calls: a second identical request is fired
+#     once the first has taken longer than the stage's recent p95 latency
+#   - record / replay of every call via src/llm_cassette.py (LLM_CASSETTE_MODE)
+#   - warm_connections(): opens pooled connections at startup (src/warmup.py)
+#
+# Usage:
+#   from src import llm_gateway
+#   resp   = await llm_gateway.chat("intent", deadline=context.deadline, hedge=True, model=..., messages=[...])
+#   stream = await llm_gateway.chat_stream("rag", deadline=context.deadline, model=..., messages=[...])
+#   async for token in llm_gateway.stream_tokens("rag", deadline=context.deadline, model=..., messages=[...]): ...
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import deque
+from typing import AsyncGenerator
+
+import httpx
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from src import llm_cassette, metrics
+from src.config import (
+    CHAT_GPT_API_KEY,
+    OPENAI_BASE_URL,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_CONCURRENCY,
+    LLM_STAGE_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_HEDGE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_WARM_CONNECTIONS,
+)
+
+_RETRYABLE = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+_BACKOFF_BASE = 0.25   # seconds
+_BACKOFF_CAP  = 8.0
+
+client = AsyncOpenAI(
+    api_key=CHAT_GPT_API_KEY,
+    base_url=OPENAI_BASE_URL,
+    max_retries=0,   # retries are handled here, with jitter and a shared budget
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=120,
+        ),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    ),
+)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The caller's deadline passed before the model answered."""
+
+
+class _LatencyWindow:
+    """Rolling window of recent successful call latencies for one stage."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def p95(self) -> float | None:
+        if len(self._samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task    = task
+        self.waiters = 0
+
+
+_global_limit = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_stage_limits: dict[str, asyncio.Semaphore] = {}
+_latencies: dict[str, _LatencyWindow] = {}
+_inflight: dict[str, _Flight] = {}
+
+
+def _stage_limit(stage: str) -> asyncio.Semaphore:
+    sem = _stage_limits.get(stage)
+    if sem is None:
+        sem = _stage_limits[stage] = asyncio.Semaphore(LLM_STAGE_CONCURRENCY)
+    return sem
+
+
+def _latency(stage: str) -> _LatencyWindow:
+    window = _latencies.get(stage)
+    if window is None:
+        window = _latencies[stage] = _LatencyWindow()
+    return window
+
+
+async def _with_deadline(aw, deadline: float | None):
+    """Await `aw`, raising DeadlineExceeded if `deadline` passes first."""
+    if deadline is None:
+        return await aw
+    left = deadline - time.monotonic()
+    if left <= 0:
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        raise DeadlineExceeded()
+    try:
+        return await asyncio.wait_for(aw, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded() from None
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    """Honour Retry-After when the API sends one, otherwise full-jitter backoff."""
+    response = getattr(exc, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        try:
+            return min(float(retry_after), _BACKOFF_CAP)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(_BACKOFF_CAP, _BACKOFF_BASE * 2 ** attempt))
+
+
+async def _call(stage: str, create, kwargs: dict):
+    """Run `create(**kwargs)` under the global + stage limits, retrying transient failures."""
+    attempt = 0
+    while True:
+        try:
+            async with _global_limit, _stage_limit(stage):
+                started = time.monotonic()
+                result  = await llm_cassette.create(create, kwargs)
+            _latency(stage).add(time.monotonic() - started)
+            metrics.LLM_REQUESTS.inc(stage=stage, outcome="ok")
+            _record_usage(stage, getattr(result, "usage", None))
+            return result
+        except _RETRYABLE as exc:
+            if attempt >= LLM_MAX_RETRIES:
+                metrics.LLM_REQUESTS.inc(stage=stage, outcome="error")
+                raise
+            metrics.LLM_REQUESTS.inc(stage=stage, outcome="retry")
+            delay = _retry_delay(exc, attempt)
+            attempt += 1
+            print(f"[llm_gateway] {stage}: {type(exc).__name__}, retry {attempt}/{LLM_MAX_RETRIES} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+def _record_usage(stage: str, usage) -> None:
+    if usage is None:
+        return
+    intent = metrics.current_intent.get()
+    metrics.LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, stage=stage, intent=intent, kind="prompt")
+    metrics.LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, stage=stage, intent=intent, kind="completion")
+
+
+def _request_key(kind: str, kwargs: dict) -> str:
+    payload = json.dumps({"kind": kind, **kwargs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def _hedged(stage: str, create, kwargs: dict):
+    """
+    Fire the request; if it has not answered within the stage's recent p95
+    latency, fire an identical second one and take whichever finishes first.
+    Hedging is skipped while there is too little history or the global pool
+    is saturated, so it never adds load when the API is already struggling.
+    """
+    first = asyncio.ensure_future(_call(stage, create, kwargs))
+    delay = _latency(stage).p95()
+    if delay is None:
+        return await first
+
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and not _global_limit.locked():
+            tasks.add(asyncio.ensure_future(_call(stage, create, kwargs)))
+        while True:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = [t for t in done if t.exception() is None]
+            if succeeded:
+                return succeeded[0].result()
+            if not tasks:
+                return done.pop().result()   # every attempt failed — re-raise
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _singleflight(stage: str, kind: str, create, kwargs: dict, deadline: float | None, hedge: bool):
+    """
+    Identical concurrent requests await the same underlying call. Each caller
+    awaits through a shield with its own deadline, so one caller giving up
+    does not cancel the call for everyone else; the call is only cancelled
+    once nobody is waiting on it.
+    """
+    key    = _request_key(kind, kwargs)
+    flight = _inflight.get(key)
+    if flight is None:
+        runner = _hedged(stage, create, kwargs) if hedge and LLM_HEDGE else _call(stage, create, kwargs)
+        flight = _inflight[key] = _Flight(asyncio.ensure_future(runner))
+        flight.task.add_done_callback(lambda _t, f=flight: _forget(key, f))
+
+    flight.waiters += 1
+    try:
+        return await _with_deadline(asyncio.shield(flight.task), deadline)
+    finally:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            # Unregister now, not in the done-callback: the cancel only lands
+            # on a later loop step, and a caller arriving before then must
+            # start a new call rather than join this dying one.
+            _forget(key, flight)
+            flight.task.cancel()
+
+
+def _forget(key: str, flight: _Flight) -> None:
+    """Drop `key` from the in-flight table if it still belongs to `flight`."""
+    if _inflight.get(key) is flight:
+        del _inflight[key]
+
+
+async def chat(stage: str, deadline: float | None = None, hedge: bool = False, **kwargs):
+    """
+    Non-streaming chat completion. Returns an openai ChatCompletion.
+
+    Args:
+        stage:    Pipeline stage name, used for concurrency limits and latency stats.
+        deadline: time.monotonic() value after which DeadlineExceeded is raised.
+        hedge:    Allow a hedged second request. Meant for small JSON calls.
+    """
+    return await _singleflight(stage, "chat", client.chat.completions.create, kwargs, deadline, hedge)
+
+
+async def chat_stream(stage: str, deadline: float | None = None, **kwargs):
+    """
+    Streaming chat completion. Returns the openai AsyncStream once the
+    response has started; the concurrency permits and the deadline cover
+    request set-up only, not the lifetime of the stream.
+    """
+    return await _with_deadline(_call(stage, client.chat.completions.create, {**kwargs, "stream": True}), deadline)
+
+
+async def stream_tokens(stage: str, deadline: float | None = None, **kwargs) -> AsyncGenerator[str, None]:
+    """
+    chat_stream() as an async generator of content deltas. The HTTP response
+    is closed as soon as the consumer stops iterating, even part-way through.
+    Unlike chat_stream(), the deadline covers the whole stream: a response
+    that stalls part-way raises DeadlineExceeded when it passes.
+    """
+    # The final chunk then carries token usage (with an empty `choices`)
+    stream = await chat_stream(stage, deadline=deadline, stream_options={"include_usage": True}, **kwargs)
+    chunks = stream.__aiter__()
+    try:
+        while True:
+            try:
+                chunk = await _with_deadline(chunks.__anext__(), deadline)
+            except StopAsyncIteration:
+                break
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            elif chunk.usage is not None:
+                _record_usage(stage, chunk.usage)
+    finally:
+        await stream.close()
+
+
+async def embed(stage: str, deadline: float | None = None, **kwargs):
+    """Embeddings request. Returns an openai CreateEmbeddingResponse."""
+    return await _singleflight(stage, "embed", client.embeddings.create, kwargs, deadline, False)
+
+
+async def warm_connections(count: int = LLM_WARM_CONNECTIONS) -> int:
+    """
+    Open up to `count` pooled connections (TCP + TLS) ahead of the first user
+    request, with concurrent GET /models calls — no tokens spent. Any HTTP
+    answer, even an error status, leaves a kept-alive connection behind.
+    Returns how many got one.
+    """
+    if llm_cassette.replaying():
+        return 0
+    results = await asyncio.gather(*(client.models.list() for _ in range(count)), return_exceptions=True)
+    return sum(1 for r in results if not isinstance(r, Exception) or isinstance(r, openai.APIStatusError))
@@ -0,0 +1,192 @@
+# src/metrics.py
+#
+# In-process metrics with Prometheus text exposition (served at /metrics).
+#
+# Recording is a dict lookup plus a few integer/float additions under a
+# per-family lock. Most observations happen on the event-loop thread, but
+# some are made from worker threads (embedding-cache lookups and retrievals
+# on the retriever's search pool), so each family guards its series; the
+# lock is never held across an await. Rendering copies the series under the
+# same lock.
+#
+# Usage:
+#   from src import metrics
+#   metrics.STAGE_SECONDS.observe(0.12, stage="guardrail", intent="das_faq")
+#   metrics.LLM_TOKENS.inc(350, stage="rag", intent="das_faq", kind="prompt")
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+from bisect import bisect_left
+from typing import Callable
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_LAG_BUCKETS     = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Intent label of the turn being handled, for metrics recorded deep in the
+# call stack (e.g. token usage in llm_gateway). Set by the Orchestrator once
+# routing is decided; calls made before that are labelled "unrouted".
+current_intent: contextvars.ContextVar[str] = contextvars.ContextVar("current_intent", default="unrouted")
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * (n_buckets + 1)   # last slot is +Inf
+        self.sum    = 0.0
+        self.count  = 0
+
+
+class _Family:
+    def __init__(self, name: str, help_text: str, kind: str, labels: tuple[str, ...]):
+        self.name   = name
+        self.help   = help_text
+        self.kind   = kind
+        self.labels = labels
+        self.series: dict[tuple, object] = {}
+        self._lock  = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(l, "")) for l in self.labels)
+
+    def _fmt_labels(self, key: tuple, extra: str = "") -> str:
+        parts = [f'{l}="{_escape(v)}"' for l, v in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter(_Family):
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help_text, "counter", labels)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = list(self.series.items())
+        return [f"{self.name}{self._fmt_labels(k)} {v}" for k, v in series]
+
+
+class Histogram(_Family):
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets: tuple = _LATENCY_BUCKETS):
+        super().__init__(name, help_text, "histogram", labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels) -> None:
+        key    = self._key(labels)
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = _HistogramSeries(len(self.buckets))
+            series.counts[bucket] += 1
+            series.sum   += value
+            series.count += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            snapshot = [(key, list(s.counts), s.sum, s.count) for key, s in self.series.items()]
+        lines = []
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), counts):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._fmt_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._fmt_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._fmt_labels(key)} {count}")
+        return lines
+
+
+class Gauge(_Family):
+    """Gauge whose value is read from a callback at scrape time."""
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float]):
+        super().__init__(name, help_text, "gauge", ())
+        self.fn = fn
+
+    def render(self) -> list[str]:
+        try:
+            return [f"{self.name} {float(self.fn())}"]
+        except Exception as exc:
+            print(f"[metrics] gauge {self.name} failed: {exc!r}")
+            return []
+
+
+_registry: dict[str, _Family] = {}
+
+
+def _register(family: _Family) -> _Family:
+    _registry[family.name] = family
+    return family
+
+
+def counter(name: str, help_text: str, labels: tuple[str, ...] = ()) -> Counter:
+    return _register(Counter(name, help_text, labels))
+
+
+def histogram(name: str, help_text: str, labels: tuple[str, ...] = (), buckets: tuple = _LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help_text, labels, buckets))
+
+
+def gauge(name: str, help_text: str, fn: Callable[[], float]) -> Gauge:
+    return _register(Gauge(name, help_text, fn))
+
+
+def render() -> str:
+    """Prometheus text exposition format, version 0.0.4."""
+    lines = []
+    for family in _registry.values():
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        lines.extend(family.render())
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# ── Pipeline metrics ──────────────────────────────────────────────────────────
+
+STAGE_SECONDS = histogram(
+    "medease_stage_seconds",
+    "Wall time per chat pipeline stage (guardrail, intent, retrieval, agent, ttft, total).",
+    ("stage", "intent"),
+)
+LLM_TOKENS = counter(
+    "medease_llm_tokens_total",
+    "OpenAI tokens used, by gateway stage, routed intent and kind (prompt/completion).",
+    ("stage", "intent", "kind"),
+)
+LLM_REQUESTS = counter(
+    "medease_llm_requests_total",
+    "OpenAI requests made by the gateway, by stage and outcome.",
+    ("stage", "outcome"),
+)
+LOCAL_DECISIONS = counter(
+    "medease_local_decisions_total",
+    "Guardrail / intent decisions, by component and tier (local rules vs LLM).",
+    ("component", "tier"),
+)
+EVENT_LOOP_LAG = histogram(
+    "medease_event_loop_lag_seconds",
+    "How late the event loop woke a periodic timer — time spent blocked by synchronous work.",
+    buckets=_LAG_BUCKETS,
+)
+
+
+async def monitor_event_loop_lag(interval: float = 0.1) -> None:
+    """Sample event-loop lag every `interval` seconds into EVENT_LOOP_LAG. Runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - started - interval))
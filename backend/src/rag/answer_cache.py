@@ -0,0 +1,266 @@
+# src/rag/answer_cache.py
+#
+# Semantic cache of DAS FAQ answers. Students ask the same questions in many
+# wordings; a question whose embedding is close enough (cosine similarity >=
+# ANSWER_CACHE_THRESHOLD) to one already answered gets the stored answer
+# instead of a retrieval + generation round.
+#
+# Entries are scoped by locale, corpus version (stamped by src/rag/indexer.py)
+# and embedding model, so a re-indexed corpus or a different answer language
+# never reuses old answers. Eviction is LRU beyond ANSWER_CACHE_SIZE plus a
+# TTL of ANSWER_CACHE_TTL. The cache is written to ANSWER_CACHE_PATH (an .npz
+# of unit vectors + JSON metadata) every few new entries and at shutdown, and
+# read back on first use, or at startup by `await answer_cache.load()`. Entries
+# are only ever changed on the event loop; load() reads the file on a worker
+# thread but adds what it read on the loop. Saves go through a per-write temp
+# file and a process-wide lock, and a snapshot older than the one already on
+# disk is dropped, so overlapping background saves never interleave or roll
+# the file back.
+#
+# The caller decides what is cacheable — RAGAgent bypasses follow-ups whose
+# meaning depends on the conversation.
+#
+# Usage:
+#   answer = answer_cache.lookup(embedding, locale, version, EMBED_MODEL)    # None → miss
+#   answer_cache.store(question, embedding, answer, locale, version, EMBED_MODEL)
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src import metrics
+from src.config import ANSWER_CACHE_PATH, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD
+
+_SAVE_EVERY = 20          # new entries between background saves
+
+_write_lock = threading.Lock()
+_snapshots  = itertools.count(1)           # orders snapshots taken on the loop
+_written: dict[str, int] = {}              # path → newest snapshot written to it
+
+LOOKUPS = metrics.counter(
+    "medease_answer_cache_lookups_total",
+    "RAG answer-cache lookups, by outcome (hit, miss, bypass).",
+    ("outcome",),
+)
+
+
+class _Entry:
+    __slots__ = ("question", "answer", "scope", "vector", "created")
+
+    def __init__(self, question: str, answer: str, scope: str, vector: np.ndarray, created: float):
+        self.question = question
+        self.answer   = answer
+        self.scope    = scope
+        self.vector   = vector
+        self.created  = created
+
+
+class _Scope:
+    """Entry ids of one (locale, corpus version, model) and their stacked vectors."""
+
+    __slots__ = ("ids", "matrix")
+
+    def __init__(self):
+        self.ids: list[int] = []
+        self.matrix: np.ndarray | None = None     # rebuilt lazily after a change
+
+
+class AnswerCache:
+    """
+    Args:
+        path:      .npz file the cache is persisted to ("" → memory only).
+        capacity:  entries kept; least recently used are evicted first.
+        ttl:       seconds an answer stays valid.
+        threshold: minimum cosine similarity for a hit.
+    """
+
+    def __init__(
+        self,
+        path: str = ANSWER_CACHE_PATH,
+        capacity: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+    ):
+        self.path      = path
+        self.capacity  = capacity
+        self.ttl       = ttl
+        self.threshold = threshold
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._scopes: dict[str, _Scope] = {}
+        self._next_id = 0
+        self._unsaved = 0
+        self._loaded  = False
+
+    def lookup(self, embedding: list[float], locale: str, version: str, model: str) -> str | None:
+        """Cached answer for the closest question in scope, or None."""
+        self._ensure_loaded()
+        match = self._closest(_unit(embedding), _scope_key(locale, version, model))
+        if match is None:
+            LOOKUPS.inc(outcome="miss")
+            return None
+        self._entries.move_to_end(match)
+        LOOKUPS.inc(outcome="hit")
+        return self._entries[match].answer
+
+    def store(self, question: str, embedding: list[float], answer: str, locale: str, version: str, model: str) -> None:
+        self._ensure_loaded()
+        vector = _unit(embedding)
+        scope  = _scope_key(locale, version, model)
+        duplicate = self._closest(vector, scope)
+        if duplicate is not None:
+            self._remove(duplicate)          # a concurrent miss answered it first — keep the newest
+        self._add(_Entry(question, answer, scope, vector, time.time()))
+        while len(self._entries) > self.capacity:
+            self._remove(next(iter(self._entries)))
+
+        self._unsaved += 1
+        if self._unsaved >= _SAVE_EVERY:
+            self._save_in_background()
+
+    async def load(self) -> None:
+        """Read the persisted cache now instead of on first use (startup warmup)."""
+        if self._loaded:
+            return
+        entries = await asyncio.to_thread(self._read)
+        if not self._loaded:               # a lookup may have loaded it on the loop meanwhile
+            self._populate(entries)
+
+    def save(self) -> None:
+        """Write the cache to `path` now (called at shutdown)."""
+        if not self.path or not self._loaded or not self._unsaved:
+            return
+        self._unsaved = 0
+        _write(*self._snapshot())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    def _closest(self, vector: np.ndarray, scope_key: str) -> int | None:
+        scope = self._scopes.get(scope_key)
+        if scope is None or not scope.ids:
+            return None
+        if scope.matrix is None:
+            scope.matrix = np.stack([self._entries[i].vector for i in scope.ids])
+        if scope.matrix.shape[1] != vector.shape[0]:
+            return None
+        scores = scope.matrix @ vector
+        best   = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        entry_id = scope.ids[best]
+        if time.time() - self._entries[entry_id].created > self.ttl:
+            self._remove(entry_id)
+            return None
+        return entry_id
+
+    def _add(self, entry: _Entry) -> None:
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        scope = self._scopes.setdefault(entry.scope, _Scope())
+        scope.ids.append(entry_id)
+        scope.matrix = None
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        scope = self._scopes[entry.scope]
+        scope.ids.remove(entry_id)
+        scope.matrix = None
+        if not scope.ids:
+            del self._scopes[entry.scope]
+
+    def _snapshot(self) -> tuple[str, int, np.ndarray, str]:
+        entries = list(self._entries.values())        # LRU order is kept on reload
+        vectors = np.stack([e.vector for e in entries]) if entries else np.zeros((0, 0), dtype=np.float32)
+        meta    = json.dumps([
+            {"question": e.question, "answer": e.answer, "scope": e.scope, "created": e.created}
+            for e in entries
+        ])
+        return self.path, next(_snapshots), vectors, meta
+
+    def _save_in_background(self) -> None:
+        if not self.path:
+            return
+        self._unsaved = 0
+        snapshot = self._snapshot()
+        try:
+            asyncio.get_running_loop().run_in_executor(None, _write, *snapshot)
+        except RuntimeError:
+            _write(*snapshot)                # no running loop (scripts)
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self._populate(self._read())
+
+    def _read(self) -> list[_Entry]:
+        """Unexpired entries from `path`, oldest first. Touches no cache state, so it may run on any thread."""
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                vectors = data["vectors"]
+                meta    = json.loads(str(data["meta"]))
+        except Exception as exc:
+            print(f"[answer_cache] could not load {self.path}, starting empty: {exc!r}")
+            return []
+        now = time.time()
+        return [
+            _Entry(m["question"], m["answer"], m["scope"], vector, m["created"])
+            for vector, m in zip(vectors, meta)
+            if now - m["created"] <= self.ttl
+        ]
+
+    def _populate(self, entries: list[_Entry]) -> None:
+        for entry in entries:
+            self._add(entry)
+        while len(self._entries) > self.capacity:
+            self._remove(next(iter(self._entries)))
+        self._loaded = True
+        if entries:
+            print(f"[answer_cache] loaded {len(self._entries)} answers from {self.path}")
+
+
+def _scope_key(locale: str, version: str, model: str) -> str:
+    return f"{locale}|{version}|{model}"
+
+
+def _unit(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm   = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _write(path: str, seq: int, vectors: np.ndarray, meta: str) -> None:
+    """Atomically replace `path` with snapshot `seq`, unless a newer snapshot is already there."""
+    with _write_lock:
+        if _written.get(path, 0) > seq:
+            return
+        tmp = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False,
+            ) as f:
+                tmp = f.name
+                np.savez(f, vectors=vectors, meta=np.array(meta))
+            os.replace(tmp, path)
+            _written[path] = seq
+        except OSError as exc:
+            print(f"[answer_cache] could not save to {path}: {exc!r}")
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+
+
+answer_cache = AnswerCache()
+
+metrics.gauge("medease_answer_cache_entries", "Answers held by the RAG answer cache.", lambda: len(answer_cache))
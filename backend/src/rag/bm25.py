@@ -0,0 +1,154 @@
+# src/rag/bm25.py
+#
+# Lexical (BM25) index over the chunks in the vector store, built by
+# src/rag/indexer.py next to the vectors. Dense retrieval misses exact terms —
+# form names, building names, "Accommodate portal" — that BM25 matches
+# directly, and a lexical search needs no embedding call.
+#
+# On disk (BM25_PATH) it is one .npz of postings in CSR form:
+#
+#   terms     vocabulary, sorted, newline-joined UTF-8
+#   offsets   postings of term t are rows offsets[t]:offsets[t + 1]
+#   rows      chunk row per posting, the smallest unsigned dtype that fits
+#   tf        term frequency per posting, uint16
+#   lengths   tokens per chunk
+#   pages     page number per chunk (chunks of one URL share it)
+#   ids       chunk IDs (row → ID), newline-joined UTF-8
+#
+# A title is indexed together with each of its chunks.
+#
+# Usage:
+#   index = BM25Index.build(ids, texts, urls); index.save(BM25_PATH)   # indexer
+#   index = BM25Index.load(BM25_PATH)                                 # None if not built
+#   match = index.search("Accommodate portal login", top_k=8)
+#   match.hits, match.coverage, match.margin
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+BM25_PATH = Path(__file__).parent / "bm25.npz"
+
+_K1 = 1.2
+_B  = 0.75
+
+_TOKEN_RE  = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+    a an and are as at be but by can do does for from has have how i if in is it its me my
+    of on or our so than that the their them then there these they this to was we what when
+    where which who why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+@dataclass
+class Match:
+    hits:     list[tuple[str, float]] = field(default_factory=list)   # (chunk id, score), best first
+    coverage: float = 0.0     # share of the query's terms in the best chunk
+    margin:   float = 0.0     # best score / best score on any other page (inf if no other page matched)
+
+
+class BM25Index:
+    def __init__(self, terms: list[str], offsets: np.ndarray, rows: np.ndarray, tf: np.ndarray, lengths: np.ndarray, pages: np.ndarray, ids: list[str]):
+        self.terms   = terms
+        self.offsets = offsets
+        self.rows    = rows
+        self.tf      = tf
+        self.lengths = lengths
+        self.pages   = pages
+        self.ids     = ids
+        df      = np.diff(offsets)
+        average = max(1.0, float(lengths.mean())) if len(lengths) else 1.0
+        self._idf  = np.log1p((len(ids) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self._norm = (_K1 * (1 - _B + _B * lengths / average)).astype(np.float32)
+
+    @classmethod
+    def build(cls, ids: list[str], texts: list[str], urls: list[str]) -> BM25Index:
+        page_of = {}
+        pages   = np.array([page_of.setdefault(url or id_, len(page_of)) for id_, url in zip(ids, urls)], dtype=np.uint32)
+        postings: dict[str, list[tuple[int, int]]] = {}
+        lengths = np.zeros(len(ids), dtype=np.uint32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[row] = len(tokens)
+            counts: dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, []).append((row, count))
+
+        terms   = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[t]) for t in terms])
+        flat    = [p for t in terms for p in postings[t]]
+        rows    = np.array([r for r, _ in flat], dtype=np.min_scalar_type(max(0, len(ids) - 1)))
+        tf      = np.minimum([c for _, c in flat], np.iinfo(np.uint16).max).astype(np.uint16)
+        return cls(terms, offsets, rows, tf, lengths, pages, list(ids))
+
+    def search(self, text: str, top_k: int) -> Match:
+        query = list(dict.fromkeys(tokenize(text)))
+        known = [t for t in map(self._term, query) if t is not None]
+        if not known:
+            return Match()
+        scores  = np.zeros(len(self.ids), dtype=np.float32)
+        matched = np.zeros(len(self.ids), dtype=np.uint16)
+        for t in known:
+            start, end = self.offsets[t], self.offsets[t + 1]
+            rows  = self.rows[start:end].astype(np.int64)
+            tf    = self.tf[start:end].astype(np.float32)
+            scores[rows]  += self._idf[t] * tf * (_K1 + 1) / (tf + self._norm[rows])
+            matched[rows] += 1
+        top_k = min(top_k, int(np.count_nonzero(scores)))
+        if not top_k:
+            return Match()
+        top  = np.argpartition(-scores, top_k - 1)[:top_k]
+        top  = top[np.argsort(-scores[top])]
+        best = top[0]
+        rest = scores[self.pages != self.pages[best]]
+        runner_up = float(rest.max()) if len(rest) else 0.0
+        return Match(
+            hits=[(self.ids[i], float(scores[i])) for i in top],
+            coverage=float(matched[best] / len(query)),
+            margin=float(scores[best] / runner_up) if runner_up > 0 else float("inf"),
+        )
+
+    def save(self, path: Path = BM25_PATH) -> None:
+        tmp = Path(f"{path}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f,
+                terms=_utf8("\n".join(self.terms)), offsets=self.offsets, rows=self.rows,
+                tf=self.tf, lengths=self.lengths, pages=self.pages, ids=_utf8("\n".join(self.ids)),
+            )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = BM25_PATH) -> BM25Index | None:
+        if not Path(path).exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            terms = data["terms"].tobytes().decode()
+            ids   = data["ids"].tobytes().decode()
+            return cls(
+                terms.split("\n") if terms else [], data["offsets"], data["rows"],
+                data["tf"], data["lengths"], data["pages"], ids.split("\n") if ids else [],
+            )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _term(self, term: str) -> int | None:
+        i = bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else None
+
+
+def _utf8(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode(), dtype=np.uint8)
@@ -0,0 +1,155 @@
+# src/rag/context_packer.py
+#
+# Turns the retriever's candidate chunks into the context block of a RAG
+# prompt, spending as few prompt tokens as possible on repeated text. Chunks
+# are taken in relevance order while they fit in RAG_CONTEXT_TOKENS:
+#
+#   - a chunk mostly contained in one already taken (word-shingle containment
+#     >= RAG_DUPLICATE_THRESHOLD) is dropped — the same text published on
+#     several pages
+#   - a chunk next to one already taken from the same page (chunk i ± 1) only
+#     costs its new text: taken neighbours are merged into one passage and the
+#     CHUNK_OVERLAP characters they share are kept once
+#   - a chunk that does not fit is skipped; smaller ones after it may still go in
+#
+# Passages are returned in the order of their best chunk.
+#
+# Usage:
+#   passages, stats = pack(chunks)        # chunks: Retriever results, best first
+#   print(stats)                          # what was merged, dropped and saved
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from src.config import RAG_CONTEXT_TOKENS, RAG_DUPLICATE_THRESHOLD
+from src.rag.indexer import CHUNK_OVERLAP
+
+_SHINGLE_WORDS = 5
+_MIN_OVERLAP   = 20     # shorter suffix/prefix matches are coincidence, not the chunk overlap
+
+
+@dataclass
+class PackStats:
+    candidates: int = 0
+    passages:   int = 0
+    merged:     int = 0               # chunks folded into a neighbour
+    duplicates: int = 0
+    skipped:    int = 0               # did not fit the budget
+    tokens:     int = 0
+    verbatim:   int = 0               # the same content as separate chunks
+
+    @property
+    def saved(self) -> int:
+        return max(0, self.verbatim - self.tokens)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.candidates} chunks → {self.passages} passages "
+            f"({self.merged} merged, {self.duplicates} near-duplicates dropped, {self.skipped} over budget), "
+            f"{self.tokens} tokens, {self.saved} saved vs verbatim chunks"
+        )
+
+
+def pack(
+    chunks: list[dict],
+    budget: int = RAG_CONTEXT_TOKENS,
+    threshold: float = RAG_DUPLICATE_THRESHOLD,
+) -> tuple[list[dict], PackStats]:
+    """Passages ({title, url, text}) for the prompt, best first, and what packing did."""
+    stats = PackStats(candidates=len(chunks))
+    taken: list[tuple[int, dict, set]] = []          # (rank, chunk, shingles)
+    spent = 0
+    for rank, chunk in enumerate(chunks):
+        shingles = _shingles(chunk["text"])
+        if any(_containment(shingles, other) >= threshold for _, _, other in taken):
+            stats.duplicates += 1
+            stats.verbatim   += _cost(chunk)
+            continue
+        cost = _marginal_cost(chunk, [c for _, c, _ in taken])
+        if spent + cost > budget:
+            stats.skipped += 1
+            continue
+        taken.append((rank, chunk, shingles))
+        spent          += cost
+        stats.verbatim += _cost(chunk)
+
+    passages = _merge([(rank, chunk) for rank, chunk, _ in taken])
+    stats.merged   = len(taken) - len(passages)
+    stats.passages = len(passages)
+    stats.tokens   = sum(_cost(p) for p in passages)
+    return passages, stats
+
+
+def _marginal_cost(chunk: dict, taken: list[dict]) -> int:
+    for other in taken:
+        if _neighbours(chunk, other):
+            first, second = (other, chunk) if other["chunk"] < chunk["chunk"] else (chunk, other)
+            joined = _join(first["text"], second["text"])
+            return max(0, _tokens(joined) - _tokens(other["text"]))
+    return _cost(chunk)
+
+
+def _neighbours(a: dict, b: dict) -> bool:
+    return (
+        bool(a.get("url")) and a.get("url") == b.get("url")
+        and a.get("chunk") is not None and b.get("chunk") is not None
+        and abs(a["chunk"] - b["chunk"]) == 1
+    )
+
+
+def _merge(taken: list[tuple[int, dict]]) -> list[dict]:
+    """Runs of consecutive taken chunks of one page become one passage; ordered by best rank."""
+    runs: list[tuple[int, list[dict]]] = []
+    by_page: dict[str, list[tuple[int, dict]]] = {}
+    for rank, chunk in taken:
+        if chunk.get("url") and chunk.get("chunk") is not None:
+            by_page.setdefault(chunk["url"], []).append((rank, chunk))
+        else:
+            runs.append((rank, [chunk]))
+    for members in by_page.values():
+        members.sort(key=lambda m: m[1]["chunk"])
+        for rank, chunk in members:
+            if runs and runs[-1][1][-1].get("url") == chunk["url"] and runs[-1][1][-1]["chunk"] == chunk["chunk"] - 1:
+                runs[-1] = (min(runs[-1][0], rank), runs[-1][1] + [chunk])
+            else:
+                runs.append((rank, [chunk]))
+
+    passages = []
+    for _, run in sorted(runs, key=lambda r: r[0]):
+        text = run[0]["text"]
+        for chunk in run[1:]:
+            text = _join(text, chunk["text"])
+        passages.append({"title": run[0].get("title", ""), "url": run[0].get("url", ""), "text": text})
+    return passages
+
+
+def _join(first: str, second: str) -> str:
+    """`first` + `second` with the text they share (the chunk overlap) kept once."""
+    for size in range(min(len(first), len(second), CHUNK_OVERLAP), _MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first}\n{second}"
+
+
+def _cost(passage: dict) -> int:
+    # As rendered by RAGAgent._build_context_str: "[label]\ntext", blank-line separated
+    return _tokens(f"[{passage.get('title') or passage.get('url', '')}]\n{passage['text']}\n\n")
+
+
+def _tokens(text: str) -> int:
+    from src.agents.history import count_tokens      # src.agents imports this module
+
+    return count_tokens(text)
+
+
+def _shingles(text: str) -> set:
+    words = text.lower().split()
+    if len(words) <= _SHINGLE_WORDS:
+        return {tuple(words)}
+    return {tuple(words[i:i + _SHINGLE_WORDS]) for i in range(len(words) - _SHINGLE_WORDS + 1)}
+
+
+def _containment(shingles: set, other: set) -> float:
+    """Share of `shingles` also in `other`."""
+    return len(shingles & other) / len(shingles) if shingles else 1.0
@@ -0,0 +1,181 @@
+# src/rag/embedding_cache.py
+#
+# Two-tier cache of query embeddings, so a repeated question does not cost an
+# OpenAI round trip (100–300 ms) before retrieval can start.
+#
+#   1. in-process LRU of float32 vectors (EMBEDDING_CACHE_SIZE entries)
+#   2. SQLite at EMBEDDING_CACHE_PATH in WAL mode — survives restarts and is
+#      shared by every worker on the instance; trimmed to the newest
+#      EMBEDDING_CACHE_DISK_ROWS rows
+#
+# Keys hash EMBED_MODEL together with the normalized text (case, surrounding
+# whitespace/punctuation and repeated spaces don't matter). If the database
+# cannot be opened the cache carries on memory-only.
+#
+# The cache is bypassed while the LLM cassette records or replays, so the
+# cassette always sees the same embedding requests.
+#
+# get() and put() may block on SQLite (lock waits, the periodic trim). On the
+# event loop use peek() / remember(), which only touch the in-process tier,
+# and run get() / put() in an executor (see Retriever.aembed).
+#
+# Usage:
+#   vector = embedding_cache.get(text, EMBED_MODEL)        # None → miss
+#   embedding_cache.put(text, EMBED_MODEL, vector)
+#   vector = embedding_cache.peek(text, EMBED_MODEL)       # memory only, never blocks
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src import llm_cassette, metrics
+from src.config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_DISK_ROWS
+
+_TRIM_EVERY = 500          # disk writes between trims
+
+LOOKUPS = metrics.counter(
+    "medease_embedding_cache_lookups_total",
+    "Query-embedding cache lookups, by result (memory, disk, miss).",
+    ("result",),
+)
+
+
+class EmbeddingCache:
+    """
+    Args:
+        path:      SQLite file ("" → memory only).
+        capacity:  vectors kept in the in-process LRU.
+        disk_rows: rows kept in SQLite; the oldest are trimmed.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, capacity: int = EMBEDDING_CACHE_SIZE, disk_rows: int = EMBEDDING_CACHE_DISK_ROWS):
+        self.path      = path
+        self.capacity  = capacity
+        self.disk_rows = disk_rows
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock     = threading.Lock()          # the retriever embeds from worker threads
+        self._local    = threading.local()         # one SQLite connection per thread
+        self._disabled = not path
+        self._writes   = 0
+
+    def peek(self, text: str, model: str) -> np.ndarray | None:
+        """get() from the in-process tier only; never blocks. A miss is not counted."""
+        if _bypassed():
+            return None
+        key = _key(text, model)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+        if vector is not None:
+            LOOKUPS.inc(result="memory")
+        return vector
+
+    def get(self, text: str, model: str) -> np.ndarray | None:
+        """Memory first, then SQLite (blocking)."""
+        vector = self.peek(text, model)
+        if vector is not None or _bypassed():
+            return vector
+
+        key = _key(text, model)
+        row = self._execute("SELECT vector FROM embeddings WHERE key = ?", (key,), fetch=True)
+        if row:
+            vector = np.frombuffer(row[0][0], dtype=np.float32)
+            self._remember(key, vector)
+            LOOKUPS.inc(result="disk")
+            return vector
+        LOOKUPS.inc(result="miss")
+        return None
+
+    def put(self, text: str, model: str, vector) -> np.ndarray:
+        """Cache `vector` (any float sequence); returns it as a float32 array."""
+        vector = np.asarray(vector, dtype=np.float32)
+        if _bypassed():
+            return vector
+        key = _key(text, model)
+        self._remember(key, vector)
+        self._execute(
+            "INSERT OR REPLACE INTO embeddings (key, model, vector, created) VALUES (?, ?, ?, ?)",
+            (key, model, vector.tobytes(), time.time()),
+        )
+        with self._lock:
+            self._writes += 1
+            trim = self._writes % _TRIM_EVERY == 0
+        if trim:
+            self._execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.disk_rows,),
+            )
+        return vector
+
+    def remember(self, text: str, model: str, vector) -> np.ndarray:
+        """put() for the in-process tier only; never blocks. Returns `vector` as a float32 array."""
+        vector = np.asarray(vector, dtype=np.float32)
+        if not _bypassed():
+            self._remember(_key(text, model), vector)
+        return vector
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.capacity:
+                self._memory.popitem(last=False)
+
+    # ── SQLite ────────────────────────────────────────────────────────────────
+
+    def _execute(self, sql: str, params: tuple, fetch: bool = False):
+        conn = self._connection()
+        if conn is None:
+            return None
+        try:
+            with conn:
+                cursor = conn.execute(sql, params)
+                return cursor.fetchall() if fetch else None
+        except sqlite3.Error as exc:
+            print(f"[embedding_cache] {exc!r}")
+            return None
+
+    def _connection(self) -> sqlite3.Connection | None:
+        if self._disabled:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        try:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")      # WAL: no fsync per commit
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created)")
+        except sqlite3.Error as exc:
+            print(f"[embedding_cache] cannot open {self.path}, caching in memory only: {exc!r}")
+            self._disabled = True
+            return None
+        self._local.conn = conn
+        return conn
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split()).strip(" ?!.,;:")
+
+
+def _key(text: str, model: str) -> str:
+    return hashlib.sha1(f"{model}\0{normalize(text)}".encode()).hexdigest()
+
+
+def _bypassed() -> bool:
+    return llm_cassette.recording() or llm_cassette.replaying()
+
+
+embedding_cache = EmbeddingCache()
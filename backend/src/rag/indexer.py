@@ -1,28 +1,49 @@
 # src/rag/indexer.py
 #
-# Chunks documents from src/rag/corpus/ and upserts them into ChromaDB.
+# Chunks documents from src/rag/corpus/ and upserts them into the vector store
+# (src/rag/vector_store.py) selected by VECTOR_BACKEND, or by --backend.
 #
 # Usage:
 #   cd backend/
 #   python -m src.rag.indexer
+#   python -m src.rag.indexer --backend numpy
+#   python -m src.rag.indexer --full          # re-embed everything
 #
 # Supported corpus inputs:
 #   - MedEase-Utils corpus JSON  (*_data_latest.json / *_data_YYYY-MM-DD.json)
 #     Each record's `markdown` field is chunked; url/title/description stored as metadata.
 #   - Plain .txt or .md files (fallback for ad-hoc documents)
+#
+# Builds are incremental. A manifest next to the store (index_manifest.json)
+# lists every indexed (url, content_hash) with its chunk IDs; chunk IDs are
+# derived from both, so a record whose chunks are all in the store is skipped.
+# Only new or changed records are embedded, and chunks no current record
+# produces — pages that changed or disappeared — are deleted. A change of
+# EMBED_MODEL or chunking re-embeds everything. An unchanged corpus costs no
+# embedding calls and leaves the store untouched — unless VECTOR_DTYPE or
+# VECTOR_QUANTIZATION changed, in which case the stored vectors are rewritten
+# and re-encoded, still without embedding anything.
+#
+# After the vectors, the BM25 index (src/rag/bm25.py) is rebuilt over every
+# chunk in the store, for hybrid retrieval.
+#
+# Every build stamps CORPUS_VERSION_FILE with a hash of the indexed chunk IDs.
+# Chunk IDs are derived from content, so the stamp changes exactly when the
+# indexed content does; the answer cache (src/rag/answer_cache.py) is scoped
+# by it and never serves answers grounded in an older corpus.
 
 from __future__ import annotations
 
+import argparse
 import hashlib
 import json
 from pathlib import Path
 
 CORPUS_DIR        = Path(__file__).parent / "corpus"
-CHROMA_PATH       = str(Path(__file__).parent / "chroma_store")
-CHROMA_COLLECTION = "emory_das"
 EMBED_MODEL       = "text-embedding-3-small"
 CHUNK_SIZE        = 800   # characters per chunk
 CHUNK_OVERLAP     = 100
+CORPUS_VERSION_FILE = Path(__file__).parent / "corpus_version"
 
 
 # ── Text loading ──────────────────────────────────────────────────────────────
@@ -32,7 +53,7 @@ def _load_plain(path: Path) -> list[dict]:
     text = path.read_text(encoding="utf-8", errors="ignore").strip()
     if not text:
         return []
-    return [{"url": "", "title": path.stem, "description": "", "markdown": text, "content_hash": ""}]
+    return [{"url": "", "title": path.stem, "description": "", "markdown": text, "content_hash": _hash(text)}]
 
 
 def _load_corpus_json(path: Path) -> list[dict]:
@@ -49,7 +70,7 @@ def _load_corpus_json(path: Path) -> list[dict]:
             "title":        r.get("title", ""),
             "description":  r.get("description", ""),
             "markdown":     r.get("markdown", ""),
-            "content_hash": r.get("content_hash", ""),
+            "content_hash": r.get("content_hash") or _hash(r.get("markdown", "")),
             "content_type": r.get("content_type", "html"),
         }
         for r in records
@@ -82,31 +103,97 @@ def _chunk_id(url: str, content_hash: str, index: int) -> str:
     """
     Stable ID per chunk. Incorporates content_hash so re-indexing the same
     content produces the same IDs (upsert is idempotent) and changed content
-    produces new IDs (old chunks are naturally superseded via collection rebuild).
-    Falls back to path-based hash for plain text files without a URL.
+    produces new IDs (the old ones are then deleted as stale). Plain text
+    files have no URL; their content_hash alone keeps the IDs apart.
     """
     key = f"{url or 'plaintext'}:{content_hash}:{index}"
     return hashlib.md5(key.encode()).hexdigest()
 
 
-# ── Main ──────────────────────────────────────────────────────────────────────
+# ── BM25 ──────────────────────────────────────────────────────────────────────
 
-def build_index() -> None:
-    import chromadb
-    from openai import OpenAI
-    from src.config import CHAT_GPT_API_KEY
+def _build_bm25(store):
+    from src.rag.bm25 import BM25Index
 
-    openai_client = OpenAI(api_key=CHAT_GPT_API_KEY)
-    chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
-    collection    = chroma_client.get_or_create_collection(CHROMA_COLLECTION)
+    chunks = store.get(store.ids())
+    index  = BM25Index.build(
+        [c["id"] for c in chunks],
+        [f"{c.get('title', '')}\n{c['text']}" for c in chunks],
+        [c.get("url", "") for c in chunks],
+    )
+    index.save()
+    return index
+
+
+# ── Corpus version ────────────────────────────────────────────────────────────
+
+_corpus_version = ""     # read once per process, like the index itself
+
+
+def _write_corpus_version(store) -> str:
+    global _corpus_version
+    ids     = sorted(store.ids())
+    version = hashlib.sha1("\n".join(ids).encode()).hexdigest()[:16]
+    CORPUS_VERSION_FILE.write_text(version)
+    _corpus_version = version
+    return version
+
+
+def corpus_version() -> str:
+    """
+    Stamp written by the last build_index(), or "" if the corpus was never
+    indexed. Read from disk until found, then kept: a server goes on serving
+    the index its retriever loaded until it restarts, and a build_index() in
+    this process updates it.
+    """
+    global _corpus_version
+    if not _corpus_version:
+        try:
+            _corpus_version = CORPUS_VERSION_FILE.read_text().strip()
+        except OSError:
+            return ""
+    return _corpus_version
+
+
+# ── Manifest ──────────────────────────────────────────────────────────────────
+
+def _manifest_path(backend: str) -> Path:
+    from src.rag.vector_store import CHROMA_PATH, NUMPY_STORE_PATH
+
+    return (Path(CHROMA_PATH) if backend == "chroma" else NUMPY_STORE_PATH) / "index_manifest.json"
+
+
+def _read_manifest(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
 
-    files = [f for f in CORPUS_DIR.glob("**/*") if f.is_file()]
-    if not files:
-        print(f"No files found in {CORPUS_DIR}. Add a corpus JSON or .txt/.md files and re-run.")
-        return
 
-    total_chunks = 0
+def _write_manifest(path: Path, planned: list[dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "embed_model": EMBED_MODEL,
+        "chunking":    [CHUNK_SIZE, CHUNK_OVERLAP],
+        "records": [
+            {"url": r["url"], "title": r["title"], "content_hash": r["content_hash"], "ids": r["ids"]}
+            for r in planned
+        ],
+    }
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
 
+
+def _hash(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+# ── Main ──────────────────────────────────────────────────────────────────────
+
+def _plan(files: list[Path]) -> list[dict]:
+    """Every corpus record once, with its chunks and their IDs."""
+    planned, seen = [], set()
     for path in files:
         print(f"Loading: {path.name}")
         records = _load_file(path)
@@ -114,37 +201,111 @@ def build_index() -> None:
             print("  → no content, skipped")
             continue
         print(f"  → {len(records)} records")
-
         for record in records:
+            key = (record["url"], record["content_hash"])
+            if key in seen:
+                continue                  # the same page version in another corpus file
+            seen.add(key)
             chunks = _chunk(record["markdown"])
-            if not chunks:
-                continue
-
-            for i in range(0, len(chunks), 100):
-                batch      = chunks[i : i + 100]
-                resp       = openai_client.embeddings.create(model=EMBED_MODEL, input=batch)
-                embeddings = [r.embedding for r in resp.data]
-                ids        = [_chunk_id(record["url"], record["content_hash"], i + j) for j in range(len(batch))]
-                metadatas  = [
-                    {
-                        "url":          record["url"],
-                        "title":        record["title"],
-                        "description":  record["description"],
-                        "content_type": record.get("content_type", ""),
-                        "chunk":        i + j,
-                    }
-                    for j in range(len(batch))
-                ]
-                collection.upsert(
-                    ids=ids,
-                    embeddings=embeddings,
-                    documents=batch,
-                    metadatas=metadatas,
-                )
-                total_chunks += len(batch)
-
-    print(f"\nDone. Collection '{CHROMA_COLLECTION}' has {collection.count()} chunks total ({total_chunks} upserted this run).")
+            if chunks:
+                ids = [_chunk_id(record["url"], record["content_hash"], i) for i in range(len(chunks))]
+                planned.append({**record, "chunks": chunks, "ids": ids})
+    return planned
+
+
+def _embed_and_upsert(store, openai_client, records: list[dict]) -> tuple[int, int]:
+    """Embed `records`' chunks 100 at a time across records; returns (chunks, embedding calls)."""
+    pending = [(record, i) for record in records for i in range(len(record["chunks"]))]
+    calls   = 0
+    for start in range(0, len(pending), 100):
+        batch = pending[start:start + 100]
+        resp  = openai_client.embeddings.create(model=EMBED_MODEL, input=[r["chunks"][i] for r, i in batch])
+        calls += 1
+        store.upsert(
+            ids=[r["ids"][i] for r, i in batch],
+            embeddings=[d.embedding for d in resp.data],
+            documents=[r["chunks"][i] for r, i in batch],
+            metadatas=[
+                {
+                    "url":          r["url"],
+                    "title":        r["title"],
+                    "description":  r["description"],
+                    "content_type": r.get("content_type", ""),
+                    "chunk":        i,
+                }
+                for r, i in batch
+            ],
+        )
+    return len(pending), calls
+
+
+def build_index(backend: str | None = None, full: bool = False) -> None:
+    from openai import OpenAI
+    from src.config import CHAT_GPT_API_KEY, OPENAI_BASE_URL, VECTOR_BACKEND
+    from src.rag.bm25 import BM25_PATH
+    from src.rag.vector_store import open_vector_store
+
+    backend       = backend or VECTOR_BACKEND
+    openai_client = OpenAI(api_key=CHAT_GPT_API_KEY, base_url=OPENAI_BASE_URL)
+    store         = open_vector_store(backend, create=True)
+
+    files = [f for f in CORPUS_DIR.glob("**/*") if f.is_file()]
+    if not files:
+        print(f"No files found in {CORPUS_DIR}. Add a corpus JSON or .txt/.md files and re-run.")
+        return
+
+    manifest_path = _manifest_path(backend)
+    manifest      = _read_manifest(manifest_path)
+    if manifest and (manifest.get("embed_model") != EMBED_MODEL or manifest.get("chunking") != [CHUNK_SIZE, CHUNK_OVERLAP]):
+        print("Embedding model or chunking changed since the last build — re-embedding everything.")
+        full = True
+
+    planned  = _plan(files)
+    indexed  = set(store.ids())
+    expected = {id_ for record in planned for id_ in record["ids"]}
+    to_embed = [r for r in planned if full or not indexed.issuperset(r["ids"])]
+    stale    = sorted(indexed - expected)
+
+    # Page-level diff against the previous build, for the summary
+    before    = {r["url"] or r["title"]: r["content_hash"] for r in manifest.get("records", [])}
+    after     = {r["url"] or r["title"]: r["content_hash"] for r in planned}
+    embedded  = {r["url"] or r["title"] for r in to_embed}
+    added     = [page for page in embedded if page not in before]
+    changed   = [page for page in embedded if page in before and before[page] != after[page]]
+    removed   = [page for page in before if page not in after]
+
+    store.delete(stale)
+    chunks, calls = _embed_and_upsert(store, openai_client, to_embed)
+
+    if to_embed or stale or not BM25_PATH.exists() or not CORPUS_VERSION_FILE.exists():
+        store.save()
+        lexical = _build_bm25(store)
+        version = _write_corpus_version(store)
+        status  = f"BM25 {len(lexical.terms)} terms, corpus version {version}"
+    elif store.needs_save():
+        # Same chunks, but VECTOR_DTYPE / VECTOR_QUANTIZATION changed: rewrite from the stored vectors
+        store.save()
+        status  = f"re-encoded the stored vectors, corpus version {corpus_version()}"
+    else:
+        status  = f"nothing to do, corpus version {corpus_version()}"
+    _write_manifest(manifest_path, planned)
+
+    print(
+        f"\nDiff: {len(added)} new, {len(changed)} changed, {len(removed)} removed, "
+        f"{len(planned) - len(to_embed)} unchanged records; "
+        f"{chunks} chunks embedded in {calls} calls, {len(stale)} stale chunks deleted."
+    )
+    for label, pages in (("new", added), ("changed", changed), ("removed", removed)):
+        for page in sorted(pages)[:20]:
+            print(f"  {label:<8} {page}")
+        if len(pages) > 20:
+            print(f"  … and {len(pages) - 20} more {label}")
+    print(f"Done. {backend} store has {store.count()} chunks, {status}.")
 
 
 if __name__ == "__main__":
-    build_index()
+    parser = argparse.ArgumentParser(description="Build the DAS FAQ vector store")
+    parser.add_argument("--backend", choices=("chroma", "numpy"), help="overrides VECTOR_BACKEND")
+    parser.add_argument("--full", action="store_true", help="re-embed every record, not just new and changed ones")
+    args = parser.parse_args()
+    build_index(args.backend, args.full)
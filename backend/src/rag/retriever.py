@@ -1,28 +1,118 @@
 # src/rag/retriever.py
 #
-# Queries the ChromaDB vector store and returns the top-k relevant chunks
-# with source metadata for the RAG agent to use in citations.
+# Queries the vector store (src/rag/vector_store.py — ChromaDB or the built-in
+# NumPy index, per VECTOR_BACKEND) and returns the top-k relevant chunks with
+# source metadata for the RAG agent to use in citations. Query embeddings go
+# through src/rag/embedding_cache.py.
+#
+# With HYBRID_RETRIEVAL, dense results are fused with the BM25 index
+# (src/rag/bm25.py) by reciprocal rank, so exact terms such as form and
+# building names are found too. A query BM25 answers confidently (every term
+# in the best chunk, which scores LEXICAL_FAST_MARGIN × the best chunk of any
+# other page) skips the embedding call altogether. Without a BM25 index, retrieval is dense only.
+#
+# The server uses the async API (aquery, or alexical / aembed / asearch for
+# its steps — the RAG agent checks BM25 before it embeds): embeddings go
+# through the shared AsyncOpenAI gateway and the vector search runs on a
+# small dedicated thread pool (RETRIEVER_THREADS), so a retrieval never
+# blocks the event loop that streams every other session's tokens.
+# query() is the blocking equivalent for scripts.
 #
 # Prerequisites:
-#   pip install chromadb openai
-#   Run src/rag/indexer.py at least once to build the store.
+#   Run src/rag/indexer.py at least once to build the store
+#   (chromadb is only needed with VECTOR_BACKEND=chroma).
 
 from __future__ import annotations
 
-CHROMA_COLLECTION = "emory_das"
-CHROMA_PATH       = "src/rag/chroma_store"
-EMBED_MODEL       = "text-embedding-3-small"
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src import metrics
+from src.config import RETRIEVER_THREADS, HYBRID_RETRIEVAL, LEXICAL_FAST_MARGIN
+from src.rag.bm25 import BM25Index, Match, tokenize
+from src.rag.vector_store import VectorStore, open_vector_store
+
+EMBED_MODEL = "text-embedding-3-small"
+
+_RRF_K            = 60     # reciprocal rank fusion: score = Σ 1 / (_RRF_K + rank)
+_MIN_CANDIDATES   = 20     # per ranking fed into the fusion
+_FAST_MIN_TERMS   = 2      # a one-word query is too ambiguous to skip the dense search
+
+RETRIEVALS = metrics.counter(
+    "medease_retrievals_total",
+    "RAG retrievals, by mode (lexical = BM25 only, no embedding; hybrid; dense).",
+    ("mode",),
+)
+
+# Bounded: vector searches queue here rather than piling onto the default executor
+_search_pool = ThreadPoolExecutor(max_workers=RETRIEVER_THREADS, thread_name_prefix="retriever")
 
 
 class Retriever:
-    def __init__(self):
-        import chromadb
+    """
+    Args:
+        store:   the vector store to search; defaults to open_vector_store()
+                 (raises if the index has not been built).
+        lexical: the BM25 index over the same chunks; defaults to the one the
+                 indexer built, if HYBRID_RETRIEVAL is on.
+    """
+
+    def __init__(self, store: VectorStore | None = None, lexical: BM25Index | None = None):
         from openai import OpenAI
-        from src.config import CHAT_GPT_API_KEY
+        from src.config import CHAT_GPT_API_KEY, OPENAI_BASE_URL
 
-        self._openai     = OpenAI(api_key=CHAT_GPT_API_KEY)
-        self._chroma     = chromadb.PersistentClient(path=CHROMA_PATH)
-        self._collection = self._chroma.get_collection(CHROMA_COLLECTION)
+        self._openai  = OpenAI(api_key=CHAT_GPT_API_KEY, base_url=OPENAI_BASE_URL)
+        self._store   = store if store is not None else open_vector_store()
+        self._lexical = lexical if lexical is not None else (BM25Index.load() if HYBRID_RETRIEVAL else None)
+        if HYBRID_RETRIEVAL and self._lexical is None:
+            print("[Retriever] no BM25 index — re-run the indexer for hybrid retrieval; dense only")
+
+    def warm(self) -> None:
+        """Load the index from disk ahead of the first query (blocking)."""
+        self._store.warm()
+
+    async def aquery(self, text: str, top_k: int = 4, deadline: float | None = None) -> list[dict]:
+        """query() without blocking the event loop."""
+        lexical, hits = await self.alexical(text, top_k)
+        if hits is not None:
+            return hits
+        embedding = await self.aembed(text, deadline)
+        return await self.asearch(embedding, top_k, lexical=lexical)
+
+    async def alexical(self, text: str, top_k: int = 4) -> tuple[list[tuple[str, float]], list[dict] | None]:
+        """
+        The BM25 step of aquery(): (lexical candidates for asearch(), the final
+        results if BM25 is confident enough to skip the embedding, else None).
+        """
+        return await asyncio.get_running_loop().run_in_executor(_search_pool, self._lexical_first, text, top_k)
+
+    async def aembed(self, text: str, deadline: float | None = None) -> np.ndarray:
+        from src import llm_gateway
+        from src.rag.embedding_cache import embedding_cache
+
+        # SQLite lookups and writes can block, so only the memory tier is read on the loop
+        loop   = asyncio.get_running_loop()
+        cached = embedding_cache.peek(text, EMBED_MODEL)
+        if cached is None:
+            cached = await loop.run_in_executor(_search_pool, embedding_cache.get, text, EMBED_MODEL)
+        if cached is not None:
+            return cached
+        resp   = await llm_gateway.embed("retrieval", deadline=deadline, model=EMBED_MODEL, input=text)
+        vector = embedding_cache.remember(text, EMBED_MODEL, resp.data[0].embedding)
+        loop.run_in_executor(_search_pool, embedding_cache.put, text, EMBED_MODEL, vector)   # not awaited
+        return vector
+
+    async def asearch(
+        self,
+        embedding: np.ndarray,
+        top_k: int = 4,
+        text: str | None = None,
+        lexical: list[tuple[str, float]] | None = None,
+    ) -> list[dict]:
+        """search() on the retriever thread pool."""
+        return await asyncio.get_running_loop().run_in_executor(_search_pool, self.search, embedding, top_k, text, lexical)
 
     def query(self, text: str, top_k: int = 4) -> list[dict]:
         """
@@ -30,28 +120,108 @@ class Retriever:
 
         Each result is a dict:
             {
-                "text":  str,   # the chunk content
-                "url":   str,   # source page URL (empty for plain-text docs)
-                "title": str,   # source page title
+                "text":  str,     # the chunk content
+                "url":   str,     # source page URL (empty for plain-text docs)
+                "title": str,     # source page title
+                "id":    str,     # chunk ID
+                "chunk": int,     # position of the chunk within its page
+                "score": float,   # cosine similarity to the query, if the dense search found it
+                "bm25":  float,   # BM25 score, if the lexical search found it
+                ...               # plus description / content_type
             }
+
+        Results are in fused rank order. When BM25 alone answered (see
+        lexical_only()), no result has a "score".
         """
-        embedding = self._embed(text)
-        results   = self._collection.query(
-            query_embeddings=[embedding],
-            n_results=top_k,
-            include=["documents", "metadatas"],
-        )
-        docs   = results.get("documents", [[]])[0]
-        metas  = results.get("metadatas", [[]])[0]
-        return [
-            {
-                "text":  doc,
-                "url":   m.get("url", ""),
-                "title": m.get("title", ""),
-            }
-            for doc, m in zip(docs, metas)
-        ]
+        lexical, hits = self._lexical_first(text, top_k)
+        if hits is not None:
+            return hits
+        return self._fused(self._embed(text), lexical, top_k)
+
+    def search(
+        self,
+        embedding: np.ndarray,
+        top_k: int = 4,
+        text: str | None = None,
+        lexical: list[tuple[str, float]] | None = None,
+    ) -> list[dict]:
+        """
+        query() for an already computed query embedding. `text` adds the
+        lexical ranking; `lexical` passes candidates alexical() already found.
+        """
+        if lexical is None:
+            lexical = self._lexical.search(text, _candidates(top_k)).hits if text and self._lexical else []
+        return self._fused(embedding, lexical, top_k)
+
+    # ── Ranking ───────────────────────────────────────────────────────────────
+
+    def _lexical_first(self, text: str, top_k: int) -> tuple[list[tuple[str, float]], list[dict] | None]:
+        """BM25 candidates, plus the final results when they are confident enough to skip the embedding."""
+        if self._lexical is None:
+            return [], None
+        match = self._lexical.search(text, _candidates(top_k))
+        if not _confident(match, text):
+            return match.hits, None
+        RETRIEVALS.inc(mode="lexical")
+        scores = dict(match.hits[:top_k])
+        return match.hits, [_with_defaults({**hit, "bm25": scores[hit["id"]]}) for hit in self._store.get(list(scores))]
+
+    def _fused(self, embedding: np.ndarray, lexical: list[tuple[str, float]], top_k: int) -> list[dict]:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if not lexical:
+            RETRIEVALS.inc(mode="dense")
+            return [_with_defaults(hit) for hit in self._store.query(embedding, top_k)]
+
+        RETRIEVALS.inc(mode="hybrid")
+        dense  = {hit["id"]: hit for hit in self._store.query(embedding, _candidates(top_k))}
+        bm25   = dict(lexical)
+        fused: dict[str, float] = {}
+        for ranking in (list(dense), list(bm25)):
+            for rank, id_ in enumerate(ranking, 1):
+                fused[id_] = fused.get(id_, 0.0) + 1 / (_RRF_K + rank)
+        best    = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        fetched = {hit["id"]: hit for hit in self._store.get([i for i in best if i not in dense])}
+        hits    = []
+        for id_ in best:
+            hit = dense.get(id_) or fetched.get(id_)
+            if hit is None:
+                continue                     # BM25 index older than the store
+            if id_ in bm25:
+                hit = {**hit, "bm25": bm25[id_]}
+            hits.append(_with_defaults(hit))
+        return hits
+
+    def _embed(self, text: str) -> np.ndarray:
+        from src import llm_cassette
+        from src.rag.embedding_cache import embedding_cache
+
+        cached = embedding_cache.get(text, EMBED_MODEL)
+        if cached is not None:
+            return cached
+        resp = llm_cassette.create_sync(self._openai.embeddings.create, {"model": EMBED_MODEL, "input": text})
+        return embedding_cache.put(text, EMBED_MODEL, resp.data[0].embedding)
+
+
+def lexical_only(hits: list[dict]) -> bool:
+    """
+    True for results BM25 answered on its own, without a query embedding.
+    Fused results always include the best dense hit, which carries a score.
+    """
+    return bool(hits) and all("score" not in hit for hit in hits)
+
+
+def _candidates(top_k: int) -> int:
+    return max(_MIN_CANDIDATES, 4 * top_k)
+
+
+def _confident(match: Match, text: str) -> bool:
+    return (
+        LEXICAL_FAST_MARGIN > 0
+        and match.coverage >= 1.0
+        and match.margin >= LEXICAL_FAST_MARGIN
+        and len(set(tokenize(text))) >= _FAST_MIN_TERMS
+    )
+
 
-    def _embed(self, text: str) -> list[float]:
-        resp = self._openai.embeddings.create(model=EMBED_MODEL, input=text)
-        return resp.data[0].embedding
+def _with_defaults(hit: dict) -> dict:
+    return {**hit, "url": hit.get("url", ""), "title": hit.get("title", "")}
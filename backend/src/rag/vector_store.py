@@ -0,0 +1,501 @@
+# src/rag/vector_store.py
+#
+# Storage for the chunk embeddings behind Retriever and build_index, selected
+# by VECTOR_BACKEND:
+#
+#   chroma   ChromaDB PersistentClient at CHROMA_PATH (the original backend)
+#   numpy    built in: unit-normalized embeddings as one memory-mapped
+#            float32 / float16 matrix (VECTOR_DTYPE) plus a compact metadata
+#            table; a query is one matrix-vector product and argpartition.
+#            No extra dependencies, starts in milliseconds, and only the
+#            pages a query touches are resident.
+#
+#            With VECTOR_QUANTIZATION=int8 or pq, the first pass scans compact
+#            codes instead (int8: 4× smaller than float32; pq: 1536 dims in
+#            VECTOR_PQ_SUBVECTORS bytes) and only the VECTOR_RERANK × top_k
+#            best candidates are re-scored against the float rows, so scores
+#            stay exact and the float matrix is barely paged in.
+#            benchmarks/quantization_recall.py checks recall against exact search.
+#
+# Both take the same writes (upsert / delete / save) and return the same
+# query results: dicts of id, text, score (cosine similarity) and the chunk's
+# metadata (url, title, description, content_type, chunk).
+#
+# Usage:
+#   store = open_vector_store()                 # VECTOR_BACKEND, read side
+#   hits  = store.query(unit_embedding, top_k=4)
+#
+#   store = open_vector_store(create=True)      # indexer
+#   store.upsert(ids, embeddings, documents, metadatas); store.save()
+
+from __future__ import annotations
+
+import json
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+
+from src.config import VECTOR_BACKEND, VECTOR_DTYPE, VECTOR_QUANTIZATION, VECTOR_PQ_SUBVECTORS, VECTOR_RERANK
+
+RAG_DIR           = Path(__file__).parent
+CHROMA_PATH       = str(RAG_DIR / "chroma_store")
+CHROMA_COLLECTION = "emory_das"
+NUMPY_STORE_PATH  = RAG_DIR / "numpy_store"
+
+# Chunk metadata shared by every chunk of a page; stored once per page
+_SOURCE_FIELDS = ("url", "title", "description", "content_type")
+_QUERY_BLOCK   = 2048     # rows per block when upcasting float16 / int8 rows for scoring
+_PQ_CENTROIDS  = 256      # per subspace, so a code is one uint8
+_PQ_TRAIN_ROWS = 40 * _PQ_CENTROIDS   # k-means sample
+_PQ_ITERATIONS = 15
+
+
+class VectorStore(ABC):
+    @abstractmethod
+    def query(self, embedding: np.ndarray, top_k: int) -> list[dict]:
+        """Top-k chunks by cosine similarity to `embedding`, best first."""
+
+    @abstractmethod
+    def upsert(self, ids: list[str], embeddings, documents: list[str], metadatas: list[dict]) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, ids: list[str]) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, ids: list[str]) -> list[dict]:
+        """Chunks by ID, in that order, like query() results without a score. Unknown IDs are skipped."""
+
+    @abstractmethod
+    def ids(self) -> list[str]:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    def save(self) -> None:
+        """Persist writes. Stores that write through do nothing."""
+
+    def needs_save(self) -> bool:
+        """True if the files on disk don't match the store's settings; save() brings them in line."""
+        return False
+
+    def warm(self) -> None:
+        """Bring the index into memory ahead of the first query."""
+
+
+# ── ChromaDB ──────────────────────────────────────────────────────────────────
+
+class ChromaVectorStore(VectorStore):
+    def __init__(self, path: str = CHROMA_PATH, name: str = CHROMA_COLLECTION, create: bool = False):
+        import chromadb
+
+        client = chromadb.PersistentClient(path=path)
+        self._collection = client.get_or_create_collection(name) if create else client.get_collection(name)
+
+    def query(self, embedding: np.ndarray, top_k: int) -> list[dict]:
+        results = self._collection.query(
+            query_embeddings=[np.asarray(embedding, dtype=np.float32).tolist()],
+            n_results=top_k,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            # Default space is squared L2; for unit vectors cosine = 1 - d / 2
+            {**(meta or {}), "id": id_, "text": doc, "score": 1.0 - dist / 2}
+            for id_, doc, meta, dist in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
+
+    def upsert(self, ids: list[str], embeddings, documents: list[str], metadatas: list[dict]) -> None:
+        self._collection.upsert(ids=ids, embeddings=np.asarray(embeddings).tolist(), documents=documents, metadatas=metadatas)
+
+    def delete(self, ids: list[str]) -> None:
+        if ids:
+            self._collection.delete(ids=ids)
+
+    def get(self, ids: list[str]) -> list[dict]:
+        if not ids:
+            return []
+        results = self._collection.get(ids=ids, include=["documents", "metadatas"])
+        found   = {
+            id_: {**(meta or {}), "id": id_, "text": doc}
+            for id_, doc, meta in zip(results["ids"], results["documents"], results["metadatas"])
+        }
+        return [found[i] for i in ids if i in found]
+
+    def ids(self) -> list[str]:
+        return self._collection.get(include=[])["ids"]
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def warm(self) -> None:
+        # Chroma loads a segment's HNSW index on its first query
+        sample = self._collection.get(limit=1, include=["embeddings"])
+        if sample.get("embeddings") is not None and len(sample["embeddings"]):
+            self.query(np.asarray(sample["embeddings"][0]), top_k=1)
+
+
+# ── NumPy (memory-mapped) ─────────────────────────────────────────────────────
+
+class NumpyVectorStore(VectorStore):
+    """
+    Files in `path`:
+        vectors.npy   N × dim unit-normalized rows, `dtype`; opened with mmap_mode="r"
+        chunks.json   {"ids", "texts", "source" (row → index into "sources"),
+                       "chunk", "sources": [{url, title, description, content_type}]}
+        int8*.npy / pq*.npy   codes for `quantization`, when enabled
+
+    Writes are held in memory until save(), which replaces the files; until
+    then queries search the float rows exactly.
+    """
+
+    def __init__(
+        self,
+        path: Path = NUMPY_STORE_PATH,
+        dtype: str = VECTOR_DTYPE,
+        create: bool = False,
+        quantization: str = VECTOR_QUANTIZATION,
+        rerank: int = VECTOR_RERANK,
+    ):
+        if quantization not in _QUANTIZERS and quantization != "none":
+            raise ValueError(f"Unknown VECTOR_QUANTIZATION: {quantization!r} (expected 'none', 'int8' or 'pq')")
+        self.path  = Path(path)
+        self.dtype = np.dtype(dtype)
+        self.quantization = quantization
+        self.rerank       = max(1, rerank)
+        self._codes: _Int8Codes | _PQCodes | None = None
+        if (self.path / "chunks.json").exists():
+            self._load()
+        elif create:
+            self._vectors = None
+            self._ids, self._texts, self._source, self._chunk = [], [], [], []
+            self._sources: list[dict] = []
+            self._row: dict[str, int] = {}
+            self._source_ids: dict[tuple, int] = {}
+        else:
+            raise FileNotFoundError(f"no vector store at {self.path} — run `python -m src.rag.indexer`")
+
+    def query(self, embedding: np.ndarray, top_k: int) -> list[dict]:
+        if self._vectors is None or not len(self._ids):
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        if self._codes is not None:
+            return self._rescored(query, top_k)
+        scores = self._scores(query)
+        top_k  = min(top_k, len(scores))
+        top    = np.argpartition(-scores, top_k - 1)[:top_k]
+        top    = top[np.argsort(-scores[top])]
+        return [self._hit(int(i), float(scores[i])) for i in top]
+
+    def upsert(self, ids: list[str], embeddings, documents: list[str], metadatas: list[dict]) -> None:
+        vectors = _normalized(np.asarray(embeddings, dtype=np.float32)).astype(self.dtype)
+        self._codes = None          # stale until save() re-encodes
+        if self._vectors is None:
+            self._vectors = np.empty((0, vectors.shape[1]), dtype=self.dtype)
+        elif not self._vectors.flags.writeable or self._vectors.dtype != self.dtype:
+            self._vectors = np.array(self._vectors, dtype=self.dtype)   # copy the mmap before the first write
+
+        new_rows = []
+        for id_, vector, doc, meta in zip(ids, vectors, documents, metadatas):
+            source = self._source_index(meta)
+            row    = self._row.get(id_)
+            if row is None:
+                self._row[id_] = len(self._ids)
+                self._ids.append(id_)
+                self._texts.append(doc)
+                self._source.append(source)
+                self._chunk.append(meta.get("chunk", 0))
+                new_rows.append(vector)
+            else:
+                if row < len(self._vectors):
+                    self._vectors[row] = vector
+                else:
+                    new_rows[row - len(self._vectors)] = vector     # repeated id within this call
+                self._texts[row], self._source[row], self._chunk[row] = doc, source, meta.get("chunk", 0)
+        if new_rows:
+            self._vectors = np.concatenate([self._vectors, np.stack(new_rows)])
+
+    def delete(self, ids: list[str]) -> None:
+        rows = {self._row[i] for i in ids if i in self._row}
+        if not rows:
+            return
+        self._codes = None
+        keep = np.array([r not in rows for r in range(len(self._ids))])
+        self._vectors = np.array(self._vectors[keep])
+        self._ids    = [v for v, k in zip(self._ids, keep) if k]
+        self._texts  = [v for v, k in zip(self._texts, keep) if k]
+        self._source = [v for v, k in zip(self._source, keep) if k]
+        self._chunk  = [v for v, k in zip(self._chunk, keep) if k]
+        self._row    = {id_: r for r, id_ in enumerate(self._ids)}
+
+    def get(self, ids: list[str]) -> list[dict]:
+        return [self._hit(self._row[i]) for i in ids if i in self._row]
+
+    def ids(self) -> list[str]:
+        return list(self._ids)
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def needs_save(self) -> bool:
+        """Rows in another dtype, or codes missing / left over from another VECTOR_QUANTIZATION."""
+        if self._vectors is None:
+            return False
+        if self._vectors.dtype != self.dtype or (self.quantization != "none" and self._codes is None):
+            return True
+        return any(
+            (self.path / name).exists()
+            for quantization, codec in _QUANTIZERS.items() if quantization != self.quantization
+            for name in codec.FILES
+        )
+
+    def save(self) -> None:
+        self._drop_unused_sources()
+        self.path.mkdir(parents=True, exist_ok=True)
+        vectors = self._vectors if self._vectors is not None else np.empty((0, 0), dtype=self.dtype)
+        vectors = vectors.astype(self.dtype, copy=False)          # VECTOR_DTYPE changed since the last save
+        with open(self.path / "vectors.npy.tmp", "wb") as f:
+            np.save(f, vectors)
+        with open(self.path / "chunks.json.tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self._ids, "texts": self._texts, "source": self._source,
+                "chunk": self._chunk, "sources": self._sources,
+            }, f, ensure_ascii=False)
+        os.replace(self.path / "vectors.npy.tmp", self.path / "vectors.npy")
+        os.replace(self.path / "chunks.json.tmp", self.path / "chunks.json")
+        self._vectors = vectors if vectors.size else self._vectors
+
+        for name, codec in _QUANTIZERS.items():
+            if name != self.quantization:
+                codec.remove(self.path)          # never leave codes for other rows behind
+        if self.quantization != "none" and len(self._ids):
+            self._codes = _QUANTIZERS[self.quantization].encode(np.asarray(self._vectors, dtype=np.float32))
+            self._codes.save(self.path)
+
+    def warm(self) -> None:
+        if self._vectors is None or not len(self._ids):
+            return
+        zero = np.zeros(self._vectors.shape[1], dtype=np.float32)
+        if self._codes is not None:
+            self._codes.scores(zero)             # only the codes need to be resident
+        else:
+            self._scores(zero)                   # faults every page in
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    def _load(self) -> None:
+        with open(self.path / "chunks.json", encoding="utf-8") as f:
+            table = json.load(f)
+        vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        if vectors.shape[0] != len(table["ids"]):
+            raise ValueError(f"{self.path}: vectors.npy and chunks.json disagree — re-run the indexer")
+        self._vectors = vectors if vectors.size else None
+        self._ids, self._texts = table["ids"], table["texts"]
+        self._source, self._chunk, self._sources = table["source"], table["chunk"], table["sources"]
+        self._row = {id_: r for r, id_ in enumerate(self._ids)}
+        self._source_ids = {_source_key(s): i for i, s in enumerate(self._sources)}
+        if self.quantization != "none" and self._vectors is not None:
+            self._codes = _QUANTIZERS[self.quantization].load(self.path, len(self._ids))
+            if self._codes is None:
+                print(f"[vector_store] no {self.quantization} codes in {self.path} — re-run the indexer; searching exact vectors")
+
+    def _rescored(self, query: np.ndarray, top_k: int) -> list[dict]:
+        approx = self._codes.scores(query)
+        count  = min(len(approx), top_k * self.rerank)
+        rows   = np.sort(np.argpartition(-approx, count - 1)[:count])     # sorted: sequential mmap reads
+        exact  = np.asarray(self._vectors[rows], dtype=np.float32) @ query
+        best   = np.argsort(-exact)[:top_k]
+        return [self._hit(int(rows[i]), float(exact[i])) for i in best]
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        if self._vectors.dtype == np.float32:
+            return self._vectors @ query
+        # No BLAS for float16: upcast block by block rather than the whole matrix
+        return np.concatenate([
+            self._vectors[i:i + _QUERY_BLOCK].astype(np.float32) @ query
+            for i in range(0, len(self._vectors), _QUERY_BLOCK)
+        ])
+
+    def _hit(self, row: int, score: float | None = None) -> dict:
+        hit = {
+            **self._sources[self._source[row]],
+            "chunk": self._chunk[row],
+            "id":    self._ids[row],
+            "text":  self._texts[row],
+        }
+        if score is not None:
+            hit["score"] = score
+        return hit
+
+    def _source_index(self, meta: dict) -> int:
+        source = {field: meta.get(field, "") for field in _SOURCE_FIELDS}
+        key    = _source_key(source)
+        index  = self._source_ids.get(key)
+        if index is None:
+            index = self._source_ids[key] = len(self._sources)
+            self._sources.append(source)
+        return index
+
+    def _drop_unused_sources(self) -> None:
+        used  = sorted(set(self._source))
+        remap = {old: new for new, old in enumerate(used)}
+        self._sources    = [self._sources[i] for i in used]
+        self._source     = [remap[i] for i in self._source]
+        self._source_ids = {_source_key(s): i for i, s in enumerate(self._sources)}
+
+
+# ── Quantization ──────────────────────────────────────────────────────────────
+
+class _Int8Codes:
+    """Each row scaled by its largest |value| into int8; score ≈ scale · (codes · q)."""
+
+    FILES = ("int8_codes.npy", "int8_scales.npy")
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes  = codes
+        self.scales = scales
+
+    @classmethod
+    def encode(cls, vectors: np.ndarray) -> _Int8Codes:
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes  = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return cls(codes, scales.astype(np.float32))
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        return np.concatenate([
+            self.codes[i:i + _QUERY_BLOCK].astype(np.float32) @ query
+            for i in range(0, len(self.codes), _QUERY_BLOCK)
+        ]) * self.scales
+
+    def save(self, path: Path) -> None:
+        _save_arrays(path, dict(zip(self.FILES, (self.codes, self.scales))))
+
+    @classmethod
+    def load(cls, path: Path, rows: int) -> _Int8Codes | None:
+        arrays = _load_arrays(path, cls.FILES, rows)
+        return cls(*arrays) if arrays else None
+
+    @classmethod
+    def remove(cls, path: Path) -> None:
+        _remove(path, cls.FILES)
+
+
+class _PQCodes:
+    """
+    Product quantization: each row is split into `subvectors` slices and every
+    slice is replaced by the nearest of 256 k-means centroids for that slice,
+    so a row is `subvectors` bytes. A query scores each centroid once (a
+    subvectors × 256 table) and a row's score is the sum of its table entries.
+    """
+
+    FILES = ("pq_codes.npy", "pq_centroids.npy")
+
+    def __init__(self, codes: np.ndarray, centroids: np.ndarray):
+        self.codes     = codes            # rows × subvectors, uint8
+        self.centroids = centroids        # subvectors × 256 × slice width, float32
+        self._offsets  = np.arange(codes.shape[1], dtype=np.int32) * centroids.shape[1]
+
+    @classmethod
+    def encode(cls, vectors: np.ndarray, subvectors: int = VECTOR_PQ_SUBVECTORS) -> _PQCodes:
+        rows, dim = vectors.shape
+        if dim % subvectors:
+            raise ValueError(f"VECTOR_PQ_SUBVECTORS={subvectors} does not divide the embedding dimension {dim}")
+        rng     = np.random.default_rng(0)
+        width   = dim // subvectors
+        k       = min(_PQ_CENTROIDS, rows)
+        sample  = vectors[rng.choice(rows, min(rows, _PQ_TRAIN_ROWS), replace=False)]
+        centroids = np.empty((subvectors, k, width), dtype=np.float32)
+        codes     = np.empty((rows, subvectors), dtype=np.uint8)
+        for m in range(subvectors):
+            part = slice(m * width, (m + 1) * width)
+            centroids[m] = _kmeans(sample[:, part], k, rng)
+            codes[:, m]  = _nearest(vectors[:, part], centroids[m])
+        return cls(codes, centroids)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        subvectors, k, width = self.centroids.shape
+        table = np.einsum("mkw,mw->mk", self.centroids, query.reshape(subvectors, width)).ravel()
+        return np.concatenate([
+            np.take(table, self.codes[i:i + _QUERY_BLOCK].astype(np.int32) + self._offsets).sum(axis=1)
+            for i in range(0, len(self.codes), _QUERY_BLOCK)
+        ])
+
+    def save(self, path: Path) -> None:
+        _save_arrays(path, dict(zip(self.FILES, (self.codes, self.centroids))))
+
+    @classmethod
+    def load(cls, path: Path, rows: int) -> _PQCodes | None:
+        arrays = _load_arrays(path, cls.FILES, rows)
+        return cls(*arrays) if arrays else None
+
+    @classmethod
+    def remove(cls, path: Path) -> None:
+        _remove(path, cls.FILES)
+
+
+_QUANTIZERS = {"int8": _Int8Codes, "pq": _PQCodes}
+
+
+def _kmeans(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = points[rng.choice(len(points), k, replace=False)].copy()
+    for _ in range(_PQ_ITERATIONS):
+        assign = _nearest(points, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums   = np.stack([np.bincount(assign, weights=column, minlength=k) for column in points.T], axis=1)
+        filled = counts > 0                       # an empty cluster keeps its centroid
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # argmin ‖p - c‖² = argmin (‖c‖² - 2 p·c), a block at a time to bound memory
+    norms = (centroids * centroids).sum(axis=1)
+    return np.concatenate([
+        np.argmin(norms - 2 * points[i:i + 65536] @ centroids.T, axis=1)
+        for i in range(0, len(points), 65536)
+    ]).astype(np.uint8 if len(centroids) <= 256 else np.int32)
+
+
+def _save_arrays(path: Path, arrays: dict[str, np.ndarray]) -> None:
+    for name, array in arrays.items():
+        with open(path / f"{name}.tmp", "wb") as f:
+            np.save(f, array)
+    for name in arrays:
+        os.replace(path / f"{name}.tmp", path / name)
+
+
+def _load_arrays(path: Path, names: tuple[str, ...], rows: int) -> list[np.ndarray] | None:
+    if not all((path / name).exists() for name in names):
+        return None
+    arrays = [np.load(path / name, mmap_mode="r") for name in names]
+    return arrays if arrays[0].shape[0] == rows else None
+
+
+def _remove(path: Path, names: tuple[str, ...]) -> None:
+    for name in names:
+        (path / name).unlink(missing_ok=True)
+
+
+def _source_key(source: dict) -> tuple:
+    return tuple(source.get(field, "") for field in _SOURCE_FIELDS)
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def open_vector_store(backend: str = VECTOR_BACKEND, create: bool = False) -> VectorStore:
+    """The configured store. Without `create`, a missing index raises."""
+    if backend == "numpy":
+        return NumpyVectorStore(create=create)
+    if backend == "chroma":
+        return ChromaVectorStore(create=create)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend!r} (expected 'chroma' or 'numpy')")
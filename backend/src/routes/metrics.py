@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src import metrics
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """In-process pipeline metrics in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
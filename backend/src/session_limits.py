@@ -0,0 +1,115 @@
+# src/session_limits.py
+#
+# Bookkeeping that keeps chat sessions from growing without bound in memory.
+#
+# Every session held in this process (a live socket's AgentContext and/or the
+# session store's copy of it) is tracked here in least-recently-used order,
+# with the approximate bytes its history takes. socket_server's sweeper asks
+# for victims every SESSION_SWEEP_INTERVAL seconds:
+#
+#   - sessions idle for SESSION_IDLE_TTL seconds
+#   - then the least recently used ones, while more than SESSION_MAX_COUNT
+#     sessions or SESSION_MAX_BYTES of history are held
+#
+# Byte counts are kept incrementally: history is append-only, so a touch only
+# sizes the messages added since the last one (or everything, if a rebase
+# swapped in a different log).
+#
+# Usage:
+#   limits.touch(key, context.history)     # on load / message / save
+#   for key, reason in limits.victims():   # LRU first
+#       ...evict...; limits.discard(key)
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+
+from src.agents.conversation import ConversationLog, History
+from src.config import SESSION_IDLE_TTL, SESSION_MAX_COUNT, SESSION_MAX_BYTES
+
+
+class _Usage:
+    __slots__ = ("last_active", "bytes", "log", "counted")
+
+    def __init__(self):
+        self.last_active = 0.0
+        self.bytes       = 0
+        self.log: ConversationLog | None = None
+        self.counted     = 0         # history messages already included in `bytes`
+
+
+class SessionLimits:
+    """
+    Args:
+        idle_ttl:     seconds without activity before a session is evicted.
+        max_sessions: sessions held in memory before LRU eviction.
+        max_bytes:    total approximate history bytes before LRU eviction.
+    """
+
+    def __init__(
+        self,
+        idle_ttl: float = SESSION_IDLE_TTL,
+        max_sessions: int = SESSION_MAX_COUNT,
+        max_bytes: int = SESSION_MAX_BYTES,
+    ):
+        self.idle_ttl     = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes    = max_bytes
+        self._sessions: OrderedDict[str, _Usage] = OrderedDict()
+        self._total_bytes = 0
+
+    def touch(self, key: str, history: History) -> None:
+        """Mark `key` as just used and bring its byte count up to date."""
+        usage = self._sessions.get(key)
+        if usage is None:
+            usage = self._sessions[key] = _Usage()
+        else:
+            self._sessions.move_to_end(key)
+        usage.last_active = time.monotonic()
+
+        if usage.log is not history.log or usage.counted > len(history):
+            self._total_bytes -= usage.bytes
+            usage.bytes, usage.counted, usage.log = 0, 0, history.log
+        added = history.nbytes(usage.counted)
+        usage.bytes       += added
+        usage.counted      = len(history)
+        self._total_bytes += added
+
+    def discard(self, key: str) -> None:
+        usage = self._sessions.pop(key, None)
+        if usage is not None:
+            self._total_bytes -= usage.bytes
+
+    def over_capacity(self) -> bool:
+        return len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes
+
+    def victims(self, now: float | None = None) -> list[tuple[str, str]]:
+        """
+        (key, reason) pairs to evict, least recently used first. Reason is
+        "idle", "count" or "bytes". Nothing is removed until discard().
+        """
+        now   = time.monotonic() if now is None else now
+        count = len(self._sessions)
+        total = self._total_bytes
+        found = []
+        for key, usage in self._sessions.items():
+            if now - usage.last_active >= self.idle_ttl:
+                reason = "idle"
+            elif count > self.max_sessions:
+                reason = "count"
+            elif total > self.max_bytes:
+                reason = "bytes"
+            else:
+                break              # LRU order: everything after is more recent
+            found.append((key, reason))
+            count -= 1
+            total -= usage.bytes
+        return found
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
@@ -0,0 +1,295 @@
+# src/session_store.py
+#
+# Where chat sessions (AgentContext) live between messages and across
+# reconnects, so more than one backend worker can serve the chat.
+#
+#   InMemorySessionStore   single process; the default
+#   MongoSessionStore      one document per session in SESSIONS_COLLECTION
+#   CachedSessionStore     write-through LRU in front of another store
+#
+# Writes are versioned: save() only succeeds if the stored version is still
+# the one the caller loaded, otherwise it raises VersionConflict. commit()
+# handles that by rebasing this turn's new messages onto the latest stored
+# version, so two workers writing the same session never lose a turn.
+# History is append-only, so a Mongo save pushes only the new messages.
+#
+# evict() drops a session from this process's memory without deleting it
+# (see src/session_limits.py). The in-memory store can spill evicted sessions
+# to Mongo (SESSION_SPILL) and load them back on the next load().
+#
+# load() hands out a copy of the stored context (metadata included), never the
+# stored object itself: agents change metadata and the socket server sets the
+# token in place, and neither may reach the store except through save().
+#
+# The JWT is never stored; it is re-read from the cookie on every connect.
+#
+# Usage:
+#   store  = build_session_store()              # from SESSION_STORE config
+#   stored = await store.load(key)              # None → new session
+#   stored = await store.commit(key, context, stored)
+#
+# python -m benchmarks.session_store_check runs the Mongo store against
+# mongomock-motor (or a real server with --mongo-uri).
+
+from __future__ import annotations
+
+import copy
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+
+from src.agents.base_agent import AgentContext
+from src.agents.conversation import History
+from src.config import SESSION_STORE, SESSIONS_COLLECTION, SESSION_CACHE_SIZE, SESSION_SPILL
+
+_COMMIT_RETRIES = 3
+
+
+class VersionConflict(Exception):
+    """The session was saved by someone else since it was loaded."""
+
+
+@dataclass
+class StoredSession:
+    context: AgentContext
+    version: int
+    length: int                    # history messages held by the store
+
+
+class SessionStore(ABC):
+    @abstractmethod
+    async def load(self, key: str) -> StoredSession | None:
+        """Latest stored version of the session, or None if there is none."""
+
+    @abstractmethod
+    async def save(self, key: str, context: AgentContext, base: StoredSession | None) -> StoredSession:
+        """
+        Store `context` as the successor of `base` (None → a new session).
+        Raises VersionConflict if the stored version is no longer `base`.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    async def evict(self, key: str) -> None:
+        """Release any in-memory copy of the session. Stores without one do nothing."""
+
+    async def commit(self, key: str, context: AgentContext, base: StoredSession | None) -> StoredSession:
+        """
+        save(), rebasing on conflict: messages added since `base` are appended
+        to the latest stored history and this turn's metadata keys win.
+        The returned context may therefore differ from the one passed in.
+        """
+        for _ in range(_COMMIT_RETRIES):
+            try:
+                return await self.save(key, context, base)
+            except VersionConflict:
+                latest = await self.load(key)
+                print(f"[session_store] version conflict on {key}, rebasing onto v{latest.version if latest else 0}")
+                context = _rebase(context, base, latest)
+                base    = latest
+        return await self.save(key, context, base)
+
+
+def _detached(stored: StoredSession) -> StoredSession:
+    """`stored` with a context that can be changed in place without touching the original."""
+    context = stored.context
+    return replace(stored, context=replace(context, metadata=copy.deepcopy(context.metadata)))
+
+
+def _rebase(context: AgentContext, base: StoredSession | None, latest: StoredSession | None) -> AgentContext:
+    if latest is None:
+        return context
+    added = context.history[base.length if base else 0:]
+    return replace(
+        context,
+        history=latest.context.history.extended(added),
+        metadata={**latest.context.metadata, **context.metadata},
+    )
+
+
+# ── In-memory ─────────────────────────────────────────────────────────────────
+
+class InMemorySessionStore(SessionStore):
+    """
+    Holds a snapshot of each saved AgentContext. One process only.
+
+    Args:
+        spill: optional MongoSessionStore that evicted sessions are written to
+               and loaded back from; without it an evicted session is gone.
+    """
+
+    def __init__(self, spill: MongoSessionStore | None = None):
+        self.spill = spill
+        self._sessions: dict[str, StoredSession] = {}
+
+    async def load(self, key: str) -> StoredSession | None:
+        stored = self._sessions.get(key)
+        if stored is None and self.spill is not None:
+            spilled = await self.spill.load(key)
+            if spilled is not None:
+                stored = self._sessions.setdefault(key, spilled)   # unless saved meanwhile
+        return _detached(stored) if stored is not None else None
+
+    async def save(self, key: str, context: AgentContext, base: StoredSession | None) -> StoredSession:
+        current = self._sessions.get(key)
+        if (current.version if current else 0) != (base.version if base else 0):
+            raise VersionConflict(key)
+        stored = StoredSession(context, (base.version if base else 0) + 1, len(context.history))
+        self._sessions[key] = _detached(stored)
+        return stored
+
+    async def delete(self, key: str) -> None:
+        self._sessions.pop(key, None)
+        if self.spill is not None:
+            await self.spill.delete(key)
+
+    async def evict(self, key: str) -> None:
+        stored = self._sessions.get(key)
+        if stored is None:
+            return
+        if self.spill is not None:
+            await self.spill.overwrite(key, stored)
+        if self._sessions.get(key) is stored:    # not saved again while spilling
+            del self._sessions[key]
+
+
+# ── MongoDB ───────────────────────────────────────────────────────────────────
+
+class MongoSessionStore(SessionStore):
+    """
+    One document per session:
+        {_id: key, version, user_id, locale, metadata, history: [message, ...], updated_at}
+
+    Args:
+        collection: a motor collection (or an async stand-in such as mongomock-motor's).
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def load(self, key: str) -> StoredSession | None:
+        doc = await self.collection.find_one({"_id": key})
+        if doc is None:
+            return None
+        history = History.of(doc.get("history", []))
+        context = AgentContext(
+            session_id=key,
+            user_id=doc.get("user_id"),
+            token=None,
+            history=history,
+            locale=doc.get("locale", "en"),
+            metadata=doc.get("metadata", {}),
+        )
+        return StoredSession(context, doc["version"], len(history))
+
+    async def save(self, key: str, context: AgentContext, base: StoredSession | None) -> StoredSession:
+        from pymongo.errors import DuplicateKeyError
+
+        fields = {
+            "user_id":    context.user_id,
+            "locale":     context.locale,
+            "metadata":   _storable(context.metadata),
+            "updated_at": time.time(),
+        }
+        if base is None:
+            try:
+                await self.collection.insert_one({"_id": key, "version": 1, "history": list(context.history), **fields})
+            except DuplicateKeyError:
+                raise VersionConflict(key) from None
+            return StoredSession(context, 1, len(context.history))
+
+        result = await self.collection.update_one(
+            {"_id": key, "version": base.version},
+            {
+                "$set":  {**fields, "version": base.version + 1},
+                "$push": {"history": {"$each": context.history[base.length:]}},
+            },
+        )
+        if result.matched_count == 0:
+            raise VersionConflict(key)
+        return StoredSession(context, base.version + 1, len(context.history))
+
+    async def overwrite(self, key: str, stored: StoredSession) -> None:
+        """Write `stored` unconditionally, keeping its version (spill from InMemorySessionStore)."""
+        context = stored.context
+        await self.collection.replace_one(
+            {"_id": key},
+            {
+                "version":    stored.version,
+                "user_id":    context.user_id,
+                "locale":     context.locale,
+                "metadata":   _storable(context.metadata),
+                "history":    list(context.history),
+                "updated_at": time.time(),
+            },
+            upsert=True,
+        )
+
+    async def delete(self, key: str) -> None:
+        await self.collection.delete_one({"_id": key})
+
+
+def _storable(metadata: dict) -> dict:
+    """Metadata as plain JSON types; anything else is stored as its str()."""
+    return json.loads(json.dumps(metadata, default=str))
+
+
+# ── Write-through cache ───────────────────────────────────────────────────────
+
+class CachedSessionStore(SessionStore):
+    """
+    LRU of recently used sessions in front of `backend`. Every save goes to
+    the backend first; reconnects to this worker are served from memory.
+    """
+
+    def __init__(self, backend: SessionStore, capacity: int = SESSION_CACHE_SIZE):
+        self.backend  = backend
+        self.capacity = capacity
+        self._cache: OrderedDict[str, StoredSession] = OrderedDict()
+
+    async def load(self, key: str) -> StoredSession | None:
+        stored = self._cache.get(key)
+        if stored is not None:
+            self._cache.move_to_end(key)
+            return _detached(stored)
+        stored = await self.backend.load(key)
+        if stored is not None:
+            self._put(key, _detached(stored))
+        return stored
+
+    async def save(self, key: str, context: AgentContext, base: StoredSession | None) -> StoredSession:
+        try:
+            stored = await self.backend.save(key, context, base)
+        except VersionConflict:
+            self._cache.pop(key, None)   # stale — the next load() must hit the backend
+            raise
+        self._put(key, _detached(stored))
+        return stored
+
+    async def delete(self, key: str) -> None:
+        self._cache.pop(key, None)
+        await self.backend.delete(key)
+
+    async def evict(self, key: str) -> None:
+        self._cache.pop(key, None)    # already saved to the backend
+
+    def _put(self, key: str, stored: StoredSession) -> None:
+        self._cache[key] = stored
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+
+def build_session_store() -> SessionStore:
+    """The store selected by SESSION_STORE ("memory" or "mongo") and SESSION_SPILL."""
+    if SESSION_STORE == "mongo":
+        from src.database import database
+        return CachedSessionStore(MongoSessionStore(database[SESSIONS_COLLECTION]))
+    if SESSION_SPILL:
+        from src.database import database
+        return InMemorySessionStore(spill=MongoSessionStore(database[SESSIONS_COLLECTION]))
+    return InMemorySessionStore()
@@ -0,0 +1,78 @@
+# src/session_tasks.py
+#
+# Per-session task registry for the Socket.IO layer.
+#
+# Each connected sid gets one SessionWorker: a bounded queue of incoming
+# messages drained by a single worker task, so two messages on the same sid
+# never run concurrently (and never race on contexts[sid].history).
+# The message currently being handled runs as its own task so it can be
+# cancelled on its own — by a "stop-generation" event — or together with the
+# worker when the client disconnects. Cancelling it closes the upstream
+# OpenAI stream, so no more tokens are paid for.
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable
+
+Handler = Callable[[str, object], Awaitable[None]]
+
+
+class SessionWorker:
+    """
+    Serializes message handling for one sid.
+
+    Args:
+        sid:      Socket.IO session id.
+        handler:  Coroutine function called as handler(sid, data) per message.
+        maxsize:  Messages allowed to wait behind the one in progress.
+    """
+
+    def __init__(self, sid: str, handler: Handler, maxsize: int):
+        self.sid      = sid
+        self._handler = handler
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._current: asyncio.Task | None = None
+        self._worker  = asyncio.create_task(self._run())
+
+    def submit(self, data) -> bool:
+        """Queue a message. Returns False (backpressure) when the queue is full."""
+        try:
+            self._queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    @property
+    def busy(self) -> bool:
+        """A message is in progress or waiting."""
+        return self._current is not None or not self._queue.empty()
+
+    def stop_generation(self) -> bool:
+        """Cancel the message in progress, if any. Queued messages still run."""
+        if self._current is None or self._current.done():
+            return False
+        self._current.cancel()
+        return True
+
+    async def close(self) -> None:
+        """Cancel the message in progress and drop everything queued."""
+        self._worker.cancel()
+        if self._current is not None:
+            self._current.cancel()
+        await asyncio.gather(self._worker, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            data = await self._queue.get()
+            self._current = asyncio.create_task(self._handler(self.sid, data))
+            try:
+                await self._current
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise           # the worker itself is closing
+                # otherwise only the message was stopped — carry on
+            except Exception as exc:
+                print(f"[SessionWorker] {self.sid}: message failed: {exc!r}")
+            finally:
+                self._current = None
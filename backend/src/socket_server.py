@@ -3,16 +3,62 @@
 # Thin Socket.IO layer. All business logic now lives in src/agents/.
 # Responsibilities here: session lifecycle, JWT extraction, emit results.
 #
-# Streaming protocol (when agent sets stream=True):
-#   Server emits: "bot-token" (str) per chunk, then "bot-done" (empty) when complete.
-# Non-streaming:
+# Streaming protocol (when agent sets stream=True — every specialist agent does):
+#   Server emits: "bot-token" (str) per frame, then "bot-done" (empty) when complete.
+#   A frame is one or more model deltas coalesced by src/stream_coalescer.py.
+#   Once the stream ends, response.finalize(full_reply, completed) yields the
+#   updated context; completed is False if the reply was stopped or timed out.
+# Non-streaming (blocked / out-of-scope / timed-out replies):
 #   Server emits: "bot-message" (str) with the full reply.
+#
+# Messages on one sid are handled one at a time through a bounded queue
+# (src/session_tasks.py). The client may emit "stop-generation" to cancel the
+# reply in progress; disconnecting cancels it too.
+#
+# Sessions outlive sockets: the client passes a random per-tab id as
+# auth.session_id on connect, and the context is saved to the session store
+# (src/session_store.py) after every message. Reconnecting — to this worker
+# or any other — picks the conversation up where it left off. Stored
+# sessions are scoped to the JWT's user_id, so an id alone cannot open
+# another user's conversation. With SOCKETIO_MESSAGE_QUEUE set, emits go
+# through Redis / RabbitMQ so any worker can reach any client.
+#
+# Memory is bounded by a sweeper (sweep_sessions(), started by main.py): idle
+# sessions and, past SESSION_MAX_COUNT / SESSION_MAX_BYTES, the least recently
+# used ones are dropped from memory (src/session_limits.py). Their sockets stay
+# open; the next message reloads the session from the store.
 
+import asyncio
+import re
+import time
 import socketio
 from http.cookies import SimpleCookie
 import jwt
 
-from src.agents import Orchestrator, AgentContext
+from src import metrics
+from src.agents import Orchestrator, AgentContext, History
+from src.agents.history import history_manager
+from src.config import (
+    STREAM_FLUSH_BYTES, STREAM_FLUSH_MS, SESSION_QUEUE_SIZE, SECRET_KEY, SOCKETIO_MESSAGE_QUEUE, SESSION_SWEEP_INTERVAL,
+)
+from src.session_limits import SessionLimits
+from src.session_store import StoredSession, build_session_store
+from src.stream_coalescer import coalesce
+from src.session_tasks import SessionWorker
+from src.utils.jwtUtils import ALGORITHM
+
+
+def _client_manager():
+    """Cross-process client manager for multi-worker deployments, or None for a single process."""
+    url = SOCKETIO_MESSAGE_QUEUE
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://")):
+        return socketio.AsyncRedisManager(url)
+    if url.startswith(("amqp://", "amqps://")):
+        return socketio.AsyncAioPikaManager(url)
+    raise ValueError(f"Unsupported SOCKETIO_MESSAGE_QUEUE scheme: {url.split(':', 1)[0]}")
+
 
 # ───── Socket.IO server setup ──────────────────
 sio = socketio.AsyncServer(
@@ -22,6 +68,7 @@ sio = socketio.AsyncServer(
         "https://medease.pages.dev",
     ],
     cors_credentials=True,
+    client_manager=_client_manager(),
 )
 
 # Injected at runtime by main.py after the FastAPI app is created
@@ -33,14 +80,37 @@ orchestrator = Orchestrator(api_app=None)
 # ───── Per-session state ────────────────────────
 # contexts[sid] → AgentContext  (history + metadata live here)
 # sid_to_token[sid] → raw JWT string
+# workers[sid] → SessionWorker  (message queue + in-flight generation task)
+# session_keys[sid] → stable session key in the session store
+# stored[sid] → version of the session last loaded from / saved to the store
+# A sid whose session was evicted keeps its worker and key but has no context.
 contexts     = {}
 sid_to_token = {}
+workers: dict[str, SessionWorker] = {}
+session_keys: dict[str, str] = {}
+stored: dict[str, StoredSession | None] = {}
+
+store  = build_session_store()
+limits = SessionLimits()
+
+metrics.gauge("medease_active_sessions", "Connected Socket.IO sessions holding an AgentContext.", lambda: len(contexts))
+metrics.gauge("medease_sessions_held", "Sessions held in memory, connected or resumable.", lambda: len(limits))
+metrics.gauge("medease_session_history_bytes", "Approximate bytes of conversation history held in memory.", lambda: limits.total_bytes)
+SESSIONS_EVICTED = metrics.counter(
+    "medease_sessions_evicted_total",
+    "Sessions dropped from memory by the sweeper, by reason (idle, count, bytes).",
+    ("reason",),
+)
+
+_BUSY_MESSAGE = "Still working on your earlier messages — please wait for the reply before sending more."
 
 _INITIAL_SYSTEM_PROMPT = (
     "You are a helpful assistant for MedEase, a healthcare and Emory DAS app. "
     "You can help with accommodation letters, DAS questions, medications, caregiver tasks, and reminders."
 )
 
+_SESSION_ID_RE = re.compile(r"[A-Za-z0-9_-]{16,64}")
+
 
 @sio.event
 async def connect(sid, environ, auth):
@@ -48,26 +118,87 @@ async def connect(sid, environ, auth):
     cookies = SimpleCookie(raw)
     morsel  = cookies.get("access_token")
     token   = morsel.value if morsel else None
+    user_id = _user_id(token)
+    key     = _session_key(sid, auth, user_id)
+    context, base = await _load_context(key, user_id, token)
 
     sid_to_token[sid] = token
-    contexts[sid] = AgentContext(
-        session_id=sid,
-        user_id=None,
-        token=token,
-        history=[{"role": "system", "content": _INITIAL_SYSTEM_PROMPT}],
-    )
-    print(f"Client connected: {sid}")
+    session_keys[sid] = key
+    stored[sid]       = base
+    contexts[sid]     = context
+    workers[sid] = SessionWorker(sid, _handle_message, SESSION_QUEUE_SIZE)
+    print(f"Client connected: {sid}" + (f" (resumed {len(context.history)} messages)" if base else ""))
+
+
+async def _load_context(key: str, user_id: str | None, token: str | None) -> tuple[AgentContext, StoredSession | None]:
+    """The stored session for `key`, or a fresh one."""
+    base = await store.load(key)
+    if base is not None:
+        context = base.context
+        context.token = token
+    else:
+        context = AgentContext(
+            session_id=key,
+            user_id=user_id,
+            token=token,
+            history=History.of([{"role": "system", "content": _INITIAL_SYSTEM_PROMPT}]),
+        )
+    limits.touch(key, context.history)    # fresh sessions count toward the limits from connect
+    return context, base
 
 
 @sio.event
 async def disconnect(sid):
     contexts.pop(sid, None)
     sid_to_token.pop(sid, None)
+    stored.pop(sid, None)
+    key = session_keys.pop(sid, None)
+    if key is not None:
+        history_manager.forget(key)
+        if key.startswith("sid:"):
+            limits.discard(key)
+            await store.delete(key)   # no session_id — can never be resumed
+    worker = workers.pop(sid, None)
+    if worker is not None:
+        await worker.close()
     print(f"Client disconnected: {sid}")
 
 
+def _user_id(token: str | None) -> str | None:
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("user_id")
+    except jwt.PyJWTError:
+        return None
+
+
+def _session_key(sid: str, auth, user_id: str | None) -> str:
+    """Store key for this connection. Without a usable auth.session_id the session cannot be resumed."""
+    session_id = auth.get("session_id") if isinstance(auth, dict) else None
+    if not isinstance(session_id, str) or not _SESSION_ID_RE.fullmatch(session_id):
+        return f"sid:{sid}"
+    return f"{user_id or 'anon'}:{session_id}"
+
+
 @sio.event
 async def user_message(sid, data):
+    worker = workers.get(sid)
+    if worker is None:
+        await sio.emit("bot-message", "Session expired. Please refresh.", room=sid)
+        return
+    if not worker.submit(data):
+        await sio.emit("bot-message", _BUSY_MESSAGE, room=sid)
+
+
+@sio.on("stop-generation")
+async def stop_generation(sid, data=None):
+    worker = workers.get(sid)
+    if worker is not None:
+        worker.stop_generation()
+
+
+async def _handle_message(sid, data):
     # Normalise data — frontend sends either a plain string or {content, mode, locale, dev_mode}
     if isinstance(data, dict):
         user_text = data.get("content", "")
@@ -78,39 +209,161 @@ async def user_message(sid, data):
         locale    = "en"
         dev_mode  = False
 
-    context = contexts.get(sid)
+    context = contexts.get(sid) or await _reload(sid)
     if context is None:
         await sio.emit("bot-message", "Session expired. Please refresh.", room=sid)
         return
+    limits.touch(session_keys[sid], context.history)
 
     # Always keep the token, locale, and dev_mode fresh (may change during the session)
     context.token  = sid_to_token.get(sid)
     context.locale = locale
     context.metadata["dev_mode"] = dev_mode
 
+    started  = time.perf_counter()
     response = await orchestrator.handle(user_text, context)
+    timings  = response.timings
 
     if response.stream and response.stream_gen is not None:
         # ── Streaming response ─────────────────────────────────────────────
-        full_reply = ""
-        async for token in response.stream_gen:
-            full_reply += token
-            await sio.emit("bot-token", token, room=sid)
+        parts: list[str] = []
+        frames = coalesce(response.stream_gen, STREAM_FLUSH_BYTES, STREAM_FLUSH_MS)
+        try:
+            async for frame in frames:
+                if not parts:
+                    timings["ttft"] = _elapsed_ms(started)
+                parts.append(frame)
+                await sio.emit("bot-token", frame, room=sid)
+        except asyncio.CancelledError:
+            # Stopped by the client or by disconnect, either inside coalesce()
+            # or during an emit; the finally below closes the upstream stream
+            # in both cases. Keep what was shown, if anyone is left.
+            if sid in contexts:
+                response.completed = False
+                await sio.emit("bot-done", "", room=sid)
+                _finish_stream(sid, response, user_text, "".join(parts))
+                await _persist(sid)
+            raise
+        finally:
+            await frames.aclose()
+            aclose = getattr(response.stream_gen, "aclose", None)
+            if aclose is not None:
+                await aclose()     # coalesce()'s pass-through mode does not close it
         await sio.emit("bot-done", "", room=sid)
-
-        # Append the completed turn to history
-        contexts[sid].history.append({"role": "user",      "content": user_text})
-        contexts[sid].history.append({"role": "assistant", "content": full_reply})
+        timings["total"] = _elapsed_ms(started)
+        _log_timings(sid, response.agent, timings)
+        _finish_stream(sid, response, user_text, "".join(parts))
+        await _persist(sid)
 
     else:
         # ── Non-streaming response ─────────────────────────────────────────
         if response.updated_context is not None:
             contexts[sid] = response.updated_context
         else:
-            contexts[sid].history.append({"role": "user",      "content": user_text})
-            contexts[sid].history.append({"role": "assistant", "content": response.content})
+            _append_turn(sid, user_text, response.content)
 
         await sio.emit("bot-message", response.content, room=sid)
+        # The whole reply arrives at once, so first token == total
+        timings["ttft"] = timings["total"] = _elapsed_ms(started)
+        _log_timings(sid, response.agent, timings)
+        await _persist(sid)
+
+
+async def _reload(sid: str) -> AgentContext | None:
+    """Bring back a session the sweeper evicted while its socket stayed open."""
+    key = session_keys.get(sid)
+    if key is None:
+        return None
+    token = sid_to_token.get(sid)
+    context, base = await _load_context(key, _user_id(token), token)
+    if session_keys.get(sid) != key:
+        return None               # disconnected meanwhile
+    stored[sid]   = base
+    contexts[sid] = context
+    print(f"[sessions] {sid}: reloaded {key}" + ("" if base else " — not found, starting over"))
+    return context
+
+
+def _finish_stream(sid: str, response, user_text: str, full_reply: str) -> None:
+    if response.finalize is not None:
+        contexts[sid] = response.finalize(full_reply, response.completed)
+    else:
+        _append_turn(sid, user_text, full_reply)
+
+
+def _append_turn(sid: str, user_text: str, reply: str) -> None:
+    contexts[sid] = contexts[sid].extended([
+        {"role": "user",      "content": user_text},
+        {"role": "assistant", "content": reply},
+    ])
+
+
+async def _persist(sid: str) -> None:
+    """Save the session after a turn. Runs after the reply is sent, off the latency path."""
+    key, context = session_keys.get(sid), contexts.get(sid)
+    if key is None or context is None:
+        return
+    try:
+        result = await store.commit(key, context, stored.get(sid))
+    except Exception as exc:
+        # The live context is intact; the next turn's save carries this one too
+        print(f"[session_store] save failed for {key}: {exc!r}")
+        return
+    if sid in contexts:
+        stored[sid]   = result
+        contexts[sid] = result.context   # differs only if commit() had to rebase
+        limits.touch(key, result.context.history)
+
+
+# ───── Memory limits ────────────────────────────
+
+async def sweep_sessions(interval: float = SESSION_SWEEP_INTERVAL) -> None:
+    """Evict idle / over-cap sessions every `interval` seconds. Runs until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await _sweep()
+        except Exception as exc:
+            print(f"[sessions] sweep failed: {exc!r}")
+
+
+async def _sweep() -> None:
+    for key, reason in limits.victims():
+        sids = [sid for sid, k in session_keys.items() if k == key]
+        if any(workers[sid].busy for sid in sids):
+            continue              # mid-reply; it will be the most recent next time
+        try:
+            await store.evict(key)
+        except Exception as exc:
+            print(f"[sessions] could not spill {key}, keeping it: {exc!r}")
+            continue
+        sids = [sid for sid in sids if sid in session_keys]
+        if any(workers[sid].busy for sid in sids):
+            continue              # a message arrived while spilling; its save puts the session back
+        for sid in sids:
+            contexts.pop(sid, None)
+            stored[sid] = None
+        limits.discard(key)
+        history_manager.forget(key)
+        SESSIONS_EVICTED.inc(reason=reason)
+        print(f"[sessions] evicted {key} ({reason})")
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def _log_timings(sid: str, agent: str | None, timings: dict) -> None:
+    """
+    One line per message so per-agent TTFT can be grepped out of the App Engine
+    logs; the same numbers feed the /metrics stage histograms.
+    """
+    if not timings:
+        return
+    for stage, ms in timings.items():
+        metrics.STAGE_SECONDS.observe(ms / 1000, stage=stage, intent=agent or "-")
+    stages = " ".join(f"{stage}={ms}ms" for stage, ms in timings.items())
+    print(f"[timing] {sid} agent={agent or '-'} {stages}")
 
 
 def set_api_app(app) -> None:
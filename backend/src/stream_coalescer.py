@@ -0,0 +1,76 @@
+# src/stream_coalescer.py
+#
+# Coalesces a token stream into larger frames before they are emitted over
+# Socket.IO. One emit per model delta costs a serialization, an engine.io
+# packet and an event-loop yield each; on a single vCPU that dominates once
+# many sessions stream at once.
+#
+# A frame is flushed when it reaches `max_bytes` (UTF-8) or when its first
+# token has waited `window_ms`, whichever comes first. The window is enforced
+# with a timer, so a pause in the model stream never holds text back longer
+# than `window_ms`. Frames concatenate to exactly the original text, which
+# keeps the "bot-token" / "bot-done" protocol unchanged for clients.
+
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncGenerator, AsyncIterable
+
+
+async def coalesce(
+    tokens: AsyncIterable[str],
+    max_bytes: int,
+    window_ms: float,
+) -> AsyncGenerator[str, None]:
+    if max_bytes <= 0 and window_ms <= 0:
+        async for token in tokens:
+            yield token
+        return
+
+    loop     = asyncio.get_running_loop()
+    window   = window_ms / 1000
+    iterator = tokens.__aiter__()
+    buffer: list[str] = []
+    size     = 0
+    flush_at = 0.0
+    pending: asyncio.Future | None = None
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(flush_at - loop.time(), 0) if buffer and window > 0 else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+
+            if not done:
+                # Window elapsed while waiting on the model — flush what we have
+                yield "".join(buffer)
+                buffer, size = [], 0
+                continue
+
+            try:
+                token = pending.result()
+            except StopAsyncIteration:
+                pending = None
+                break
+            pending = None
+
+            if not buffer:
+                flush_at = loop.time() + window
+            buffer.append(token)
+            size += len(token.encode())
+            if max_bytes > 0 and size >= max_bytes:
+                yield "".join(buffer)
+                buffer, size = [], 0
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            # The generator is mid-step inside `pending`; let the cancellation
+            # land before closing it, or aclose() finds it still running.
+            pending.cancel()
+            await asyncio.wait({pending})
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
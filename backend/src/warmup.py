@@ -0,0 +1,88 @@
+# src/warmup.py
+#
+# Startup warmup, run in the background from main.py's lifespan so the first
+# users after a deploy don't pay for cold resources:
+#
+#   retriever     open the vector store and load its index pages
+#   answer_cache  read the persisted RAG answer cache
+#   tokenizer     load the tiktoken encoding (a download on a cold container)
+#   mongo         ping, so the driver's pool is connected before the first login
+#   llm           open LLM_WARM_CONNECTIONS pooled connections to the OpenAI API
+#
+# Steps run concurrently, each within _STEP_TIMEOUT. GET /ready answers 503
+# until all of them have finished, then 200 — a failed step is logged and
+# reported but does not hold readiness back; that part of the app then warms
+# up lazily on first use, as it always did. app.yaml's readiness check
+# points at /ready.
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+from src import llm_gateway
+from src.config import LLM_WARM_CONNECTIONS
+from src.agents.history import load_encoding
+from src.rag.answer_cache import answer_cache
+
+_STEP_TIMEOUT = 120.0
+
+
+class Warmup:
+    def __init__(self):
+        self.done = False
+        self.steps: dict[str, str] = {}
+
+    async def run(self, orchestrator) -> None:
+        from src.database import client
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            self._step("retriever",    asyncio.to_thread(_warm_retriever, orchestrator.rag)),
+            self._step("answer_cache", _warm_answer_cache()),
+            self._step("tokenizer",    asyncio.to_thread(_warm_tokenizer)),
+            self._step("mongo",        _ping(client)),
+            self._step("llm",          _warm_llm()),
+        )
+        self.done = True
+        print(f"[warmup] ready after {time.perf_counter() - started:.1f}s: {self.steps}")
+
+    def status(self) -> dict:
+        return {"ready": self.done, "steps": dict(self.steps)}
+
+    async def _step(self, name: str, aw) -> None:
+        self.steps[name] = "running"
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(aw, _STEP_TIMEOUT)
+        except Exception as exc:
+            self.steps[name] = f"failed: {type(exc).__name__}"
+            print(f"[warmup] {name} failed: {exc!r}")
+            return
+        self.steps[name] = f"{result} in {time.perf_counter() - started:.1f}s"
+
+
+def _warm_retriever(rag) -> str:
+    return "ok" if rag.warm() else "skipped (no vector store)"
+
+
+def _warm_tokenizer() -> str:
+    return "ok" if load_encoding() is not None else "skipped (estimating tokens from length)"
+
+
+async def _warm_answer_cache() -> str:
+    await answer_cache.load()
+    return f"ok ({len(answer_cache)} answers)"
+
+
+async def _ping(client) -> str:
+    await client.admin.command("ping")
+    return "ok"
+
+
+async def _warm_llm() -> str:
+    opened = await llm_gateway.warm_connections(LLM_WARM_CONNECTIONS)
+    return f"ok ({opened}/{LLM_WARM_CONNECTIONS} connections)"
+
+
+warmup = Warmup()
@@ -8,7 +8,7 @@ import {
   IconButton,
   Chip,
 } from "@mui/material";
-import { Send as SendIcon } from "@mui/icons-material";
+import { Send as SendIcon, Stop as StopIcon } from "@mui/icons-material";
 import { motion, AnimatePresence } from "framer-motion";
 import ReactMarkdown from "react-markdown";
 import socket from "../utility/SocketConnection";
@@ -106,6 +106,11 @@ export default function ChatPage() {
     setInput("");
   };
 
+  // Cancels the reply in progress; the server keeps what was shown and sends "bot-done"
+  const stopGeneration = () => {
+    if (isStreaming) socket.emit("stop-generation");
+  };
+
   return (
     <Box
       sx={{
@@ -347,8 +352,9 @@ export default function ChatPage() {
               }}
             />
             <IconButton
-              onClick={sendMessage}
-              disabled={!input.trim() || isStreaming}
+              onClick={isStreaming ? stopGeneration : sendMessage}
+              disabled={!isStreaming && !input.trim()}
+              aria-label={isStreaming ? "Stop generating" : "Send message"}
               sx={{
                 bgcolor: colors.textMain,
                 color: "#FFF",
@@ -369,7 +375,7 @@ export default function ChatPage() {
                 },
               }}
             >
-              <SendIcon sx={{ fontSize: 20 }} />
+              {isStreaming ? <StopIcon sx={{ fontSize: 20 }} /> : <SendIcon sx={{ fontSize: 20 }} />}
             </IconButton>
           </Box>
         </Box>
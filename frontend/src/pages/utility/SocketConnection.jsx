@@ -4,11 +4,23 @@ import { io } from "socket.io-client";
 
 const backendBaseUrl = import.meta.env.VITE_API_URL;
 
+// Random per-tab id so a reconnect (or a different backend worker) resumes
+// the same chat session. sessionStorage survives reloads but not new tabs.
+function chatSessionId() {
+  let id = sessionStorage.getItem("chat_session_id");
+  if (!id) {
+    id = crypto.randomUUID().replaceAll("-", "");
+    sessionStorage.setItem("chat_session_id", id);
+  }
+  return id;
+}
+
 const socket = io(backendBaseUrl, {
   path: "/ws/socket.io",
   transports: ["websocket"],
   withCredentials: true, // sends the HttpOnly access_token cookie
   autoConnect: false,    // connect explicitly only from authenticated components
+  auth: (cb) => cb({ session_id: chatSessionId() }),
 });
 
 export default socket;